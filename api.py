@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+Встраиваемый API обработки: задачи без urls.txt, input() и нового процесса на каждый пакет
+Конвейер run2 (цикл asyncio с общими лимитами, кэшами и пулом cookies) работает в фоновом
+потоке и остаётся «тёплым»: задачи добавляются в любой момент, на каждую - объект Job
+со статусом, ожиданием результата и потоком событий
+Пример:
+    with Pipeline() as pipeline:
+        job = pipeline.submit("https://youtu.be/dQw4w9WgXcQ")
+        for event in job.events():
+            print(event)
+        success, video_id, message = job.wait()
+"""
+import asyncio
+import collections
+import concurrent.futures
+import threading
+import time
+import uuid
+
+import run2
+from scheduling import JobScheduler
+
+# Статусы задачи
+JOB_QUEUED = "queued"  # Принята, ждёт своей очереди
+JOB_RUNNING = "running"  # Обрабатывается
+JOB_DONE = "done"  # Готово
+JOB_FAILED = "failed"  # Не получилось (причина - в message)
+JOB_CANCELLED = "cancelled"  # Отменена
+FINISHED_STATUSES = (JOB_DONE, JOB_FAILED, JOB_CANCELLED)
+
+# Сколько последних событий хранить на задачу
+EVENT_LOG_SIZE = 200
+
+# Событие прогресса стадии - не чаще раза в столько секунд на задачу
+PROGRESS_EVENT_INTERVAL = 1.0
+
+# Сколько завершённых задач помнить (для статуса по ID)
+KEEP_FINISHED_JOBS = 1000
+
+
+class Job:
+    """
+    Задача обработки одного видео (потокобезопасно)
+    job.wait() - результат (success, video_id, message); из asyncio - await job
+    job.events() - события по мере появления
+    """
+
+    def __init__(self, job_id, url, video_id, pipeline):
+        self.id = job_id
+        self.url = url
+        self.video_id = video_id
+        self.pipeline = pipeline
+        self.status = JOB_QUEUED
+        self.stage = None
+        self.waiting = False
+        self.progress = {}
+        self.message = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future = concurrent.futures.Future()
+        self.task = None  # Задача asyncio в цикле конвейера
+        self.cancel_requested = False  # Отмену могли запросить раньше, чем задача asyncio создана
+        self.event_log = collections.deque(maxlen=EVENT_LOG_SIZE)
+        self.sequence = 0
+        self.last_progress_event = 0.0
+        self.condition = threading.Condition()
+
+    def _emit(self, kind, **fields):
+        """Записать событие (вызывать под self.condition)"""
+        self.sequence += 1
+        self.event_log.append(dict(fields, seq=self.sequence, time=time.time(), job=self.id, type=kind))
+        self.condition.notify_all()
+
+    def _on_board_event(self, kind, fields):
+        """Событие панели прогресса конвейера"""
+        with self.condition:
+            if self.done():
+                return
+            if kind == 'start':
+                self.status = JOB_RUNNING
+                self.started_at = time.time()
+                self._emit('start')
+            elif kind == 'stage':
+                self.stage = fields['stage']
+                self.waiting = fields['waiting']
+                self.progress = {}
+                self._emit('stage', **fields)
+            elif kind == 'progress':
+                self.progress.update(fields)
+                now = time.monotonic()
+                if now - self.last_progress_event >= PROGRESS_EVENT_INTERVAL:
+                    self.last_progress_event = now
+                    self._emit('progress', **self.progress)
+
+    def _finish(self, status, result):
+        """Задача завершилась: событие 'result' и результат для ожидающих"""
+        with self.condition:
+            self.status = status
+            self.message = result[2]
+            self.finished_at = time.time()
+            self._emit('result', status=status, success=result[0], message=result[2])
+        self.future.set_result(result)
+
+    def done(self):
+        return self.future.done()
+
+    def wait(self, timeout=None):
+        """Дождаться результата: (success, video_id, message); TimeoutError, если не успела"""
+        return self.future.result(timeout)
+
+    def __await__(self):
+        return asyncio.wrap_future(self.future).__await__()
+
+    def cancel(self):
+        """Отменить задачу (процессы убиваются, временные файлы удаляются)"""
+        self.pipeline.cancel(self)
+
+    def events(self, after=0, timeout=None):
+        """
+        События задачи по мере появления (генератор); заканчивается вместе с задачей
+        after - номер (seq) последнего уже полученного события
+        timeout - сколько ждать следующего события; не дождались - генератор заканчивается
+        """
+        while True:
+            with self.condition:
+                if not self.condition.wait_for(lambda: self.sequence > after or self.done(), timeout):
+                    return
+                pending = [event for event in self.event_log if event['seq'] > after]
+                finished = self.done()
+            for event in pending:
+                after = event['seq']
+                yield event
+            if finished:
+                return
+
+    def recent_events(self):
+        """Последние события (не больше EVENT_LOG_SIZE)"""
+        with self.condition:
+            return list(self.event_log)
+
+    def to_dict(self):
+        """Состояние задачи для JSON"""
+        with self.condition:
+            return {
+                'id': self.id,
+                'url': self.url,
+                'video_id': self.video_id,
+                'status': self.status,
+                'stage': self.stage,
+                'waiting': self.waiting,
+                'progress': dict(self.progress),
+                'message': self.message,
+                'submitted_at': self.submitted_at,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+                'last_event': self.sequence,
+            }
+
+
+class Pipeline:
+    """
+    Тёплый конвейер обработки в фоновом потоке
+    Параметры - как у run2.process_batch_parallel; действуют на все задачи конвейера
+    """
+
+    def __init__(self, output_dir="output", max_workers=run2.MAX_WORKERS, audio_only=run2.AUDIO_ONLY,
+                 separate_tracks=run2.SEPARATE_AUDIO_TRACKS, levels_mode=run2.MIX_LEVELS, translate_names=True,
+                 video_volume=0.05, translation_volume=0.58, policy=run2.SCHEDULING_POLICY, packaging=run2.OUTPUT_PACKAGING):
+        self.output_dir = output_dir
+        self.max_workers = max_workers
+        self.audio_only = audio_only
+        self.separate_tracks = separate_tracks
+        self.levels_mode = levels_mode
+        self.translate_names = translate_names
+        self.video_volume = video_volume
+        self.translation_volume = translation_volume
+        self.policy = policy
+        self.packaging = packaging
+        self.jobs = collections.OrderedDict()
+        self.active = {}  # {video_id: Job} - незавершённые задачи
+        self.lock = threading.Lock()
+        self.loop = None
+        self.thread = None
+        self.resources = None
+        self.ready = threading.Event()
+        self.startup_error = None
+        self.stopping = None
+        self.closed = False
+
+    # ---------- Запуск и остановка ----------
+
+    def start(self):
+        """Подготовить окружение и запустить цикл конвейера; RuntimeError, если обработка невозможна"""
+        if not run2.prepare_batch(self.output_dir, self.audio_only, self.separate_tracks, self.levels_mode):
+            raise RuntimeError("Обработка невозможна: не хватает программ (см. сообщения выше)")
+        self.thread = threading.Thread(target=self._run_loop, name="pipeline", daemon=True)
+        self.thread.start()
+        self.ready.wait()
+        if self.startup_error is not None:
+            self.thread.join()
+            self.thread = None
+            raise RuntimeError(f"Конвейер не запустился: {self.startup_error}") from self.startup_error
+        return self
+
+    def _run_loop(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self._main())
+        finally:
+            self.loop.close()
+
+    async def _main(self):
+        """Ресурсы живут, пока конвейер не остановят"""
+        self.stopping = asyncio.Event()
+        # Ошибку подготовки передаём в start(): иначе он ждал бы ready вечно
+        try:
+            scheduler = JobScheduler([], self.policy)
+            self.resources = run2.BatchResources(self.output_dir, self.max_workers, 0, scheduler, listener=self._on_board_event)
+            self.resources.info_batches = run2.InfoBatches(self.resources, self.translate_names, self.audio_only)
+            if run2.SHORTS_BATCHING:
+                self.resources.shorts = run2.ShortsBatches(self.resources, self.audio_only, self.packaging)
+        except Exception as error:
+            self.startup_error = error
+            return
+        finally:
+            self.ready.set()
+
+        await self.stopping.wait()
+        tasks = [job.task for job in list(self.active.values()) if job.task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def close(self, wait=True):
+        """
+        Остановить конвейер
+        wait=True - дождаться всех принятых задач, иначе отменить их
+        """
+        with self.lock:
+            self.closed = True
+            pending = list(self.active.values())
+        if self.thread is None:
+            return
+        if wait:
+            for job in pending:
+                job.future.exception()
+        self.loop.call_soon_threadsafe(self.stopping.set)
+        self.thread.join()
+        self.thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, *exc_info):
+        # Исключение или Ctrl+C в вызывающем коде - не ждём задачи, а отменяем
+        self.close(wait=exc_type is None)
+
+    # ---------- Задачи ----------
+
+    def submit(self, url):
+        """
+        Поставить видео в обработку; возвращает Job
+        Если это видео уже обрабатывается - возвращает его задачу
+        """
+        clean_url, _ = run2.clean_youtube_url(url)
+        video_id = run2.extract_video_id(clean_url)
+        with self.lock:
+            if self.closed or self.thread is None:
+                raise RuntimeError("Конвейер не запущен")
+            if video_id in self.active:
+                return self.active[video_id]
+            job = Job(uuid.uuid4().hex[:12], url, video_id, self)
+            self.jobs[job.id] = job
+            if video_id:
+                self.active[video_id] = job
+            self._forget_finished()
+        with job.condition:
+            job._emit('queued', url=url, video_id=video_id)
+        self.loop.call_soon_threadsafe(self._start_job, job)
+        return job
+
+    def _start_job(self, job):
+        """Запустить задачу в цикле конвейера"""
+        if job.cancel_requested:
+            self._job_finished(job, JOB_CANCELLED, (False, job.video_id, "Отменено"))
+            return
+        resources = self.resources
+        resources.scheduler.add(job.url)
+        resources.progress.add_jobs(1)
+        if resources.bandwidth_budget is not None:
+            resources.bandwidth_budget.add_jobs(1)
+        job.task = self.loop.create_task(self._run_job(job))
+        job.task.add_done_callback(lambda task: self._cancelled_before_start(job))
+
+    def _cancelled_before_start(self, job):
+        """Задачу отменили раньше, чем она началась: process_video не запускался и не прибрал за собой"""
+        if job.done():
+            return
+        self.resources.progress.finish_job(job.video_id)
+        if self.resources.bandwidth_budget is not None:
+            self.resources.bandwidth_budget.job_finished()
+        self._job_finished(job, JOB_CANCELLED, (False, job.video_id, "Отменено"))
+
+    async def _run_job(self, job):
+        try:
+            result = await run2.process_video(
+                job.url, self.output_dir, self.video_volume, self.translation_volume, self.translate_names,
+                self.audio_only, self.resources, self.separate_tracks, self.levels_mode, self.packaging
+            )
+            status = JOB_DONE if result[0] else JOB_FAILED
+        except asyncio.CancelledError:
+            result, status = (False, job.video_id, "Отменено"), JOB_CANCELLED
+        except Exception as e:
+            result, status = (False, job.video_id, f"Ошибка: {e}"), JOB_FAILED
+        self._job_finished(job, status, result)
+
+    def _job_finished(self, job, status, result):
+        with self.lock:
+            if self.active.get(job.video_id) is job:
+                del self.active[job.video_id]
+        job._finish(status, result)
+
+    def _on_board_event(self, kind, key, fields):
+        """События панели прогресса приходят по ID видео - отдаём их задаче"""
+        job = self.active.get(key)
+        if job is not None:
+            job._on_board_event(kind, fields)
+
+    def _forget_finished(self):
+        """Старые завершённые задачи забываются (вызывать под self.lock)"""
+        finished = [job_id for job_id, job in self.jobs.items() if job.done()]
+        for job_id in finished[:max(0, len(finished) - KEEP_FINISHED_JOBS)]:
+            del self.jobs[job_id]
+
+    def cancel(self, job):
+        """Отменить задачу (ещё не запущенная в цикле не запустится вовсе)"""
+        if job.done():
+            return
+        job.cancel_requested = True
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self._cancel_task, job)
+
+    def _cancel_task(self, job):
+        """Отменить задачу asyncio (в цикле конвейера); до _start_job её ещё нет - там проверят флаг"""
+        if job.task is not None:
+            job.task.cancel()
+
+    def get(self, job_id):
+        """Задача по ID или None"""
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def list_jobs(self):
+        """Все известные задачи в порядке поступления"""
+        with self.lock:
+            return list(self.jobs.values())
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Автоподбор параллельности стадий (AIMD, как окно TCP)
+Пока внешний сервис справляется - лимит стадии растёт на слот за окно,
+при признаках перегрузки (бот-проверка, 429, таймауты) - сразу уменьшается вдвое
+Рост останавливается и тогда, когда задержка на единицу работы заметно выросла:
+дополнительные слоты уже не дают прироста пропускной способности
+"""
+import math
+import threading
+
+# Исходы работы в слоте стадии
+OUTCOME_OK = "ok"
+OUTCOME_FAILED = "failed"  # Сервис не справился без явной перегрузки
+OUTCOME_OVERLOAD = "overload"  # Сервис просит сбавить темп
+OUTCOME_IGNORED = "ignored"  # Дело в самом видео - на лимит не влияет
+
+# Что важнее, если в одном слоте (пачке) были разные ошибки
+OUTCOME_SEVERITY = {OUTCOME_OK: 0, OUTCOME_IGNORED: 1, OUTCOME_FAILED: 2, OUTCOME_OVERLOAD: 3}
+
+# Признаки перегрузки в тексте ошибки (без учёта регистра)
+OVERLOAD_PATTERNS = (
+    "not a bot", "error 429", "code 429", "too many requests", "rate limit", "rate-limit",
+    "timed out", "timeout", "таймаут",
+)
+
+# Ошибки, которые зависят от видео, а не от нагрузки
+VIDEO_ERROR_PATTERNS = (
+    "video unavailable", "private video", "members-only", "join this channel", "confirm your age",
+    "not available in your country", "blocked it in your country", "removed", "terminated",
+    "без речи",
+)
+
+# Параметры AIMD
+INCREASE_STEP = 1  # Сколько слотов добавлять за удачное окно
+DECREASE_FACTOR = 0.5  # Во сколько раз уменьшать лимит при перегрузке
+MIN_WINDOW = 3  # Окно - не меньше стольких исходов (и не меньше текущего лимита)
+SUCCESS_THRESHOLD = 0.8  # Ниже этой доли успехов лимит уменьшается
+LATENCY_TOLERANCE = 1.5  # Во сколько раз задержка может превысить лучшую, чтобы лимит ещё рос
+BASELINE_DRIFT = 1.05  # Насколько лучшая задержка "забывается" за окно (условия меняются)
+
+
+def classify_failure(message):
+    """Исход по тексту ошибки"""
+    lowered = (message or "").lower()
+    if any(pattern in lowered for pattern in OVERLOAD_PATTERNS):
+        return OUTCOME_OVERLOAD
+    if any(pattern in lowered for pattern in VIDEO_ERROR_PATTERNS):
+        return OUTCOME_IGNORED
+    return OUTCOME_FAILED
+
+
+class StageReport:
+    """Исход работы в слоте стадии; по умолчанию - успех"""
+
+    def __init__(self):
+        self.outcome = OUTCOME_OK
+        self.work = None  # Объём работы (МБ, минуты видео...) для сравнения задержек
+        self.timed = True  # False - время работы не сравнимо с остальными (учитывается только исход)
+
+    def fail(self, message=""):
+        """Отметить ошибку (класс определяется по тексту; из нескольких остаётся самая серьёзная)"""
+        outcome = classify_failure(message)
+        if OUTCOME_SEVERITY[outcome] > OUTCOME_SEVERITY[self.outcome]:
+            self.outcome = outcome
+
+
+class StageController:
+    """Лимит одной стадии и статистика текущего окна"""
+
+    def __init__(self, name, limit, low, high):
+        self.name = name
+        self.low = low
+        self.high = high
+        self.limit = float(min(max(limit, low), high))
+        self.baseline = None
+        self.grace = 0
+        self._reset_window()
+
+    def _reset_window(self):
+        self.outcomes = 0
+        self.successes = 0
+        self.latencies = []
+
+    def record(self, outcome, seconds=None, work=None):
+        """Учесть исход; возвращает новый лимит, если он изменился, иначе None"""
+        if outcome == OUTCOME_IGNORED:
+            return None
+
+        if self.grace > 0:
+            # Эти работы начались до уменьшения лимита - их ошибки уже учтены
+            self.grace -= 1
+            if outcome == OUTCOME_OVERLOAD:
+                return None
+        elif outcome == OUTCOME_OVERLOAD:
+            return self._decrease()
+
+        self.outcomes += 1
+        if outcome == OUTCOME_OK:
+            self.successes += 1
+            if seconds is not None:
+                self.latencies.append(seconds / work if work else seconds)
+
+        if self.outcomes < max(MIN_WINDOW, math.ceil(self.limit)):
+            return None
+        return self._close_window()
+
+    def _close_window(self):
+        """Итог окна: рост, удержание или уменьшение лимита"""
+        success_rate = self.successes / self.outcomes
+        latency = sum(self.latencies) / len(self.latencies) if self.latencies else None
+        self._reset_window()
+
+        if success_rate < SUCCESS_THRESHOLD:
+            return self._decrease()
+
+        inflated = False
+        if latency is not None:
+            if self.baseline is not None:
+                inflated = latency > self.baseline * LATENCY_TOLERANCE
+                self.baseline = min(self.baseline * BASELINE_DRIFT, latency)
+            else:
+                self.baseline = latency
+
+        if inflated or self.limit >= self.high:
+            return None
+        self.limit = min(self.limit + INCREASE_STEP, self.high)
+        return int(self.limit)
+
+    def _decrease(self):
+        previous = int(self.limit)
+        self.limit = max(self.limit * DECREASE_FACTOR, self.low)
+        self.grace = previous
+        self._reset_window()
+        return int(self.limit) if int(self.limit) != previous else None
+
+
+class AimdController:
+    """
+    Автоподбор лимитов нескольких стадий (потокобезопасно)
+    stages - {стадия: (начальный лимит, минимум, максимум)}
+    apply(стадия, лимит) - применить новый лимит (например, StageLimits.resize)
+    log - куда сообщать об изменениях (например, safe_print)
+    """
+
+    def __init__(self, stages, apply, log=None):
+        self.stages = {
+            name: StageController(name, limit, low, high) for name, (limit, low, high) in stages.items()
+        }
+        self.apply = apply
+        self.log = log
+        self.lock = threading.Lock()
+        for name, stage in self.stages.items():
+            apply(name, int(stage.limit))
+
+    def record(self, stage, outcome, seconds=None, work=None):
+        """Учесть исход работы в стадии (неизвестные стадии не подстраиваются)"""
+        controller = self.stages.get(stage)
+        if controller is None:
+            return
+        with self.lock:
+            previous = int(controller.limit)
+            limit = controller.record(outcome, seconds, work)
+        if limit is None:
+            return
+        self.apply(stage, limit)
+        if self.log is not None:
+            arrow = "⬆️" if limit > previous else "⬇️"
+            self.log(f"  {arrow} Параллельность '{stage}': {previous} → {limit}")
+
+    def limits(self):
+        """Текущие лимиты стадий"""
+        with self.lock:
+            return {name: int(stage.limit) for name, stage in self.stages.items()}
+
+
+class ThreadLimit:
+    """Лимит одновременных работ для потоков, который можно менять на ходу"""
+
+    def __init__(self, value):
+        self.value = value
+        self.active = 0
+        self.closed = False
+        self.condition = threading.Condition()
+
+    def resize(self, value):
+        """Новый лимит (уже запущенные работы доживают, новые ждут)"""
+        with self.condition:
+            self.value = value
+            self.condition.notify_all()
+
+    def close(self):
+        """Отменить ожидание: потоки, ещё не начавшие работу, получат RuntimeError (Ctrl+C)"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def __enter__(self):
+        with self.condition:
+            while self.active >= self.value and not self.closed:
+                self.condition.wait()
+            if self.closed:
+                raise RuntimeError("Обработка остановлена")
+            self.active += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        with self.condition:
+            self.active -= 1
+            self.condition.notify()
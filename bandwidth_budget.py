@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Общий лимит скорости загрузки для параллельных задач
+yt-dlp не умеет менять скорость на лету, поэтому каждая загрузка
+получает долю при старте, а сумма долей никогда не превышает лимит
+Если вся полоса уже роздана, новая загрузка ждёт, пока кто-то её вернёт
+"""
+import asyncio
+import threading
+
+# Как часто проверять, не освободилась ли полоса, пока загрузка ждёт (сек)
+ASYNC_POLL_INTERVAL = 1
+
+
+class BandwidthBudget:
+    """
+    Делит limit_bytes (байт/сек) между активными загрузками (потокобезопасно)
+    slots - сколько загрузок может идти одновременно
+    """
+
+    def __init__(self, limit_bytes, slots):
+        self.limit_bytes = limit_bytes
+        self.slots = max(1, slots)
+        self.pending = 0
+        self.allocations = {}
+        self.condition = threading.Condition()
+
+    def add_jobs(self, count):
+        """Учесть задачи, которые ещё могут начать загрузку"""
+        with self.condition:
+            self.pending += count
+
+    def job_finished(self):
+        """Задача завершилась (успешно или нет) и больше не будет качать"""
+        with self.condition:
+            self.pending = max(0, self.pending - 1)
+
+    def resize(self, slots):
+        """Изменить число одновременных загрузок (доли уже идущих не меняются)"""
+        with self.condition:
+            self.slots = max(1, slots)
+
+    def _take(self, key):
+        """
+        Выделить долю из свободной полосы (вызывается под condition)
+        Свободная полоса делится между слотами, которые ещё могут быть заняты:
+        одиночное видео получает весь лимит, три параллельных - по трети.
+        Доля никогда не больше свободного остатка; None - свободной полосы нет
+        """
+        free = self.limit_bytes - sum(self.allocations.values())
+        if free <= 0:
+            return None
+        contenders = max(1, min(self.slots, self.pending) - len(self.allocations))
+        share = min(free, max(1, free // contenders))
+        self.allocations[key] = share
+        return share
+
+    def try_acquire(self, key):
+        """Доля скорости (байт/сек) без ожидания; 0 - вся полоса занята, надо подождать"""
+        if not self.limit_bytes:
+            return None
+        with self.condition:
+            return self._take(key) or 0
+
+    def acquire(self, key):
+        """
+        Получить долю скорости для загрузки (байт/сек), None - лимита нет
+        Если полоса роздана (например, одиночная загрузка взяла весь лимит,
+        а потом autoscale добавил слотов) - ждёт, пока другая загрузка её вернёт
+        """
+        if not self.limit_bytes:
+            return None
+        with self.condition:
+            share = self._take(key)
+            while share is None:
+                self.condition.wait()
+                share = self._take(key)
+            return share
+
+    async def acquire_async(self, key):
+        """То же что acquire, но ждёт не блокируя цикл asyncio"""
+        while True:
+            share = self.try_acquire(key)
+            if share != 0:
+                return share
+            await asyncio.sleep(ASYNC_POLL_INTERVAL)
+
+    def release(self, key):
+        """Вернуть долю загрузки в общий лимит"""
+        with self.condition:
+            if self.allocations.pop(key, None) is not None:
+                self.condition.notify_all()
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Каталог обработанных видео с полнотекстовым поиском
+Индекс FTS5 по оригинальному и переведённому названию и названию канала,
+метаданные (длительность, канал и его ID, путь к файлу, режим) - для фильтров и сортировки
+"""
+import re
+import sqlite3
+import threading
+from datetime import datetime
+
+# Поля записи каталога
+CATALOG_FIELDS = (
+    'video_id', 'url', 'original_title', 'title', 'channel', 'channel_id', 'duration', 'language',
+    'output_path', 'audio_only', 'is_short', 'file_size_kb', 'processed_at',
+)
+
+# Сортировки: колонка и направление по умолчанию (True = по убыванию)
+SORT_ORDERS = {
+    'date': ('c.processed_at', True),
+    'title': ('c.title', False),
+    'duration': ('c.duration', True),
+    'size': ('c.file_size_kb', True),
+    'relevance': ('bm25(catalog_fts)', False),  # Только вместе с поисковым запросом
+}
+
+# Вес совпадений в колонках при сортировке по релевантности (original_title, title, channel)
+RELEVANCE_WEIGHTS = (1.0, 2.0, 0.5)
+
+catalog_lock = threading.Lock()
+
+
+def build_match_query(text):
+    """
+    Запрос пользователя -> выражение MATCH для FTS5
+    Каждое слово ищется по префиксу, все слова должны найтись
+    """
+    words = re.findall(r'\w+', text)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+class Catalog:
+    """
+    Каталог библиотеки в базе (потокобезопасно)
+    Индекс FTS5 обновляется триггерами, поэтому запись - обычный INSERT/UPDATE
+    """
+
+    def __init__(self, database):
+        self.database = database
+        self._init_tables()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.database)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_tables(self):
+        """Создать таблицы каталога и перенести видео, обработанные до появления каталога"""
+        with catalog_lock:
+            conn = self._connect()
+            conn.executescript('''
+                CREATE TABLE IF NOT EXISTS catalog (
+                    video_id TEXT PRIMARY KEY,
+                    url TEXT,
+                    original_title TEXT,
+                    title TEXT,
+                    channel TEXT,
+                    channel_id TEXT,
+                    duration REAL,
+                    language TEXT,
+                    output_path TEXT,
+                    audio_only INTEGER NOT NULL DEFAULT 0,
+                    is_short INTEGER NOT NULL DEFAULT 0,
+                    file_size_kb REAL,
+                    processed_at TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS catalog_processed_at ON catalog (processed_at);
+                CREATE INDEX IF NOT EXISTS catalog_channel ON catalog (channel COLLATE NOCASE);
+                CREATE INDEX IF NOT EXISTS catalog_duration ON catalog (duration);
+
+                CREATE VIRTUAL TABLE IF NOT EXISTS catalog_fts USING fts5 (
+                    original_title, title, channel,
+                    content='catalog', content_rowid='rowid',
+                    tokenize='unicode61 remove_diacritics 2'
+                );
+
+                CREATE TRIGGER IF NOT EXISTS catalog_ai AFTER INSERT ON catalog BEGIN
+                    INSERT INTO catalog_fts (rowid, original_title, title, channel)
+                    VALUES (new.rowid, new.original_title, new.title, new.channel);
+                END;
+                CREATE TRIGGER IF NOT EXISTS catalog_ad AFTER DELETE ON catalog BEGIN
+                    INSERT INTO catalog_fts (catalog_fts, rowid, original_title, title, channel)
+                    VALUES ('delete', old.rowid, old.original_title, old.title, old.channel);
+                END;
+                CREATE TRIGGER IF NOT EXISTS catalog_au AFTER UPDATE ON catalog BEGIN
+                    INSERT INTO catalog_fts (catalog_fts, rowid, original_title, title, channel)
+                    VALUES ('delete', old.rowid, old.original_title, old.title, old.channel);
+                    INSERT INTO catalog_fts (rowid, original_title, title, channel)
+                    VALUES (new.rowid, new.original_title, new.title, new.channel);
+                END;
+            ''')
+
+            # Каталог без channel_id: в channel тогда писался ID канала - переносим его в свою колонку
+            columns = {row['name'] for row in conn.execute("PRAGMA table_info(catalog)")}
+            if 'channel_id' not in columns:
+                conn.execute("ALTER TABLE catalog ADD COLUMN channel_id TEXT")
+                conn.execute('''
+                    UPDATE catalog SET channel_id = channel, channel = NULL
+                    WHERE channel GLOB 'UC*' AND length(channel) = 24
+                ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS catalog_channel_id ON catalog (channel_id)")
+
+            # Старые записи processed_videos - только то, что там есть
+            has_processed = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'processed_videos'"
+            ).fetchone()
+            if has_processed:
+                conn.execute('''
+                    INSERT INTO catalog (video_id, url, title, file_size_kb, processed_at)
+                    SELECT video_id, url, title, file_size_kb, processed_at FROM processed_videos p
+                    WHERE NOT EXISTS (SELECT 1 FROM catalog c WHERE c.video_id = p.video_id)
+                ''')
+            conn.commit()
+            conn.close()
+
+    def record(self, video_id, **fields):
+        """
+        Добавить или обновить запись о видео
+        fields - любые поля из CATALOG_FIELDS; не переданные остаются как были
+        """
+        unknown = set(fields) - set(CATALOG_FIELDS)
+        if unknown:
+            raise ValueError(f"Неизвестные поля каталога: {', '.join(sorted(unknown))}")
+        # Дата обработки ставится только новой записи, если не передана явно
+        values = dict(fields, processed_at=fields.get('processed_at') or datetime.now().isoformat())
+
+        columns = ['video_id'] + list(values)
+        # UPSERT, а не INSERT OR REPLACE: REPLACE не вызывает триггер удаления и портит индекс
+        updates = ', '.join(f"{column} = excluded.{column}" for column in fields)
+        conflict = f"DO UPDATE SET {updates}" if updates else "DO NOTHING"
+        with catalog_lock:
+            conn = self._connect()
+            conn.execute(
+                f"INSERT INTO catalog ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+                f"ON CONFLICT (video_id) {conflict}",
+                [video_id] + list(values.values())
+            )
+            conn.commit()
+            conn.close()
+
+    def remove(self, video_ids):
+        """Удалить видео из каталога"""
+        with catalog_lock:
+            conn = self._connect()
+            conn.executemany("DELETE FROM catalog WHERE video_id = ?", [(video_id,) for video_id in video_ids])
+            conn.commit()
+            conn.close()
+
+    def output_path(self, video_id):
+        """Путь к готовому файлу видео (None, если неизвестен)"""
+        with catalog_lock:
+            conn = self._connect()
+            row = conn.execute("SELECT output_path FROM catalog WHERE video_id = ?", (video_id,)).fetchone()
+            conn.close()
+        return row[0] if row else None
+
+    def paths(self):
+        """Пути ко всем известным готовым файлам: {video_id: путь}"""
+        with catalog_lock:
+            conn = self._connect()
+            rows = conn.execute("SELECT video_id, output_path FROM catalog WHERE output_path IS NOT NULL").fetchall()
+            conn.close()
+        return {video_id: path for video_id, path in rows}
+
+    def search(self, query=None, channel=None, min_duration=None, max_duration=None,
+               audio_only=None, shorts=None, sort=None, descending=None, limit=50):
+        """
+        Найти видео
+        query - слова из названия (оригинального или переведённого) или канала
+        channel - название канала (без учёта регистра) или его ID
+        audio_only/shorts - None: все, True/False: только такие / только не такие
+        sort - ключ SORT_ORDERS (по умолчанию: релевантность для запроса, иначе дата)
+        Возвращает список словарей с полями CATALOG_FIELDS
+        """
+        match = build_match_query(query) if query else ''
+        sort = sort or ('relevance' if match else 'date')
+        if sort not in SORT_ORDERS:
+            raise ValueError(f"Неизвестная сортировка: {sort} (доступны: {', '.join(SORT_ORDERS)})")
+        if sort == 'relevance' and not match:
+            sort = 'date'
+
+        conditions = []
+        params = []
+        if match:
+            source = "catalog_fts JOIN catalog c ON c.rowid = catalog_fts.rowid"
+            conditions.append("catalog_fts MATCH ?")
+            params.append(match)
+        else:
+            source = "catalog c"
+        if channel:
+            conditions.append("(c.channel = ? COLLATE NOCASE OR c.channel_id = ?)")
+            params += [channel, channel]
+        if min_duration is not None:
+            conditions.append("c.duration >= ?")
+            params.append(min_duration)
+        if max_duration is not None:
+            conditions.append("c.duration <= ?")
+            params.append(max_duration)
+        if audio_only is not None:
+            conditions.append("c.audio_only = ?")
+            params.append(int(audio_only))
+        if shorts is not None:
+            conditions.append("c.is_short = ?")
+            params.append(int(shorts))
+
+        column, default_descending = SORT_ORDERS[sort]
+        if sort == 'relevance':
+            column = f"bm25(catalog_fts, {', '.join(map(str, RELEVANCE_WEIGHTS))})"
+        direction = "DESC" if (default_descending if descending is None else descending) else "ASC"
+
+        sql = f"SELECT c.* FROM {source}"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        # Видео без значения сортировки (старые записи) - в конце
+        sql += f" ORDER BY {column} IS NULL, {column} {direction} LIMIT ?"
+        params.append(limit)
+
+        with catalog_lock:
+            conn = self._connect()
+            rows = conn.execute(sql, params).fetchall()
+            conn.close()
+        return [dict(row) for row in rows]
+
+    def count(self):
+        """Сколько видео в каталоге"""
+        with catalog_lock:
+            conn = self._connect()
+            total = conn.execute("SELECT COUNT(*) FROM catalog").fetchone()[0]
+            conn.close()
+        return total
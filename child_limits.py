@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Ограничения дочерних процессов по стадиям: потоки, приоритет, ядра и память
+Без них каждый ffmpeg заводит потоков по числу ядер, и два микширования с анализом
+громкости отнимают процессор у yt-dlp, node и самого цикла задач. Здесь каждой стадии
+выделяется своя доля машины, посчитанная от числа ядер и лимита стадии (STAGE_LIMITS)
+Применяется при запуске: runner.run_command(cmd, limits=policies.get('mix'))
+    ffmpeg - число потоков декодеров и фильтров
+    node (vot-cli-live) - размер кучи V8 и пула потоков libuv
+    POSIX - nice, привязка к ядрам, RLIMIT_AS; если задана cgroup v2 - ещё и общий
+            лимит стадии на процессор и память (вместе с потомками, например node из npx)
+    Windows - только класс приоритета
+"""
+import os
+import subprocess
+import threading
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Ограничения стадий; ключи:
+#   threads - потоков на процесс: число, 'auto' (ядра стадии / её лимит) или None (как решит программа)
+#   nice - приоритет 0..19 (больше - уступает остальным)
+#   skip_cores - не занимать первые N ядер (на них остаются цикл задач, yt-dlp и node)
+#   memory_mb - предел памяти процесса (RLIMIT_AS); не для node и yt-dlp: V8 резервирует адреса
+#               заранее, а yt-dlp сам запускает node/deno для проверок YouTube
+#   node_heap_mb - предел кучи node
+# Стадия без записи получает 'default'
+DEFAULT_STAGE_POLICIES = {
+    'info': {'nice': 5},
+    'download': {},  # Загрузка упирается в сеть, а не в процессор
+    'vot': {'nice': 5, 'threads': 2, 'node_heap_mb': 512},
+    'analyze': {'nice': 10, 'threads': 'auto', 'skip_cores': 1, 'memory_mb': 1024},
+    'mix': {'nice': 5, 'threads': 'auto', 'skip_cores': 1, 'memory_mb': 4096},
+    'package': {'nice': 10, 'threads': 1, 'memory_mb': 1024},  # Нарезка HLS без перекодирования
+    'default': {},
+}
+
+# skip_cores действует, только если стадии останется хотя бы столько ядер
+MIN_STAGE_CORES = 2
+
+# Период квоты процессора cgroup v2 (мкс)
+CGROUP_CPU_PERIOD = 100000
+
+
+def available_cores():
+    """Ядра, на которых разрешено работать этому процессу"""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def program_name(argv):
+    """Имя программы без пути и расширения: 'C:/ffmpeg/bin/ffmpeg.exe' -> 'ffmpeg'"""
+    return os.path.splitext(os.path.basename(str(argv[0])))[0].lower()
+
+
+class ChildPolicy:
+    """Ограничения для процессов одной стадии"""
+
+    def __init__(self, stage, threads=None, nice=0, cores=None, memory_mb=None, node_heap_mb=None, cgroup=None):
+        self.stage = stage
+        self.threads = threads
+        self.nice = nice
+        self.cores = cores  # None - все доступные
+        self.memory_mb = memory_mb
+        self.node_heap_mb = node_heap_mb
+        self.cgroup = cgroup  # Папка cgroup v2 стадии или None
+
+    def prepare(self, argv):
+        """
+        Команда и дополнительные параметры Popen для запуска под этими ограничениями
+        Возвращает: (argv, {параметры Popen})
+        """
+        argv = list(argv)
+        if self.threads and program_name(argv) == 'ffmpeg':
+            threads = str(self.threads)
+            # -threads перед каждым -i - потоки декодера этого входа; фильтры - глобально
+            limited = argv[:1] + ['-filter_threads', threads, '-filter_complex_threads', threads]
+            for arg in argv[1:]:
+                if arg == '-i':
+                    limited += ['-threads', threads]
+                limited.append(arg)
+            argv = limited
+
+        extra = {}
+        if self.node_heap_mb or (self.threads and program_name(argv) in ('node', 'npx', 'vot-cli-live')):
+            env = dict(os.environ)
+            if self.node_heap_mb:
+                env['NODE_OPTIONS'] = f"{env.get('NODE_OPTIONS', '')} --max-old-space-size={self.node_heap_mb}".strip()
+            if self.threads:
+                env['UV_THREADPOOL_SIZE'] = str(self.threads)
+            extra['env'] = env
+        if os.name == 'nt' and self.nice > 0:
+            extra['creationflags'] = (subprocess.IDLE_PRIORITY_CLASS if self.nice >= 15
+                                      else subprocess.BELOW_NORMAL_PRIORITY_CLASS)
+        return argv, extra
+
+    def attach(self, pid):
+        """
+        Применить ограничения к только что запущенному процессу (POSIX)
+        Делается снаружи, а не в preexec_fn: preexec_fn небезопасен в программе с потоками.
+        Потомки, которых процесс запустит дальше, наследуют всё это сами
+        """
+        if os.name == 'nt':
+            return
+        try:
+            if self.cgroup:
+                with open(os.path.join(self.cgroup, 'cgroup.procs'), 'w') as f:
+                    f.write(str(pid))
+            if self.nice > 0:
+                # Понизить приоритет можно, повысить без прав - нет
+                os.setpriority(os.PRIO_PROCESS, pid, max(self.nice, os.getpriority(os.PRIO_PROCESS, 0)))
+            if self.cores and hasattr(os, 'sched_setaffinity'):
+                os.sched_setaffinity(pid, self.cores)
+            if self.memory_mb and resource is not None and hasattr(resource, 'prlimit'):
+                limit = self.memory_mb * 1024**2
+                resource.prlimit(pid, resource.RLIMIT_AS, (limit, limit))
+        except (OSError, ValueError):
+            # Процесс уже завершился или система не даёт - работаем без ограничения
+            pass
+
+    def describe(self):
+        """Кратко для лога: 'mix: потоков 2, nice 5, ядра 1-7, 4096MB'"""
+        parts = []
+        if self.threads:
+            parts.append(f"потоков {self.threads}")
+        if self.nice:
+            parts.append(f"nice {self.nice}")
+        if self.cores:
+            parts.append(f"ядра {self.cores[0]}-{self.cores[-1]}")
+        if self.memory_mb:
+            parts.append(f"{self.memory_mb}MB")
+        if self.node_heap_mb:
+            parts.append(f"куча node {self.node_heap_mb}MB")
+        if self.cgroup:
+            parts.append("cgroup")
+        return f"{self.stage}: {', '.join(parts) or 'без ограничений'}"
+
+
+class StagePolicies:
+    """
+    Ограничения всех стадий, посчитанные под эту машину (потокобезопасно)
+    overrides - {стадия: {ключ: значение}} поверх DEFAULT_STAGE_POLICIES; {стадия: None} - без ограничений
+    stage_limits - одновременных процессов на стадию (для threads='auto' и лимитов cgroup)
+    cgroup_root - делегированная папка cgroup v2 (с контроллерами cpu и memory) или None
+    """
+
+    def __init__(self, overrides=None, stage_limits=None, cgroup_root=None, log=None):
+        self.settings = dict(DEFAULT_STAGE_POLICIES)
+        for stage, settings in (overrides or {}).items():
+            self.settings[stage] = None if settings is None else dict(self.settings.get(stage) or {}, **settings)
+        self.stage_limits = stage_limits or {}
+        self.cgroup_root = cgroup_root
+        self.log = log
+        self.policies = {}
+        self.lock = threading.Lock()
+
+    def get(self, stage):
+        """ChildPolicy стадии (считается при первом запросе)"""
+        with self.lock:
+            if stage not in self.policies:
+                self.policies[stage] = self._build(stage)
+            return self.policies[stage]
+
+    def _build(self, stage):
+        settings = self.settings.get(stage, self.settings.get('default'))
+        if settings is None:
+            return ChildPolicy(stage)
+
+        cores = available_cores()
+        skip = settings.get('skip_cores', 0)
+        pinned = cores[skip:] if skip and len(cores) - skip >= MIN_STAGE_CORES else None
+        stage_cores = len(pinned or cores)
+
+        threads = settings.get('threads')
+        if threads == 'auto':
+            threads = max(1, stage_cores // max(1, self.stage_limits.get(stage, 1)))
+
+        policy = ChildPolicy(stage, threads, settings.get('nice', 0), pinned,
+                             settings.get('memory_mb'), settings.get('node_heap_mb'))
+        if self.cgroup_root:
+            policy.cgroup = self._create_cgroup(stage, stage_cores, settings.get('memory_mb'))
+            if policy.cgroup:
+                # Память стадии ограничена в cgroup вместе с потомками - RLIMIT_AS не нужен
+                policy.memory_mb = None
+        return policy
+
+    def _create_cgroup(self, stage, stage_cores, memory_mb):
+        """Папка cgroup стадии с лимитом процессора и памяти; None, если cgroup недоступна"""
+        path = os.path.join(self.cgroup_root, stage)
+        try:
+            if not os.path.exists(os.path.join(self.cgroup_root, 'cgroup.controllers')):
+                raise OSError("это не папка cgroup v2")
+            os.makedirs(path, exist_ok=True)
+            with open(os.path.join(path, 'cpu.max'), 'w') as f:
+                f.write(f"{stage_cores * CGROUP_CPU_PERIOD} {CGROUP_CPU_PERIOD}")
+            if memory_mb:
+                with open(os.path.join(path, 'memory.max'), 'w') as f:
+                    f.write(str(memory_mb * 1024**2 * max(1, self.stage_limits.get(stage, 1))))
+        except OSError as e:
+            if self.log is not None:
+                self.log(f"⚠️  cgroup {path} недоступна ({e}) - лимиты стадии {stage} без неё")
+            return None
+        return path
+
+    def describe(self, stages):
+        """Ограничения стадий одной строкой для лога"""
+        return "; ".join(self.get(stage).describe() for stage in stages)
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Контроль свободного места на диске для параллельных загрузок
+Каждая задача резервирует оценку своего объёма до начала скачивания
+Уже записанное задачей место видно в свободном месте диска, поэтому
+из свободного места вычитается только недописанный остаток резервов
+"""
+import asyncio
+import os
+import shutil
+import threading
+
+# Во сколько раз пик занятого места больше размера скачиваемого формата:
+# потоки yt-dlp + склеенный video.mp4 + финальная копия после микширования
+FOOTPRINT_FACTOR = 2.2
+
+# Запас на mp3 озвучки, превью и служебные файлы
+FOOTPRINT_OVERHEAD = 50 * 1024 * 1024
+
+# Как часто перепроверять свободное место, пока задача ждёт (освобождение резерва будит сразу)
+POLL_INTERVAL = 5
+
+
+def written_bytes(path):
+    """Сколько байт лежит в папке (со вложенными) или в файле; 0 если пути нет"""
+    try:
+        if not os.path.isdir(path):
+            return os.path.getsize(path)
+        total = 0
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    total += written_bytes(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    total += entry.stat(follow_symlinks=False).st_size
+        return total
+    except OSError:
+        # Папку удалили или файл переместили между проверками
+        return 0
+
+
+def estimate_footprint(filesize=None, duration=None, bitrate_kbps=5000):
+    """
+    Оценить сколько байт займёт задача на диске
+    filesize - размер формата от yt-dlp, иначе duration × bitrate
+    """
+    if filesize:
+        size = filesize
+    elif duration:
+        size = duration * bitrate_kbps * 1000 / 8
+    else:
+        # Ничего не известно - считаем как час видео
+        size = 3600 * bitrate_kbps * 1000 / 8
+
+    return int(size * FOOTPRINT_FACTOR + FOOTPRINT_OVERHEAD)
+
+
+class DiskBudget:
+    """
+    Резервирование места на диске (потокобезопасно)
+    budget_bytes - сколько могут занять все активные задачи (None = без лимита)
+    reserve_bytes - сколько места всегда оставлять свободным на каждом диске
+    """
+
+    def __init__(self, paths, budget_bytes=None, reserve_bytes=0):
+        self.paths = [p for p in paths if p]
+        self.budget_bytes = budget_bytes
+        self.reserve_bytes = reserve_bytes
+        self.reservations = {}
+        self.paths_written = {}  # {ключ: [папки задачи]} - куда она пишет свой объём
+        self.waiters = []  # [(цикл asyncio, Event)] - ждущие acquire_async
+        self.condition = threading.Condition()
+
+    def _free_space(self):
+        """Свободное место на каждой файловой системе (без дублей)"""
+        free = {}
+        for path in self.paths:
+            os.makedirs(path, exist_ok=True)
+            device = os.stat(path).st_dev
+            if device not in free:
+                free[device] = shutil.disk_usage(path).free
+        return free.values()
+
+    def reserved(self):
+        """Сколько байт сейчас зарезервировано"""
+        with self.condition:
+            return sum(self.reservations.values())
+
+    def _unwritten(self):
+        """Сколько из резервов ещё не записано на диск"""
+        return sum(max(0, nbytes - sum(written_bytes(path) for path in self.paths_written.get(key, ())))
+                   for key, nbytes in self.reservations.items())
+
+    def _fits(self, nbytes):
+        """Поместится ли задача прямо сейчас"""
+        reserved = sum(self.reservations.values())
+
+        if self.budget_bytes is not None and reserved + nbytes > self.budget_bytes:
+            # Задача больше всего бюджета - пускаем только в одиночку
+            if self.reservations:
+                return False
+
+        # Записанное уже вычтено из свободного места - второй раз его не считаем
+        unwritten = self._unwritten()
+        for free in self._free_space():
+            if free - unwritten - self.reserve_bytes < nbytes:
+                return False
+        return True
+
+    def _reserve(self, key, nbytes, paths):
+        self.reservations[key] = nbytes
+        self.paths_written[key] = [p for p in paths if p]
+
+    def track(self, key, path):
+        """Задача пишет свой объём ещё и в path (например, в папку докачки)"""
+        with self.condition:
+            if key in self.reservations:
+                self.paths_written[key].append(path)
+
+    def acquire(self, key, nbytes, paths=()):
+        """
+        Дождаться места и зарезервировать его
+        paths - папки, куда задача пишет (записанное в них вычитается из резерва)
+        Возвращает False если места нет даже без других задач
+        """
+        with self.condition:
+            while not self._fits(nbytes):
+                if not self.reservations:
+                    # Ждать некого - место не освободится само
+                    return False
+                self.condition.wait(timeout=POLL_INTERVAL)
+
+            self._reserve(key, nbytes, paths)
+            return True
+
+    def try_acquire(self, key, nbytes, paths=()):
+        """
+        Зарезервировать место без ожидания
+        Возвращает True (готово), None (надо подождать) или False (места нет совсем)
+        """
+        with self.condition:
+            if self._fits(nbytes):
+                self._reserve(key, nbytes, paths)
+                return True
+            return None if self.reservations else False
+
+    async def acquire_async(self, key, nbytes, paths=()):
+        """
+        То же что acquire, но не блокирует цикл asyncio:
+        проверка диска идёт в потоке, а ожидание просыпается от release (или раз в POLL_INTERVAL)
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            released = asyncio.Event()
+            waiter = (loop, released)
+            # Встаём в очередь до проверки, чтобы не пропустить release между ними
+            with self.condition:
+                self.waiters.append(waiter)
+            try:
+                status = await asyncio.to_thread(self.try_acquire, key, nbytes, paths)
+                if status is not None:
+                    return status
+                try:
+                    await asyncio.wait_for(released.wait(), POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+            finally:
+                with self.condition:
+                    self.waiters.remove(waiter)
+
+    def release(self, key):
+        """Освободить резерв задачи"""
+        with self.condition:
+            self.paths_written.pop(key, None)
+            if self.reservations.pop(key, None) is not None:
+                self.condition.notify_all()
+                for loop, released in self.waiters:
+                    loop.call_soon_threadsafe(released.set)
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Пул идентичностей для запросов к YouTube: файлы cookies и (по желанию) прокси
+Когда все задачи ходят с одними cookies, бот-проверка одной сессии останавливает всех.
+Каждый вызов yt-dlp получает самую здоровую свободную идентичность; после бот-проверки
+идентичность отдыхает (с каждым повтором дольше), у каждой свой бюджет запросов в час.
+Состояние хранится в базе: повторный запуск не станет сразу мучить помеченную сессию
+"""
+import asyncio
+import glob
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit
+
+from runner import run_command, run_command_async
+
+# Признаки того, что YouTube пометил сессию или адрес (без учёта регистра)
+BOT_CHECK_PATTERNS = (
+    "not a bot", "sign in to confirm", "error 429", "code 429", "too many requests", "captcha",
+)
+
+# Отдых после бот-проверки: базовый, удваивается с каждой проверкой подряд
+COOLDOWN_SECONDS = 600
+MAX_COOLDOWN_SECONDS = 6 * 3600
+
+# Запросов yt-dlp на идентичность в час (None = без лимита); видео стоит два запроса - данные и загрузка
+REQUEST_BUDGET_PER_HOUR = None
+
+# Здоровье идентичности: 1.0 - всё хорошо; успех понемногу восстанавливает, бот-проверка - вдвое снижает
+HEALTH_RECOVERY = 0.05
+HEALTH_PENALTY = 0.5
+
+# Как часто проверять, не освободилась ли идентичность (сек)
+WAIT_INTERVAL = 5
+
+# Сколько идентичностей пробовать для одного вызова, если предыдущую пометили
+MAX_ATTEMPTS = 3
+
+identity_lock = threading.Lock()
+
+
+def is_bot_check(message):
+    """Похожа ли ошибка yt-dlp на бот-проверку или ограничение частоты"""
+    lowered = (message or "").lower()
+    return any(pattern in lowered for pattern in BOT_CHECK_PATTERNS)
+
+
+def load_proxies(proxies_file):
+    """Прокси из файла: по одному URL на строку, # - комментарий"""
+    if not proxies_file or not os.path.exists(proxies_file):
+        return []
+    with open(proxies_file, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.strip().startswith('#')]
+
+
+class Identity:
+    """Одна идентичность: cookies, прокси и их состояние"""
+
+    def __init__(self, name, cookies_file=None, proxy=None):
+        self.name = name
+        self.cookies_file = cookies_file
+        self.proxy = proxy
+        self.health = 1.0
+        self.strikes = 0  # Бот-проверок подряд
+        self.cooldown_until = 0.0
+        self.last_used = 0.0
+        self.requests = []  # Время запросов за последний час
+
+    def ytdlp_args(self):
+        """Аргументы yt-dlp для этой идентичности"""
+        args = []
+        if self.cookies_file and os.path.exists(self.cookies_file):
+            args += ['--cookies', self.cookies_file]
+        if self.proxy:
+            args += ['--proxy', self.proxy]
+        return args
+
+    def fingerprint(self):
+        """Версия cookies: новый файл (после обновления) - новая сессия со свежим здоровьем"""
+        if self.cookies_file and os.path.exists(self.cookies_file):
+            return str(os.stat(self.cookies_file).st_mtime_ns)
+        return ""
+
+    def label(self):
+        """Имя для лога (без логина и пароля прокси)"""
+        if not self.proxy:
+            return self.name
+        return f"{self.name}@{urlsplit(self.proxy).hostname or self.proxy}"
+
+
+class IdentityPool:
+    """
+    Пул идентичностей (потокобезопасно)
+    Использование: result = pool.run(cmd) или identity = pool.acquire() ... pool.report(identity, текст ошибки)
+    С одной идентичностью переключаться не на что: отдыха и ожидания нет, ошибка просто уходит в лог, как раньше
+    """
+
+    def __init__(self, identities, database=None, budget_per_hour=REQUEST_BUDGET_PER_HOUR, log=None):
+        self.identities = identities
+        self.database = database
+        self.budget_per_hour = budget_per_hour
+        self.log = log
+        self.loaded = not database
+        self.rotating = len(identities) > 1
+
+    def _connect(self):
+        conn = sqlite3.connect(self.database)
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS identity_state (
+                name TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                health REAL NOT NULL,
+                strikes INTEGER NOT NULL,
+                cooldown_until REAL NOT NULL
+            )
+        ''')
+        return conn
+
+    def _load_state(self):
+        """Здоровье и отдых с прошлого запуска (если cookies с тех пор не обновлялись); вызывать под identity_lock"""
+        self.loaded = True
+        conn = self._connect()
+        rows = {row[0]: row[1:] for row in conn.execute(
+            'SELECT name, fingerprint, health, strikes, cooldown_until FROM identity_state')}
+        conn.commit()
+        conn.close()
+        for identity in self.identities:
+            state = rows.get(identity.label())
+            if state and state[0] == identity.fingerprint():
+                identity.health, identity.strikes, identity.cooldown_until = state[1:]
+
+    def _save_state(self, identity):
+        if not self.database:
+            return
+        conn = self._connect()
+        conn.execute('''
+            INSERT OR REPLACE INTO identity_state (name, fingerprint, health, strikes, cooldown_until)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (identity.label(), identity.fingerprint(), identity.health, identity.strikes, identity.cooldown_until))
+        conn.commit()
+        conn.close()
+
+    def _pick(self, cost):
+        """Лучшая доступная идентичность и 0, или None и сколько ждать до освобождения"""
+        if not self.loaded:
+            self._load_state()
+        now = time.time()
+        best = None
+        wait = None
+        for identity in self.identities:
+            identity.requests = [moment for moment in identity.requests if moment > now - 3600]
+            if not self.rotating:
+                best = identity
+                break
+            ready_at = identity.cooldown_until
+            if self.budget_per_hour and len(identity.requests) + cost > self.budget_per_hour and identity.requests:
+                ready_at = max(ready_at, identity.requests[0] + 3600)
+            if ready_at > now:
+                wait = ready_at - now if wait is None else min(wait, ready_at - now)
+                continue
+            # Здоровее - лучше; из равных - та, что дольше отдыхала
+            if best is None or (identity.health, -identity.last_used) > (best.health, -best.last_used):
+                best = identity
+        if best is not None:
+            best.last_used = now
+            best.requests += [now] * cost
+            return best, 0
+        return None, wait
+
+    def acquire(self, cost=1):
+        """
+        Получить идентичность для вызова yt-dlp (cost - сколько видео в запросе)
+        Если все отдыхают или исчерпали бюджет - ждёт
+        """
+        while True:
+            with identity_lock:
+                identity, wait = self._pick(cost)
+            if identity is not None:
+                return identity
+            time.sleep(min(wait, WAIT_INTERVAL))
+
+    async def acquire_async(self, cost=1):
+        """То же, что acquire, для asyncio"""
+        while True:
+            with identity_lock:
+                identity, wait = self._pick(cost)
+            if identity is not None:
+                return identity
+            await asyncio.sleep(min(wait, WAIT_INTERVAL))
+
+    def report(self, identity, error=""):
+        """Итог вызова yt-dlp: текст ошибки (бот-проверка отправляет идентичность отдыхать) или ''"""
+        if not self.rotating:
+            return
+        flagged = is_bot_check(error)
+        with identity_lock:
+            if flagged and identity.cooldown_until > time.time():
+                # Запросы, начатые до пометки, - та же самая проверка, а не новая
+                return
+            if flagged:
+                cooldown = min(COOLDOWN_SECONDS * 2 ** identity.strikes, MAX_COOLDOWN_SECONDS)
+                identity.strikes += 1
+                identity.health *= HEALTH_PENALTY
+                identity.cooldown_until = time.time() + cooldown
+            elif identity.strikes or identity.health < 1.0:
+                identity.strikes = 0
+                identity.health = min(1.0, identity.health + HEALTH_RECOVERY)
+            else:
+                return
+            self._save_state(identity)
+        if flagged and self.log is not None:
+            self.log(f"  🍪 Идентичность {identity.label()} помечена YouTube - отдых {cooldown // 60} мин")
+
+    def attempts(self):
+        """Сколько раз пробовать вызов (с одной идентичностью повторять бессмысленно)"""
+        return min(MAX_ATTEMPTS, len(self.identities))
+
+    def run(self, cmd, cost=1, **kwargs):
+        """
+        Запустить yt-dlp (cmd без cookies и прокси) с идентичностью из пула
+        После бот-проверки повторяет с другой идентичностью; kwargs - как у run_command
+        """
+        for _ in range(self.attempts()):
+            identity = self.acquire(cost)
+            result = run_command(cmd[:1] + identity.ytdlp_args() + cmd[1:], **kwargs)
+            errors = '\n'.join(result.stderr.errors)
+            self.report(identity, errors)
+            if not is_bot_check(errors):
+                break
+        return result
+
+    async def run_async(self, cmd, cost=1, **kwargs):
+        """То же, что run, для asyncio"""
+        for _ in range(self.attempts()):
+            identity = await self.acquire_async(cost)
+            result = await run_command_async(cmd[:1] + identity.ytdlp_args() + cmd[1:], **kwargs)
+            errors = '\n'.join(result.stderr.errors)
+            self.report(identity, errors)
+            if not is_bot_check(errors):
+                break
+        return result
+
+    def status(self):
+        """Сводка для лога: [(имя, здоровье, секунд отдыха)]"""
+        now = time.time()
+        with identity_lock:
+            return [(identity.label(), identity.health, max(0, identity.cooldown_until - now))
+                    for identity in self.identities]
+
+
+def create_identity_pool(cookies_file, cookies_dir=None, proxies_file=None, database=None, log=None):
+    """
+    Пул из файлов cookies в cookies_dir (*.txt) и прокси из proxies_file
+    Cookies и прокси идут парами по порядку (прокси по кругу, если их меньше);
+    только прокси - каждый с общим cookies_file; ничего - одна идентичность cookies_file, как раньше
+    """
+    cookie_files = sorted(glob.glob(os.path.join(cookies_dir, "*.txt"))) if cookies_dir else []
+    proxies = load_proxies(proxies_file)
+
+    if cookie_files:
+        identities = [
+            Identity(os.path.splitext(os.path.basename(path))[0], path, proxies[i % len(proxies)] if proxies else None)
+            for i, path in enumerate(cookie_files)
+        ]
+    elif proxies:
+        identities = [Identity(f"proxy{i + 1}", cookies_file, proxy) for i, proxy in enumerate(proxies)]
+    else:
+        identities = [Identity(os.path.splitext(os.path.basename(cookies_file))[0], cookies_file)]
+
+    return IdentityPool(identities, database, log=log)
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Раскладка готовых файлов по подпапкам
+В одной папке с десятками тысяч файлов медленно всё: листинг, проводник, поиск по маске.
+Файлы раскладываются по каналу, месяцу обработки или началу ID видео, а путь к каждому
+хранится в каталоге (catalog.output_path) - искать файл сканированием папок не нужно
+"""
+import os
+import re
+import shutil
+from datetime import datetime
+
+LAYOUT_FLAT = "flat"  # Все файлы в output/videos и output/shorts, как раньше
+LAYOUT_CHANNEL = "channel"  # output/videos/<канал>/
+LAYOUT_DATE = "date"  # output/videos/<год>/<месяц>/ (по дате обработки)
+LAYOUT_PREFIX = "prefix"  # output/videos/<первые символы ID>/ - равномерно и без метаданных
+OUTPUT_LAYOUTS = (LAYOUT_FLAT, LAYOUT_CHANNEL, LAYOUT_DATE, LAYOUT_PREFIX)
+
+# Сколько первых символов ID в имени папки (2 символа - до ~1300 папок)
+PREFIX_LENGTH = 2
+
+# Папка для видео без известного канала
+UNKNOWN_CHANNEL = "_без канала"
+
+# Файлы рядом с готовым, которые переносятся вместе с ним (.hls - папка HLS, см. stream_packaging.py)
+SIDECAR_EXTENSIONS = ('.jpg', '.hls')
+
+
+def channel_folder(channel):
+    """Имя папки канала (без недопустимых символов и точек в конце - Windows их не любит)"""
+    name = re.sub(r'[<>:"/\\|?*\x00-\x1f]', '', channel or '').strip().rstrip('.')
+    return name[:100] or UNKNOWN_CHANNEL
+
+
+def shard_path(layout, video_id, channel=None, processed_at=None):
+    """
+    Подпапка файла относительно output/videos (output/shorts) - '' для плоской раскладки
+    processed_at - дата обработки (datetime или строка ISO), по умолчанию - сейчас
+    """
+    if layout == LAYOUT_FLAT:
+        return ''
+    if layout == LAYOUT_CHANNEL:
+        return channel_folder(channel)
+    if layout == LAYOUT_DATE:
+        if isinstance(processed_at, str):
+            processed_at = datetime.fromisoformat(processed_at)
+        processed_at = processed_at or datetime.now()
+        return os.path.join(f"{processed_at.year:04d}", f"{processed_at.month:02d}")
+    if layout == LAYOUT_PREFIX:
+        # В нижнем регистре: на Windows "Ab" и "ab" - одна и та же папка
+        return video_id[:PREFIX_LENGTH].lower()
+    raise ValueError(f"Неизвестная раскладка: {layout} (доступны: {', '.join(OUTPUT_LAYOUTS)})")
+
+
+def shard_dir(target_dir, layout, video_id, channel=None, processed_at=None):
+    """Папка для готового файла (создаётся при необходимости)"""
+    directory = os.path.join(target_dir, shard_path(layout, video_id, channel, processed_at))
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def move_with_sidecars(path, directory):
+    """
+    Перенести готовый файл и его превью в другую папку
+    Возвращает новый путь к файлу
+    """
+    os.makedirs(directory, exist_ok=True)
+    stem = os.path.splitext(path)[0]
+    for ext in SIDECAR_EXTENSIONS:
+        # Без mp4 готовый результат - сама папка HLS
+        if stem + ext != path and os.path.exists(stem + ext):
+            shutil.move(stem + ext, os.path.join(directory, os.path.basename(stem + ext)))
+    destination = os.path.join(directory, os.path.basename(path))
+    shutil.move(path, destination)
+    return destination
+
+
+def remove_empty_dirs(root):
+    """Удалить пустые подпапки root (после смены раскладки), сама root остаётся"""
+    removed = 0
+    for directory, _, _ in sorted(os.walk(root), key=lambda item: -len(item[0])):
+        if directory != root and not os.listdir(directory):
+            os.rmdir(directory)
+            removed += 1
+    return removed
@@ -0,0 +1,20 @@
+@echo off
+chcp 65001 >nul
+title Search Video Library
+color 0A
+
+cls
+echo ========================================
+echo   Search processed videos
+echo   By original or translated title, channel
+echo ========================================
+echo.
+
+set "query="
+set /p query="Search (empty = latest videos): "
+
+echo.
+python library.py %query%
+
+echo.
+pause
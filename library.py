@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Поиск по библиотеке обработанных видео
+Ищет по оригинальному и переведённому названию и каналу, с фильтрами и сортировкой
+Пример: python library.py "machine learning" --channel "3Blue1Brown" --sort duration
+"""
+import argparse
+import sys
+
+from catalog import SORT_ORDERS, Catalog
+from progress import format_clock
+from run2 import DATABASE, safe_print
+
+
+def parse_minutes(value):
+    """Длительность из аргумента: минуты (10) или мм:сс (10:30) -> секунды"""
+    minutes, _, seconds = value.partition(':')
+    return int(minutes) * 60 + (int(seconds) if seconds else 0)
+
+
+def format_entry(entry):
+    """Строка результата поиска"""
+    icon = "🎧" if entry['audio_only'] else ("📱" if entry['is_short'] else "📹")
+    title = entry['title'] or entry['video_id']
+    details = [entry['video_id']]
+    if entry['channel']:
+        details.append(entry['channel'])
+    if entry['duration']:
+        details.append(format_clock(entry['duration']))
+    if entry['file_size_kb']:
+        details.append(f"{entry['file_size_kb']/1024:.1f}MB")
+    details.append(entry['processed_at'][:10])
+
+    lines = [f"{icon} {title}", f"     {' | '.join(details)}"]
+    if entry['original_title'] and entry['original_title'] != title:
+        lines.insert(1, f"     {entry['original_title']}")
+    if entry['output_path']:
+        lines.append(f"     {entry['output_path']}")
+    return '\n'.join(lines)
+
+
+def main():
+    """Главная функция"""
+    parser = argparse.ArgumentParser(description="Поиск по библиотеке обработанных видео")
+    parser.add_argument('query', nargs='*', help="Слова из названия или канала (по началу слова)")
+    parser.add_argument('--channel', help="Только видео этого канала (название или ID)")
+    parser.add_argument('--min-duration', type=parse_minutes, help="Не короче (минуты или мм:сс)")
+    parser.add_argument('--max-duration', type=parse_minutes, help="Не длиннее (минуты или мм:сс)")
+    kind = parser.add_mutually_exclusive_group()
+    kind.add_argument('--shorts', action='store_true', help="Только Shorts")
+    kind.add_argument('--videos', action='store_true', help="Только обычные видео")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--audio', action='store_true', help="Только режим \"только аудио\"")
+    mode.add_argument('--no-audio', action='store_true', help="Только видео с картинкой")
+    parser.add_argument('--sort', choices=list(SORT_ORDERS), help="Сортировка (по умолчанию: релевантность или дата)")
+    order = parser.add_mutually_exclusive_group()
+    order.add_argument('--asc', action='store_true', help="По возрастанию")
+    order.add_argument('--desc', action='store_true', help="По убыванию")
+    parser.add_argument('--limit', type=int, default=50)
+    args = parser.parse_args()
+
+    catalog = Catalog(DATABASE)
+    results = catalog.search(
+        ' '.join(args.query) or None,
+        channel=args.channel,
+        min_duration=args.min_duration,
+        max_duration=args.max_duration,
+        audio_only=True if args.audio else (False if args.no_audio else None),
+        shorts=True if args.shorts else (False if args.videos else None),
+        sort=args.sort,
+        descending=True if args.desc else (False if args.asc else None),
+        limit=args.limit,
+    )
+
+    if not results:
+        safe_print(f"🔍 Ничего не найдено (в библиотеке {catalog.count()} видео)")
+        return 1
+
+    for entry in results:
+        safe_print(format_entry(entry))
+    safe_print(f"\n🔍 Найдено: {len(results)}" + (f" (показаны первые {args.limit})" if len(results) == args.limit else ""))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Автоматическая громкость микса по замерам дорожек
+Оригинал и озвучка декодируются одним запуском ffmpeg в общий PCM-поток (по каналу на дорожку),
+громкость и доля речи считаются по ходу чтения, блоками - весь звук в памяти не держится
+Замеры хранятся в базе и переиспользуются при повторном сведении (remix)
+"""
+import array
+import importlib.util
+import math
+import operator
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+
+# numpy импортируется при первом замере, а не при запуске
+NUMPY_AVAILABLE = importlib.util.find_spec('numpy') is not None
+
+from runner import run_command, run_command_async
+
+# Режимы громкости микса
+MIX_LEVELS_FIXED = "fixed"  # Громкость как задана (5% / 58%)
+MIX_LEVELS_AUTO = "auto"  # Громкость подбирается под замеры каждого видео
+MIX_LEVELS_DUCK = "duck"  # То же + оригинал приглушается, пока звучит перевод
+
+MIX_LEVEL_MODES = (MIX_LEVELS_FIXED, MIX_LEVELS_AUTO, MIX_LEVELS_DUCK)
+
+# Параметры анализа: моно 16 кГц на дорожку, кадры по 100 мс
+ANALYSIS_SAMPLE_RATE = 16000
+FRAME_SECONDS = 0.1
+BLOCK_FRAMES = 4  # Блок гейтинга 400 мс с шагом 100 мс, как в BS.1770
+
+# Гейтинг интегральной громкости (BS.1770)
+ABSOLUTE_GATE_LUFS = -70
+RELATIVE_GATE_LU = 10
+
+# Кадр считается речью, если он не тише SPEECH_FLOOR_DBFS
+# и не тише средней громкости дорожки больше чем на SPEECH_RANGE_DB
+SPEECH_FLOOR_DBFS = -50
+SPEECH_RANGE_DB = 20
+
+# Цели сведения
+TARGET_DUB_LUFS = -16  # Громкость перевода
+ORIGINAL_BELOW_DUB_DB = 18  # Насколько оригинал тише перевода
+DUCK_ORIGINAL_BELOW_DUB_DB = 8  # То же с приглушением: в паузах перевода оригинал слышно лучше
+DUCK_MAX_SPEECH = 0.85  # Перевод звучит почти всё время - приглушать нечего, хватает громкости
+GAIN_RANGE = (0.005, 4.0)
+
+# amix делит сумму на число входов - громкости компенсируют это
+AMIX_INPUTS = 2
+
+# Приглушение оригинала по сигналу перевода (sidechaincompress)
+DUCK_FILTER = "sidechaincompress=threshold=0.03:ratio=8:attack=20:release=400"
+
+store_lock = threading.Lock()
+
+
+def frame_energies(data, channels, frame_samples):
+    """
+    Средний квадрат амплитуды по кадрам для чередующегося PCM s16le
+    Возвращает список кортежей (по значению на канал) - по кортежу на кадр
+    """
+    if NUMPY_AVAILABLE:
+        import numpy
+        samples = numpy.frombuffer(data, dtype='<i2').astype(numpy.float32) / 32768
+        frames = samples.reshape(-1, frame_samples, channels)
+        return numpy.mean(frames * frames, axis=1).tolist()
+
+    # Без numpy: тот же расчёт на array (медленнее, но без зависимостей)
+    samples = array.array('h')
+    samples.frombytes(data)
+    if sys.byteorder == 'big':
+        samples.byteswap()
+    step = frame_samples * channels
+    scale = frame_samples * 32768.0 ** 2
+    energies = []
+    for start in range(0, len(samples), step):
+        frame = samples[start:start + step]
+        energies.append(tuple(
+            sum(map(operator.mul, frame[channel::channels], frame[channel::channels])) / scale
+            for channel in range(channels)
+        ))
+    return energies
+
+
+def to_db(energy):
+    """Средний квадрат -> дБ (None для тишины)"""
+    return 10 * math.log10(energy) if energy > 0 else None
+
+
+def integrated_loudness(energies):
+    """
+    Интегральная громкость дорожки (LUFS) по энергиям 100-мс кадров
+    Гейтинг как в BS.1770, но без K-фильтра: для подбора громкости дорожек
+    относительно друг друга этого достаточно
+    Возвращает None, если дорожка - тишина
+    """
+    blocks = [
+        sum(energies[i:i + BLOCK_FRAMES]) / BLOCK_FRAMES
+        for i in range(max(len(energies) - BLOCK_FRAMES + 1, 0))
+    ]
+
+    def loudness(energy):
+        return -0.691 + 10 * math.log10(energy)
+
+    gated = [block for block in blocks if block > 0 and loudness(block) > ABSOLUTE_GATE_LUFS]
+    if not gated:
+        return None
+
+    relative_gate = loudness(sum(gated) / len(gated)) - RELATIVE_GATE_LU
+    gated = [block for block in gated if loudness(block) > relative_gate]
+    return round(loudness(sum(gated) / len(gated)), 2)
+
+
+def speech_ratio(energies, loudness):
+    """Доля кадров, где дорожка звучит (для озвучки - где идёт речь)"""
+    if not energies or loudness is None:
+        return 0.0
+    threshold = max(SPEECH_FLOOR_DBFS, loudness - SPEECH_RANGE_DB)
+    active = sum(1 for energy in energies if energy > 0 and to_db(energy) > threshold)
+    return round(active / len(energies), 3)
+
+
+class PcmMeter:
+    """
+    Замер дорожек по потоку PCM s16le (канал на дорожку)
+    Байты подаются блоками любого размера (run_command(on_stdout=meter.feed))
+    """
+
+    def __init__(self, channels=2, sample_rate=ANALYSIS_SAMPLE_RATE):
+        self.channels = channels
+        self.frame_samples = int(sample_rate * FRAME_SECONDS)
+        self.frame_bytes = self.frame_samples * channels * 2
+        self.buffer = b''
+        self.energies = []
+
+    def feed(self, chunk):
+        """Добавить байты; целые кадры считаются сразу, остаток ждёт следующего блока"""
+        self.buffer += chunk
+        usable = len(self.buffer) // self.frame_bytes * self.frame_bytes
+        if usable:
+            self.energies.extend(frame_energies(self.buffer[:usable], self.channels, self.frame_samples))
+            self.buffer = self.buffer[usable:]
+
+    def measure(self):
+        """[(громкость LUFS или None, доля речи), ...] - по элементу на канал"""
+        results = []
+        for channel in range(self.channels):
+            energies = [frame[channel] for frame in self.energies]
+            loudness = integrated_loudness(energies)
+            results.append((loudness, speech_ratio(energies, loudness)))
+        return results
+
+
+def build_analysis_command(source_file, dub_file):
+    """
+    Команда ffmpeg: звук оригинала и озвучки одним потоком PCM в stdout
+    Левый канал - оригинал, правый - озвучка (дополняется тишиной до длины оригинала)
+    """
+    pcm = f"aresample={ANALYSIS_SAMPLE_RATE},aformat=sample_fmts=s16:channel_layouts=mono"
+    return [
+        'ffmpeg', '-v', 'error', '-i', source_file, '-i', dub_file,
+        '-filter_complex', f"[0:a:0]{pcm}[original];[1:a:0]{pcm},apad[dub];[original][dub]amerge=inputs=2[pcm]",
+        '-map', '[pcm]', '-f', 's16le', '-ac', '2', 'pipe:1',
+    ]
+
+
+def _measurement(meter):
+    """Замеры в виде записи для базы"""
+    (original_lufs, original_speech), (dub_lufs, dub_speech) = meter.measure()
+    return {
+        'original_lufs': original_lufs,
+        'dub_lufs': dub_lufs,
+        'original_speech': original_speech,
+        'dub_speech': dub_speech,
+    }
+
+
+def analyze_tracks(source_file, dub_file, timeout=None, limits=None):
+    """
+    Замерить оригинал и озвучку одним проходом ffmpeg (для потоков)
+    limits - ограничения процесса (child_limits.ChildPolicy)
+    Возвращает словарь замеров или None, если ffmpeg не смог декодировать звук
+    """
+    meter = PcmMeter()
+    result = run_command(build_analysis_command(source_file, dub_file), timeout=timeout, on_stdout=meter.feed, limits=limits)
+    if result.returncode != 0 or not meter.energies:
+        return None
+    return _measurement(meter)
+
+
+async def analyze_tracks_async(source_file, dub_file, timeout=None, limits=None):
+    """То же что analyze_tracks, но для asyncio"""
+    meter = PcmMeter()
+    result = await run_command_async(build_analysis_command(source_file, dub_file), timeout=timeout, on_stdout=meter.feed, limits=limits)
+    if result.returncode != 0 or not meter.energies:
+        return None
+    return _measurement(meter)
+
+
+def _gain(db):
+    """Усиление в разах из дБ с учётом деления в amix, в допустимых пределах"""
+    low, high = GAIN_RANGE
+    return round(min(max(AMIX_INPUTS * 10 ** (db / 20), low), high), 4)
+
+
+def mix_levels(measurement, mode, video_volume, translation_volume):
+    """
+    Громкость микса для видео
+    Возвращает: (громкость оригинала, громкость перевода, приглушать ли оригинал)
+    Без замеров (или в режиме fixed) - заданные громкости без приглушения
+    """
+    if mode == MIX_LEVELS_FIXED or not measurement or measurement['dub_lufs'] is None:
+        return video_volume, translation_volume, False
+
+    duck = mode == MIX_LEVELS_DUCK and measurement['dub_speech'] < DUCK_MAX_SPEECH
+    translation_volume = _gain(TARGET_DUB_LUFS - measurement['dub_lufs'])
+
+    if measurement['original_lufs'] is not None:
+        below = DUCK_ORIGINAL_BELOW_DUB_DB if duck else ORIGINAL_BELOW_DUB_DB
+        video_volume = _gain(TARGET_DUB_LUFS - below - measurement['original_lufs'])
+
+    return video_volume, translation_volume, duck
+
+
+class LoudnessStore:
+    """Замеры громкости дорожек в базе: (video_id, голос) -> замеры"""
+
+    def __init__(self, database):
+        self.database = database
+        self._init_table()
+
+    def _init_table(self):
+        """Создать таблицу замеров"""
+        with store_lock:
+            conn = sqlite3.connect(self.database)
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS track_loudness (
+                    video_id TEXT NOT NULL,
+                    voice_style TEXT NOT NULL,
+                    original_lufs REAL,
+                    dub_lufs REAL,
+                    original_speech REAL,
+                    dub_speech REAL,
+                    analyzed_at TEXT NOT NULL,
+                    PRIMARY KEY (video_id, voice_style)
+                )
+            ''')
+            conn.commit()
+            conn.close()
+
+    def get(self, video_id, voice_style):
+        """Замеры видео или None"""
+        with store_lock:
+            conn = sqlite3.connect(self.database)
+            row = conn.execute('''
+                SELECT original_lufs, dub_lufs, original_speech, dub_speech
+                FROM track_loudness WHERE video_id = ? AND voice_style = ?
+            ''', (video_id, voice_style)).fetchone()
+            conn.close()
+
+        if not row:
+            return None
+        return dict(zip(('original_lufs', 'dub_lufs', 'original_speech', 'dub_speech'), row))
+
+    def put(self, video_id, voice_style, measurement):
+        """Сохранить замеры видео"""
+        with store_lock:
+            conn = sqlite3.connect(self.database)
+            conn.execute('''
+                INSERT OR REPLACE INTO track_loudness
+                    (video_id, voice_style, original_lufs, dub_lufs, original_speech, dub_speech, analyzed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (video_id, voice_style, measurement['original_lufs'], measurement['dub_lufs'],
+                  measurement['original_speech'], measurement['dub_speech'], datetime.now().isoformat()))
+            conn.commit()
+            conn.close()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Кэш скачанных исходников (видео/аудио + превью) с вытеснением LRU
+Ключ - video_id и format_id от yt-dlp, одна запись = одна папка
+Время последнего использования хранится в mtime папки, отдельного индекса нет
+"""
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+
+# Незавершённые публикации старше этого возраста удаляются при старте
+STALE_STAGING_SECONDS = 24 * 3600
+
+
+def dir_size(path):
+    """Размер всех файлов папки в байтах"""
+    total = 0
+    for name in os.listdir(path):
+        file_path = os.path.join(path, name)
+        if os.path.isfile(file_path):
+            total += os.path.getsize(file_path)
+    return total
+
+
+class MediaCache:
+    """
+    Кэш исходников с ограничением размера (потокобезопасно)
+    Запись, которую сейчас использует задача, не вытесняется
+    """
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.pins = {}
+        self.lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._remove_stale_staging()
+
+    def _remove_stale_staging(self):
+        """Удалить недописанные записи после падения"""
+        now = time.time()
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.startswith('.staging-') and now - os.path.getmtime(path) > STALE_STAGING_SECONDS:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def _entry_name(self, video_id, format_id):
+        """Имя папки записи"""
+        safe_format = re.sub(r'[^0-9A-Za-z_.+-]', '_', str(format_id))
+        return f"{video_id}__{safe_format}"
+
+    def get(self, video_id, format_id):
+        """
+        Найти запись и закрепить её на время использования
+        Возвращает путь к папке или None (после использования вызвать release)
+        """
+        if not format_id:
+            return None
+
+        name = self._entry_name(video_id, format_id)
+        path = os.path.join(self.cache_dir, name)
+
+        with self.lock:
+            if not os.path.isdir(path):
+                return None
+            self.pins[name] = self.pins.get(name, 0) + 1
+            os.utime(path)  # Отмечаем использование для LRU
+            return path
+
+    def publish(self, video_id, format_id, files):
+        """
+        Атомарно переместить скачанные файлы в кэш и закрепить запись
+        Возвращает путь к папке записи (после использования вызвать release)
+        """
+        name = self._entry_name(video_id, format_id)
+        path = os.path.join(self.cache_dir, name)
+
+        # Собираем запись во временной папке и публикуем одним переименованием
+        staging = os.path.join(self.cache_dir, f".staging-{uuid.uuid4().hex[:8]}")
+        os.makedirs(staging)
+        for file_path in files:
+            shutil.move(file_path, os.path.join(staging, os.path.basename(file_path)))
+
+        with self.lock:
+            if os.path.isdir(path):
+                # Другая задача успела раньше - оставляем её запись
+                shutil.rmtree(staging, ignore_errors=True)
+            else:
+                os.rename(staging, path)
+            self.pins[name] = self.pins.get(name, 0) + 1
+            os.utime(path)
+
+        self.evict()
+        return path
+
+    def release(self, video_id, format_id):
+        """Снять закрепление записи"""
+        name = self._entry_name(video_id, format_id)
+        with self.lock:
+            count = self.pins.get(name, 0) - 1
+            if count > 0:
+                self.pins[name] = count
+            else:
+                self.pins.pop(name, None)
+        self.evict()
+
+    def discard(self, video_id, format_id):
+        """Снять закрепление и удалить запись (например, повреждённую)"""
+        name = self._entry_name(video_id, format_id)
+        with self.lock:
+            self.pins.pop(name, None)
+            shutil.rmtree(os.path.join(self.cache_dir, name), ignore_errors=True)
+
+    def evict(self):
+        """Удалять давно не использованные записи, пока кэш больше лимита"""
+        with self.lock:
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                path = os.path.join(self.cache_dir, name)
+                if name.startswith('.') or not os.path.isdir(path):
+                    continue
+                entries.append((os.path.getmtime(path), dir_size(path), name, path))
+
+            total = sum(size for _, size, _, _ in entries)
+            for _, size, name, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if name in self.pins:
+                    continue
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Асинхронный конвейер: лимиты по стадиям и запуск задач
+Вместо потока на каждое видео - задачи asyncio с лимитами по стадиям:
+сотни ожиданий VOT стоят дёшево, а Ctrl+C сразу отменяет все задачи
+Сами процессы запускаются через runner.run_command_async
+"""
+import asyncio
+import heapq
+import itertools
+
+
+class PrioritySemaphore:
+    """
+    Семафор, который отдаёт освободившийся слот ожидающему с наименьшим приоритетом
+    (обычный asyncio.Semaphore будит ожидающих строго по очереди прихода)
+    Число слотов можно менять на ходу (resize)
+    """
+
+    def __init__(self, value):
+        self.limit = value
+        self.value = value  # Свободные слоты; после уменьшения лимита может быть меньше нуля
+        self.waiters = []
+        self.counter = itertools.count()
+
+    async def acquire(self, priority=()):
+        """Занять слот; при равном приоритете - в порядке прихода"""
+        if self.value > 0 and not self.waiters:
+            self.value -= 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiters, (priority, next(self.counter), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Слот успели отдать, а задачу отменили - передаём слот дальше
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        """Освободить слот"""
+        self.value += 1
+        self._wake()
+
+    def resize(self, limit):
+        """Изменить число слотов: занятые сверх нового лимита доживают, новые ждут"""
+        self.value += limit - self.limit
+        self.limit = limit
+        self._wake()
+
+    def _wake(self):
+        """Отдать свободные слоты ожидающим"""
+        while self.value > 0 and self.waiters:
+            _, _, future = heapq.heappop(self.waiters)
+            if not future.done():
+                self.value -= 1
+                future.set_result(None)
+
+    def slot(self, priority=()):
+        """Использование: async with semaphore.slot(priority): ..."""
+        return _Slot(self, priority)
+
+
+class _Slot:
+    """Контекстный менеджер одного слота PrioritySemaphore"""
+
+    def __init__(self, semaphore, priority):
+        self.semaphore = semaphore
+        self.priority = priority
+
+    async def __aenter__(self):
+        await self.semaphore.acquire(self.priority)
+
+    async def __aexit__(self, *exc_info):
+        self.semaphore.release()
+
+
+class StageLimits:
+    """
+    Отдельный семафор на каждую стадию конвейера
+    limits - {'vot': 20, 'download': 3, ...}; неизвестная стадия не ограничена
+    Свободный слот стадии получает задача с наименьшим приоритетом (см. scheduling.py)
+    """
+
+    def __init__(self, limits):
+        self.limits = dict(limits)
+        self.semaphores = {name: PrioritySemaphore(value) for name, value in self.limits.items()}
+
+    def __call__(self, stage, priority=()):
+        """Использование: async with limits('download', priority): ..."""
+        semaphore = self.semaphores.get(stage)
+        if semaphore is None:
+            semaphore = self.semaphores[stage] = PrioritySemaphore(10**6)
+        return semaphore.slot(priority)
+
+    def resize(self, stage, limit):
+        """Изменить лимит стадии на ходу (вызывать из цикла asyncio)"""
+        self.limits[stage] = limit
+        if stage in self.semaphores:
+            self.semaphores[stage].resize(limit)
+        else:
+            self.semaphores[stage] = PrioritySemaphore(limit)
+
+
+class CallBatcher:
+    """
+    Собирает одиночные запросы конкурентных задач в пачки для одного вызова
+    run_batch(items) -> список результатов в том же порядке
+    Пачка уходит, когда набралось max_size запросов или прошло window сек с первого
+    """
+
+    def __init__(self, run_batch, max_size, window):
+        self.run_batch = run_batch
+        self.max_size = max_size
+        self.window = window
+        self.pending = []
+        self.timer = None
+        self.tasks = set()
+
+    async def submit(self, item):
+        """Добавить запрос в пачку и дождаться его результата"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((item, future))
+
+        if len(self.pending) >= self.max_size:
+            self._flush()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.window, self._flush)
+
+        return await future
+
+    def _flush(self):
+        """Отправить накопленную пачку"""
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+        batch, self.pending = self.pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def _run(self, batch):
+        """Выполнить пачку и раздать результаты"""
+        # Запросы отменённых задач не выполняем
+        batch = [(item, future) for item, future in batch if not future.done()]
+        if not batch:
+            return
+
+        try:
+            results = await self.run_batch([item for item, _ in batch])
+        except asyncio.CancelledError:
+            for _, future in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+async def run_jobs(coroutines, on_result=None):
+    """
+    Запустить задачи конкурентно и собрать результаты по мере готовности
+    Если одна из задач упала с исключением или нас отменили (Ctrl+C),
+    все остальные задачи отменяются и дожидаются очистки
+    """
+    tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+    results = []
+
+    try:
+        for future in asyncio.as_completed(tasks):
+            result = await future
+            results.append(result)
+            if on_result is not None:
+                on_result(result)
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    return results
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Недокачанные исходники между повторами
+yt-dlp сам продолжает загрузку с места обрыва (файлы .part и .ytdl рядом с целевым),
+но только если повтор качает в ту же папку под тем же именем. Поэтому загрузка идёт
+в постоянную рабочую папку видео и формата, а не во временную папку задачи;
+папки, к которым давно не возвращались, удаляются
+"""
+import os
+import re
+import shutil
+import time
+
+# Докачанная дорожка до склейки: yt-dlp вставляет ".f<формат>" перед расширением (video.f137.mp4)
+FORMAT_PART_PATTERN = re.compile(r'\.f[\w+-]+\.[^.]+$')
+
+
+def is_partial_file(name):
+    """Файл недокачанной загрузки yt-dlp (video.mp4.part, video.f137.mp4.part-Frag12, .ytdl)"""
+    return '.part' in name or name.endswith('.ytdl')
+
+
+def is_format_part(name):
+    """Готовая дорожка отдельного формата - повтор не качает её заново, а сразу склеивает"""
+    return not is_partial_file(name) and bool(FORMAT_PART_PATTERN.search(name))
+
+
+def is_resumable_file(name):
+    """Файл, с которым повтор продолжит загрузку: недокачанный или готовая дорожка формата"""
+    return is_partial_file(name) or is_format_part(name)
+
+
+def work_dir(root, video_id, format_id=None, stem="video"):
+    """
+    Рабочая папка загрузки (создаётся при необходимости)
+    Один и тот же видео+формат всегда попадает в одну папку - повтор продолжит загрузку
+    """
+    key = re.sub(r'[^\w.+-]', '_', format_id) if format_id else "best"
+    path = os.path.join(root, f"{video_id}_{stem}_{key}")
+    os.makedirs(path, exist_ok=True)
+    # Отметка "папка в работе" для сборки мусора
+    os.utime(path)
+    return path
+
+
+def partial_bytes(path):
+    """Сколько байт уже скачано в папке - в недокачанных файлах и готовых дорожках форматов"""
+    if not os.path.isdir(path):
+        return 0
+    total = 0
+    for entry in os.scandir(path):
+        if entry.is_file() and is_resumable_file(entry.name):
+            total += entry.stat().st_size
+    return total
+
+
+def adopt(path, target_dir):
+    """
+    Загрузка завершилась - перенести файлы в target_dir и удалить рабочую папку
+    Возвращает список перенесённых путей
+    """
+    moved = []
+    for entry in os.scandir(path):
+        if entry.is_file() and not is_partial_file(entry.name):
+            destination = os.path.join(target_dir, entry.name)
+            shutil.move(entry.path, destination)
+            moved.append(destination)
+    shutil.rmtree(path, ignore_errors=True)
+    return moved
+
+
+def keep(path):
+    """
+    Загрузка оборвалась - оставить папку, если в ней есть что продолжать
+    Возвращает сколько байт сохранено (0 - папка удалена)
+    """
+    kept = partial_bytes(path)
+    if not kept:
+        shutil.rmtree(path, ignore_errors=True)
+    return kept
+
+
+def collect_stale(root, max_age_hours):
+    """
+    Удалить рабочие папки, которые не менялись дольше max_age_hours
+    Возвращает: (сколько папок удалено, сколько байт освобождено)
+    """
+    if not max_age_hours or not os.path.isdir(root):
+        return 0, 0
+
+    deadline = time.time() - max_age_hours * 3600
+    removed = 0
+    freed = 0
+    for entry in os.scandir(root):
+        if not entry.is_dir():
+            continue
+        # Идущая загрузка обновляет время своих файлов
+        files = [item.stat() for item in os.scandir(entry.path) if item.is_file()]
+        last_change = max([entry.stat().st_mtime] + [stat.st_mtime for stat in files])
+        if last_change >= deadline:
+            continue
+        freed += sum(stat.st_size for stat in files)
+        shutil.rmtree(entry.path, ignore_errors=True)
+        removed += 1
+    return removed, freed
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+План пакета без обработки: сколько скачать, сколько места и времени понадобится
+Длительность и размер новых видео берутся из кэша или у yt-dlp (без VOT и загрузок),
+скорость стадий - из истории прошлых запусков: каждая стадия записывает, сколько
+секунд заняла единица её работы (минута видео у VOT, мегабайт у загрузки)
+"""
+import json
+import sqlite3
+import statistics
+import threading
+import time
+
+from disk_budget import estimate_footprint
+
+# Единица работы стадии (как StageReport.work); None - одна задача
+STAGE_UNITS = {
+    'info': "видео",
+    'vot': "мин видео",
+    'download': "MB",
+    'analyze': None,
+    'mix': None,
+    'package': "мин видео",
+}
+
+# Секунд на единицу работы, пока своей истории нет (осторожные средние)
+DEFAULT_STAGE_RATES = {
+    'info': 1.5,
+    'vot': 20.0,
+    'download': 0.8,
+    'analyze': 5.0,
+    'mix': 15.0,
+    'package': 0.5,
+}
+
+# Сколько последних замеров стадии хранить и учитывать
+HISTORY_SIZE = 200
+
+# Сколько дней данные yt-dlp о видео считаются свежими
+INFO_CACHE_DAYS = 7
+
+# Поля данных о видео, которые нужны плану (остальные хранятся как есть)
+PLAN_INFO_FIELDS = ('duration', 'filesize')
+
+planner_lock = threading.Lock()
+
+
+class StageHistory:
+    """История времени стадий в базе (потокобезопасно)"""
+
+    def __init__(self, database):
+        self.database = database
+
+    def _connect(self):
+        conn = sqlite3.connect(self.database)
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS stage_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                stage TEXT NOT NULL,
+                seconds REAL NOT NULL,
+                work REAL,
+                recorded_at REAL NOT NULL
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS stage_history_stage ON stage_history (stage, id)')
+        return conn
+
+    def record(self, stage, seconds, work=None):
+        """
+        Запомнить время успешной работы стадии
+        Для стадий с единицей работы замер без объёма не сравним с другими и не пишется
+        """
+        if STAGE_UNITS.get(stage) and not work:
+            return
+        with planner_lock:
+            conn = self._connect()
+            conn.execute('INSERT INTO stage_history (stage, seconds, work, recorded_at) VALUES (?, ?, ?, ?)',
+                         (stage, seconds, work, time.time()))
+            conn.execute('''
+                DELETE FROM stage_history WHERE stage = ? AND id NOT IN (
+                    SELECT id FROM stage_history WHERE stage = ? ORDER BY id DESC LIMIT ?
+                )
+            ''', (stage, stage, HISTORY_SIZE))
+            conn.commit()
+            conn.close()
+
+    def rates(self):
+        """
+        Секунд на единицу работы по стадиям (медиана - одна зависшая загрузка не портит план)
+        Возвращает: {стадия: (секунд на единицу, число замеров)}; без истории - DEFAULT_STAGE_RATES и 0
+        """
+        with planner_lock:
+            conn = self._connect()
+            rows = conn.execute('SELECT stage, seconds, work FROM stage_history').fetchall()
+            conn.close()
+
+        samples = {}
+        for stage, seconds, work in rows:
+            samples.setdefault(stage, []).append(seconds / work if work else seconds)
+        rates = {stage: (rate, 0) for stage, rate in DEFAULT_STAGE_RATES.items()}
+        for stage, values in samples.items():
+            rates[stage] = (statistics.median(values), len(values))
+        return rates
+
+
+class InfoCache:
+    """Данные yt-dlp о видео для плана (потокобезопасно); повторный план не ходит в сеть"""
+
+    def __init__(self, database, max_age_days=INFO_CACHE_DAYS):
+        self.database = database
+        self.max_age_days = max_age_days
+
+    def _connect(self):
+        conn = sqlite3.connect(self.database)
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS video_info_cache (
+                video_id TEXT NOT NULL,
+                format_selector TEXT NOT NULL,
+                info TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                PRIMARY KEY (video_id, format_selector)
+            )
+        ''')
+        return conn
+
+    def get_many(self, video_ids, format_selector):
+        """Свежие данные: {video_id: info}"""
+        deadline = time.time() - self.max_age_days * 86400
+        found = {}
+        with planner_lock:
+            conn = self._connect()
+            for video_id in video_ids:
+                row = conn.execute('''
+                    SELECT info FROM video_info_cache WHERE video_id = ? AND format_selector = ? AND fetched_at >= ?
+                ''', (video_id, format_selector, deadline)).fetchone()
+                if row:
+                    found[video_id] = json.loads(row[0])
+            conn.close()
+        return found
+
+    def store(self, infos, format_selector):
+        """
+        Сохранить данные {video_id: info}
+        Ответы с ошибкой не сохраняются: бот-проверка или сбой сети к следующему плану пройдут
+        """
+        now = time.time()
+        rows = [(video_id, format_selector, json.dumps(info, ensure_ascii=False), now)
+                for video_id, info in infos.items()
+                if not info.get('error') and any(info.get(field) for field in PLAN_INFO_FIELDS)]
+        with planner_lock:
+            conn = self._connect()
+            conn.executemany('''
+                INSERT OR REPLACE INTO video_info_cache (video_id, format_selector, info, fetched_at)
+                VALUES (?, ?, ?, ?)
+            ''', rows)
+            conn.commit()
+            conn.close()
+
+
+def job_work(info, stages, bitrate_kbps, with_vot=True):
+    """Объём работы одного видео по стадиям (в единицах STAGE_UNITS)"""
+    duration = info.get('duration')
+    size = info.get('filesize') or (duration or 0) * bitrate_kbps * 1000 / 8
+    work = {
+        'info': 1,
+        'vot': duration / 60 if duration and with_vot else 0,
+        'download': size / 1024**2,
+        'analyze': 1 if with_vot else 0,  # Без озвучки замерять нечего
+        'mix': 1,
+        'package': duration / 60 if duration else 0,
+    }
+    return {stage: work[stage] for stage in stages}
+
+
+def estimate_plan(jobs, limits, rates, bitrate_kbps, bandwidth_limit_mbit=None, disk_budget_bytes=None):
+    """
+    Оценка пакета
+    jobs - [(info, {стадия: объём работы})] (см. job_work)
+    limits - одновременных задач на стадию; 'jobs' - видео целиком (стадии подряд в одном потоке)
+    rates - StageHistory.rates()
+    Возвращает словарь: download_bytes, unknown_size (видео без длительности и размера - в объёме
+    и месте не учтены), peak_disk_bytes, stage_seconds (нагрузка на стадию с учётом её лимита),
+    longest_job, wall_seconds, bottleneck
+    """
+    download_bytes = 0
+    unknown_size = 0
+    footprints = []
+    stage_totals = {}
+    job_seconds = []
+    for info, work in jobs:
+        if info.get('filesize') or info.get('duration'):
+            download_bytes += work.get('download', 0) * 1024**2
+            footprints.append(estimate_footprint(info.get('filesize'), info.get('duration'), bitrate_kbps))
+        else:
+            unknown_size += 1
+        seconds = 0
+        for stage, amount in work.items():
+            stage_seconds = rates.get(stage, (0, 0))[0] * amount
+            stage_totals[stage] = stage_totals.get(stage, 0) + stage_seconds
+            seconds += stage_seconds
+        job_seconds.append(seconds)
+
+    # Стадии идут параллельно, поэтому время пакета - самая загруженная стадия,
+    # но не меньше самого долгого видео (его стадии идут одна за другой)
+    stage_seconds = {stage: total / limits[stage] for stage, total in stage_totals.items() if limits.get(stage)}
+    if limits.get('jobs'):
+        stage_seconds['jobs'] = sum(job_seconds) / limits['jobs']
+    if bandwidth_limit_mbit and 'download' in stage_seconds:
+        stage_seconds['download'] = max(stage_seconds['download'], download_bytes * 8 / (bandwidth_limit_mbit * 10**6))
+
+    # Пик места: одновременно качаются самые крупные видео
+    downloads = limits.get('download') or limits.get('jobs') or 1
+    peak_disk = sum(sorted(footprints, reverse=True)[:downloads])
+    if disk_budget_bytes:
+        peak_disk = min(peak_disk, max(disk_budget_bytes, max(footprints, default=0)))
+
+    longest = max(job_seconds, default=0)
+    bottleneck = max(stage_seconds, key=stage_seconds.get) if stage_seconds else None
+    return {
+        'download_bytes': download_bytes,
+        'unknown_size': unknown_size,
+        'peak_disk_bytes': peak_disk,
+        'stage_seconds': stage_seconds,
+        'longest_job': longest,
+        'wall_seconds': max([longest] + list(stage_seconds.values())),
+        'bottleneck': bottleneck,
+    }
+
+
+def format_duration(seconds):
+    """Длительность для лога: '2 ч 15 мин', '7 мин', '40 с'"""
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600} ч {seconds % 3600 // 60} мин"
+    if seconds >= 60:
+        return f"{seconds // 60} мин"
+    return f"{seconds} с"
+
+
+def format_size(nbytes):
+    """Размер для лога: '12.3GB' или '850.0MB'"""
+    if nbytes >= 1024**3:
+        return f"{nbytes / 1024**3:.1f}GB"
+    return f"{nbytes / 1024**2:.1f}MB"
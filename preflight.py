@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Предварительная проверка видео до запроса к VOT
+По данным yt-dlp (одним вызовом на пачку) решает, имеет ли смысл тратить на видео
+ожидание VOT и загрузку: недоступные, идущие трансляции, закрытые для VOT видео
+отсеиваются с причиной, видео с русской дорожкой обходятся без озвучки
+Проверка на бота и ограничение частоты (429) - беда идентичности, а не видео:
+такие видео не отсеиваются, загрузка повторит запрос (см. identities.py)
+"""
+from identities import is_bot_check
+
+VERDICT_OK = "ok"  # Обрабатывать как обычно
+VERDICT_NATIVE = "native"  # Русская дорожка уже есть - скачать без озвучки
+VERDICT_LONG = "long"  # Слишком длинное для VOT_TIMEOUT - в failed.txt для run_longvideos.py
+VERDICT_RETRY = "retry"  # Бот-проверка, 429 или сбой сети - данных нет, обрабатывать как обычно
+VERDICT_SKIP = "skip"  # Обработать не получится
+
+# Видео длиннее - сразу в run_longvideos.py, не дожидаясь таймаута VOT
+# (секунды, например 3600; None - все видео идут через VOT как обычно)
+LONG_VIDEO_DURATION = None
+
+# Видео длиннее - не переводится VOT вовсе
+MAX_VIDEO_DURATION = 4 * 3600
+
+# Статусы трансляций, которые ещё нельзя обработать (yt-dlp live_status)
+NOT_READY_LIVE_STATUSES = {
+    'is_live': "Идёт прямая трансляция",
+    'is_upcoming': "Трансляция или премьера ещё не началась",
+    'post_live': "Трансляция закончилась, но запись ещё обрабатывается YouTube",
+}
+
+# Доступность, при которой VOT не получит видео (yt-dlp availability)
+CLOSED_AVAILABILITY = {
+    'private': "Приватное видео",
+    'premium_only': "Только для YouTube Premium",
+    'subscriber_only': "Только для спонсоров канала",
+    'needs_auth': "Видео доступно только после входа в аккаунт",
+}
+
+# Возрастное ограничение, с которым VOT не работает
+AGE_LIMIT = 18
+
+# Ошибки yt-dlp, после которых повтор не поможет -> причина
+# (первое совпадение по подстроке, без учёта регистра); остальные ошибки считаются временными
+PERMANENT_ERROR_REASONS = [
+    ("members-only", "Только для спонсоров канала"),
+    ("join this channel", "Только для спонсоров канала"),
+    ("confirm your age", "Ограничение по возрасту"),
+    ("age-restricted", "Ограничение по возрасту"),
+    ("not available in your country", "Недоступно в вашей стране"),
+    ("blocked it in your country", "Недоступно в вашей стране"),
+    ("private video", "Приватное видео"),
+    ("premieres in", "Премьера ещё не началась"),
+    ("live event will begin", "Трансляция ещё не началась"),
+    ("has been removed", "Видео удалено"),
+    ("removed by the uploader", "Видео удалено"),
+    ("terminated", "Аккаунт автора удалён"),
+    ("video unavailable", "Видео недоступно"),
+]
+
+# Все известные ошибки yt-dlp -> причина: временные (беда идентичности) и постоянные
+ERROR_REASONS = [
+    ("confirm you're not a bot", "YouTube требует подтвердить, что вы не бот (обновите cookies)"),
+    ("confirm you’re not a bot", "YouTube требует подтвердить, что вы не бот (обновите cookies)"),
+    ("429", "YouTube ограничил частоту запросов"),
+    ("too many requests", "YouTube ограничил частоту запросов"),
+] + PERMANENT_ERROR_REASONS
+
+
+def match_reason(message, reasons):
+    """Причина по первому совпавшему образцу или None"""
+    lowered = message.lower()
+    for pattern, reason in reasons:
+        if pattern in lowered:
+            return reason
+    return None
+
+
+def classify_error(message):
+    """Понятная причина по ошибке yt-dlp"""
+    return match_reason(message, ERROR_REASONS) or message
+
+
+def permanent_reason(message):
+    """Причина, если ошибка yt-dlp говорит о самом видео (повтор не поможет), иначе None"""
+    return match_reason(message, PERMANENT_ERROR_REASONS)
+
+
+def has_russian_audio(info):
+    """Есть ли у видео русская звуковая дорожка (или видео изначально на русском)"""
+    languages = [info.get('language')] + list(info.get('audio_languages') or [])
+    return any(language and language.lower().split('-')[0] == 'ru' for language in languages)
+
+
+def check_eligibility(info, long_duration=LONG_VIDEO_DURATION, max_duration=MAX_VIDEO_DURATION):
+    """
+    Решить, что делать с видео, по данным get_videos_info
+    Возвращает: (вердикт VERDICT_*, причина или None)
+    Если данных нет (yt-dlp не ответил, упёрся в бот-проверку или в сбой сети) - видео не отсеивается;
+    отсеивается только по ошибке, которая точно говорит о самом видео
+    """
+    if info.get('error'):
+        reason = None if is_bot_check(info['error']) else permanent_reason(info['error'])
+        if reason:
+            return VERDICT_SKIP, reason
+        return VERDICT_RETRY, classify_error(info['error'])
+
+    live_status = info.get('live_status')
+    if live_status in NOT_READY_LIVE_STATUSES:
+        return VERDICT_SKIP, NOT_READY_LIVE_STATUSES[live_status]
+
+    availability = info.get('availability')
+    if availability in CLOSED_AVAILABILITY:
+        return VERDICT_SKIP, CLOSED_AVAILABILITY[availability]
+
+    if (info.get('age_limit') or 0) >= AGE_LIMIT:
+        return VERDICT_SKIP, f"Ограничение по возрасту ({info['age_limit']}+), VOT не сможет перевести"
+
+    if has_russian_audio(info):
+        return VERDICT_NATIVE, "Русская дорожка уже есть"
+
+    duration = info.get('duration')
+    if duration and max_duration and duration > max_duration:
+        return VERDICT_SKIP, f"Слишком длинное для VOT ({duration / 3600:.1f} ч)"
+    if duration and long_duration and duration > long_duration:
+        return VERDICT_LONG, f"Длинное видео ({duration / 60:.0f} мин) - для run_longvideos.py"
+
+    return VERDICT_OK, None
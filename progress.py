@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Живая панель прогресса для пакетной обработки
+Разбирает прогресс yt-dlp (--progress-template) и ffmpeg (-progress) для каждой задачи
+Задачи только обновляют словарь под блокировкой, рисует панель отдельный поток
+"""
+import os
+import shutil
+import sys
+import threading
+
+# Маркер строк прогресса yt-dlp
+PROGRESS_PREFIX = "[progress]"
+
+# Аргументы yt-dlp: по строке прогресса на обновление в удобном для разбора виде
+YTDLP_PROGRESS_ARGS = [
+    '--newline',
+    '--progress-template',
+    'download:' + PROGRESS_PREFIX + ' %(info.id)s %(progress.downloaded_bytes)s'
+    ' %(progress.total_bytes,progress.total_bytes_estimate)s'
+    ' %(progress.speed)s %(progress.eta)s',
+]
+
+# Аргументы ffmpeg: пары ключ=значение в stdout вместо строки статистики
+FFMPEG_PROGRESS_ARGS = ['-progress', 'pipe:1', '-nostats']
+
+# Частота перерисовки в терминале (сек)
+REFRESH_INTERVAL = 0.5
+
+# Если вывод не в терминал (лог-файл) - короткая сводка раз в N секунд
+PLAIN_REFRESH_INTERVAL = 15
+
+_active_board = None
+
+
+def get_active_board():
+    """Панель, которая сейчас выводится на экран (или None)"""
+    return _active_board
+
+
+def _number(value):
+    """Число из вывода yt-dlp/ffmpeg ('NA', 'N/A' -> None)"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def format_speed(bytes_per_second):
+    """Скорость для панели"""
+    if not bytes_per_second:
+        return ""
+    return f"{bytes_per_second / 1024**2:.1f} МБ/с"
+
+
+def format_clock(seconds):
+    """Время в виде м:сс или ч:мм:сс"""
+    hours, rest = divmod(int(seconds), 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
+
+def format_eta(seconds):
+    """Оставшееся время для панели"""
+    if seconds is None:
+        return ""
+    return f"ETA {format_clock(seconds)}"
+
+
+def parse_ytdlp_line(line):
+    """
+    Разобрать строку прогресса yt-dlp
+    Возвращает (video_id, {'percent', 'speed', 'eta'}) или None для прочих строк
+    """
+    if not line.startswith(PROGRESS_PREFIX):
+        return None
+
+    fields = line[len(PROGRESS_PREFIX):].split()
+    if len(fields) < 5:
+        return None
+
+    downloaded, total, speed, eta = (_number(field) for field in fields[1:5])
+    percent = downloaded / total * 100 if downloaded is not None and total else None
+    return fields[0], {'percent': percent, 'speed': speed, 'eta': eta}
+
+
+class FfmpegProgressParser:
+    """
+    Разбор потока -progress ffmpeg
+    Значения приходят блоками ключ=значение, блок заканчивается строкой progress=...
+    """
+
+    def __init__(self, duration=None):
+        self.duration = duration
+        self.values = {}
+
+    def feed(self, line):
+        """Добавить строку; в конце блока возвращает {'percent', 'eta', 'note'}"""
+        key, sep, value = line.partition('=')
+        if not sep:
+            return None
+        self.values[key.strip()] = value.strip()
+        if key.strip() != 'progress':
+            return None
+
+        out_time_us = _number(self.values.get('out_time_us'))
+        position = out_time_us / 1e6 if out_time_us is not None else None
+        speed_text = self.values.get('speed', '')
+        speed = _number(speed_text.rstrip('x'))
+
+        percent = eta = None
+        if position is not None and self.duration:
+            percent = min(position / self.duration * 100, 100.0)
+            if speed:
+                eta = max(self.duration - position, 0) / speed
+        if value.strip() == 'end':
+            percent, eta = 100.0, 0
+
+        note = speed_text if speed else ""
+        if percent is None and position is not None:
+            note = f"{format_clock(position)} {note}".strip()
+        return {'percent': percent, 'eta': eta, 'note': note}
+
+
+class JobProgress:
+    """Состояние одной задачи на панели"""
+
+    def __init__(self, label):
+        self.label = label
+        self.stage = ""
+        self.waiting = False
+        self.percent = None
+        self.speed = None
+        self.eta = None
+        self.note = ""
+
+
+class ProgressBoard:
+    """
+    Панель прогресса всех активных задач (потокобезопасно)
+    Без start() только собирает состояние и ничего не выводит
+    listener(event, key, fields) получает каждое обновление: 'start', 'stage', 'progress', 'finish'
+    (вызывается вне блокировки, из потока задачи)
+    """
+
+    def __init__(self, total_jobs=0, stream=None, listener=None):
+        self.stream = stream or sys.stdout
+        self.listener = listener
+        self.total_jobs = total_jobs
+        self.done_jobs = 0
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.drawn_lines = 0
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.interactive = hasattr(self.stream, 'isatty') and self.stream.isatty()
+
+    # ---------- Обновления от задач ----------
+
+    def add_jobs(self, count):
+        """Добавить задачи в очередь"""
+        with self.lock:
+            self.total_jobs += count
+
+    def start_job(self, key, label=None):
+        """Задача началась"""
+        with self.lock:
+            self.jobs[key] = JobProgress(label or key)
+        if self.listener is not None:
+            self.listener('start', key, {})
+
+    def set_stage(self, key, stage, waiting=False):
+        """Задача перешла на новую стадию (waiting - ждёт своей очереди)"""
+        with self.lock:
+            job = self.jobs.get(key)
+            if job is None:
+                return
+            job.stage = stage
+            job.waiting = waiting
+            job.percent = job.speed = job.eta = None
+            job.note = ""
+        if self.listener is not None:
+            self.listener('stage', key, {'stage': stage, 'waiting': waiting})
+
+    def update(self, key, **fields):
+        """Обновить прогресс текущей стадии (percent, speed, eta, note)"""
+        with self.lock:
+            job = self.jobs.get(key)
+            if job is None:
+                return
+            for name, value in fields.items():
+                setattr(job, name, value)
+        if self.listener is not None:
+            self.listener('progress', key, fields)
+
+    def finish_job(self, key):
+        """Задача завершилась (успешно или нет)"""
+        with self.lock:
+            self.jobs.pop(key, None)
+            self.done_jobs += 1
+        if self.listener is not None:
+            self.listener('finish', key, {})
+
+    def ytdlp_handler(self, key=None):
+        """
+        Обработчик строк yt-dlp для run_command(on_line=...)
+        key=None - задача определяется по ID видео в строке (загрузка пачкой)
+        """
+        def on_line(line):
+            parsed = parse_ytdlp_line(line)
+            if parsed is not None:
+                video_id, fields = parsed
+                self.update(key if key is not None else video_id, **fields)
+        return on_line
+
+    def ffmpeg_handler(self, key, duration=None):
+        """Обработчик строк ffmpeg -progress для run_command(on_line=...)"""
+        parser = FfmpegProgressParser(duration)
+
+        def on_line(line):
+            fields = parser.feed(line)
+            if fields is not None:
+                self.update(key, **fields)
+        return on_line
+
+    # ---------- Вывод ----------
+
+    def _render(self):
+        """Строки панели (вызывать под self.lock)"""
+        active = [job for job in self.jobs.values() if not job.waiting]
+        waiting = len(self.jobs) - len(active)
+        queued = max(self.total_jobs - self.done_jobs - len(self.jobs), 0) + waiting
+        throughput = sum(job.speed or 0 for job in active)
+
+        header = (f"📊 Активно: {len(active)} | В очереди: {queued} | "
+                  f"Готово: {self.done_jobs}/{self.total_jobs}")
+        if throughput:
+            header += f" | Скорость: {format_speed(throughput)}"
+
+        lines = [header]
+        for job in active:
+            percent = f"{job.percent:5.1f}%" if job.percent is not None else ""
+            details = "  ".join(part for part in (percent, format_speed(job.speed), job.note, format_eta(job.eta)) if part)
+            lines.append(f"   [{job.label}] {job.stage:<14} {details}".rstrip())
+        return lines
+
+    def _clear(self):
+        """Стереть нарисованную панель (вызывать под self.lock)"""
+        if self.drawn_lines:
+            # Курсор на начало панели и очистка до конца экрана
+            self.stream.write(f"\x1b[{self.drawn_lines}F\x1b[J")
+            self.drawn_lines = 0
+
+    def _draw(self):
+        """Нарисовать панель (вызывать под self.lock)"""
+        width = shutil.get_terminal_size().columns - 1
+        lines = [line[:width] for line in self._render()]
+        self.stream.write('\n'.join(lines) + '\n')
+        self.stream.flush()
+        self.drawn_lines = len(lines)
+
+    def refresh(self):
+        """Перерисовать панель"""
+        with self.lock:
+            if self.interactive:
+                self._clear()
+                self._draw()
+            elif self.jobs:
+                self.stream.write(self._render()[0] + '\n')
+                self.stream.flush()
+
+    def log(self, *args, **kwargs):
+        """Напечатать сообщение над панелью"""
+        with self.lock:
+            if self.interactive:
+                self._clear()
+            print(*args, file=self.stream, **kwargs)
+            if self.interactive:
+                self._draw()
+
+    def _loop(self):
+        interval = REFRESH_INTERVAL if self.interactive else PLAIN_REFRESH_INTERVAL
+        while not self.stop_event.wait(interval):
+            self.refresh()
+
+    def start(self):
+        """Начать вывод панели"""
+        global _active_board
+        if self.interactive and os.name == 'nt':
+            os.system('')  # Включает ANSI-последовательности в консоли Windows
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+        _active_board = self
+
+    def stop(self):
+        """Остановить вывод и стереть панель"""
+        global _active_board
+        if _active_board is self:
+            _active_board = None
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        with self.lock:
+            self._clear()
+            self.stream.flush()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,16 @@
+@echo off
+chcp 65001 >nul
+title Relayout Video Library
+color 0A
+
+cls
+echo ========================================
+echo   Move finished videos into subfolders
+echo   Layout: flat, channel, date or prefix
+echo ========================================
+echo.
+
+python relayout.py %*
+
+echo.
+pause
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Перенос готовой библиотеки в другую раскладку по подпапкам
+Файлы и превью переезжают в папки по каналу, месяцу обработки или началу ID,
+новые пути записываются в каталог (по ним ищут remix.py и library.py),
+результаты проверок verify.py переносятся вместе с файлами
+Пример: python relayout.py --layout prefix
+"""
+import argparse
+import os
+import sqlite3
+import sys
+
+from catalog import Catalog
+from layout import OUTPUT_LAYOUTS, move_with_sidecars, remove_empty_dirs, shard_path
+from run2 import DATABASE, OUTPUT_LAYOUT, init_database, safe_print
+from verify import OUTPUT_SUBDIRS, CheckCache, is_short_path, scan_output
+
+
+def load_metadata():
+    """Канал и дата обработки из каталога: {video_id: (channel, processed_at)}"""
+    conn = sqlite3.connect(DATABASE)
+    rows = conn.execute('SELECT video_id, channel, processed_at FROM catalog').fetchall()
+    conn.close()
+    return {video_id: (channel, processed_at) for video_id, channel, processed_at in rows}
+
+
+def relayout_library(output_dir="output", layout=OUTPUT_LAYOUT, dry_run=False):
+    """
+    Разложить готовые файлы по раскладке layout
+    Возвращает словарь счётчиков
+    """
+    init_database()
+    catalog = Catalog(DATABASE)
+    metadata = load_metadata()
+    files = scan_output(output_dir)
+
+    stats = {'files': 0, 'moved': 0, 'conflicts': 0, 'removed_dirs': 0}
+    moves = []
+    for video_id, entries in files.items():
+        channel, processed_at = metadata.get(video_id, (None, None))
+        for path, _ in entries:
+            stats['files'] += 1
+            subdir = 'shorts' if is_short_path(output_dir, path) else 'videos'
+            target = os.path.abspath(os.path.join(output_dir, subdir, shard_path(layout, video_id, channel, processed_at)))
+            if os.path.dirname(path) == target:
+                continue
+
+            destination = os.path.join(target, os.path.basename(path))
+            if os.path.exists(destination):
+                stats['conflicts'] += 1
+                safe_print(f"  ⚠️  [{video_id}] Уже есть: {destination}")
+                continue
+
+            stats['moved'] += 1
+            if dry_run:
+                safe_print(f"  ➡️  [{video_id}] {os.path.relpath(path, output_dir)} → {os.path.relpath(destination, output_dir)}")
+                continue
+            move_with_sidecars(path, target)
+            moves.append((path, destination))
+            catalog.record(video_id, output_path=destination, is_short=subdir == 'shorts')
+
+    if not dry_run:
+        CheckCache(DATABASE).rename(moves)
+        for subdir in OUTPUT_SUBDIRS:
+            root = os.path.join(output_dir, subdir)
+            if os.path.isdir(root):
+                stats['removed_dirs'] += remove_empty_dirs(root)
+    return stats
+
+
+def main():
+    """Главная функция"""
+    parser = argparse.ArgumentParser(description="Перенос готовых видео в другую раскладку по подпапкам")
+    parser.add_argument('--layout', choices=OUTPUT_LAYOUTS, default=OUTPUT_LAYOUT,
+                        help="flat - всё в одной папке, channel - по каналам, date - по месяцам, prefix - по началу ID "
+                             "(по умолчанию - OUTPUT_LAYOUT из run2.py)")
+    parser.add_argument('--output-dir', default="output")
+    parser.add_argument('--dry-run', action='store_true', help="Только показать, что куда переедет")
+    args = parser.parse_args()
+
+    stats = relayout_library(args.output_dir, args.layout, args.dry_run)
+
+    if args.dry_run:
+        safe_print(f"\n📊 Файлов: {stats['files']}, переедет: {stats['moved']}, конфликтов: {stats['conflicts']}")
+        return 0
+    safe_print(f"\n📊 Файлов: {stats['files']}, перенесено: {stats['moved']}, конфликтов: {stats['conflicts']}, "
+               f"удалено пустых папок: {stats['removed_dirs']}")
+    if args.layout != OUTPUT_LAYOUT:
+        safe_print(f"💡 Чтобы новые видео ложились так же, поставьте OUTPUT_LAYOUT = \"{args.layout}\" в run2.py")
+    return 0 if not stats['conflicts'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,25 @@
+@echo off
+chcp 65001 >nul
+title Remix Dubbed Videos
+color 0A
+
+cls
+echo ========================================
+echo   Remix dubbed videos from cache
+echo   No downloads, no VOT requests
+echo ========================================
+echo.
+
+set "video_volume="
+set "translation_volume="
+set /p video_volume="Original volume (default 0.05): "
+set /p translation_volume="Translation volume (default 0.58): "
+
+if "%video_volume%"=="" set "video_volume=0.05"
+if "%translation_volume%"=="" set "translation_volume=0.58"
+
+echo.
+python remix.py --video-volume %video_volume% --translation-volume %translation_volume%
+
+echo.
+pause
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Пересборка готовых видео с новой громкостью без обращения к сети
+Берёт озвучку и оригинальный звук из кэша, видеопоток - из готового файла
+(или из плейлиста папки HLS); упаковка для стриминга собирается заново
+"""
+import argparse
+import glob
+import os
+import shutil
+import sqlite3
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from run2 import (
+    AUDIO_CODECS,
+    DATABASE,
+    MAX_WORKERS,
+    OUTPUT_PACKAGING,
+    TRACK_CACHE_DIR,
+    VOICE_STYLE,
+    build_mix_command,
+    safe_print,
+)
+from catalog import Catalog
+from loudness import MIX_LEVEL_MODES, MIX_LEVELS_FIXED, LoudnessStore, analyze_tracks, mix_levels
+from runner import run_command
+from stream_packaging import (
+    HLS_DIR_SUFFIX,
+    HLS_PLAYLIST,
+    PACKAGING_MODES,
+    build_hls_command,
+    hls_dir,
+    output_size,
+    with_faststart,
+)
+from track_cache import KIND_DUB, KIND_ORIGINAL, TrackCache
+
+# Расширения готовых файлов; hls - папка HLS (готовый результат, если mp4 рядом нет)
+OUTPUT_EXTENSIONS = ['mp4'] + list(AUDIO_CODECS) + [HLS_DIR_SUFFIX.lstrip('.')]
+
+
+def load_videos():
+    """Обработанные видео из базы: {video_id: (title, url)}"""
+    conn = sqlite3.connect(DATABASE)
+    rows = conn.execute('SELECT video_id, title, url FROM processed_videos').fetchall()
+    conn.close()
+    return {video_id: (title, url) for video_id, title, url in rows}
+
+
+def find_output_file(output_dir, video_id, title=None, catalog=None):
+    """
+    Найти готовый файл видео: по пути из каталога,
+    для записей без пути - в output/videos или output/shorts
+    """
+    if catalog is not None:
+        path = catalog.output_path(video_id)
+        if path and os.path.exists(path):
+            return path
+
+    for subdir in ('videos', 'shorts'):
+        for ext in OUTPUT_EXTENSIONS:
+            path = f"{output_dir}/{subdir}/{title}_{video_id}.{ext}"
+            if title and os.path.exists(path):
+                return path
+
+    # Название могло измениться - ищем по ID
+    for subdir in ('videos', 'shorts'):
+        for ext in OUTPUT_EXTENSIONS:
+            matches = glob.glob(f"{output_dir}/{subdir}/*_{glob.escape(video_id)}.{ext}")
+            if matches:
+                return matches[0]
+    return None
+
+
+def remix_levels(video_id, original_file, dub_file, loudness_store, levels_mode, video_volume, translation_volume, voice_style):
+    """Громкость микса: по замерам из базы (если их нет - замеряем дорожки из кэша)"""
+    measurement = loudness_store.get(video_id, voice_style)
+    if measurement is None:
+        measurement = analyze_tracks(original_file, dub_file)
+        if measurement is not None:
+            loudness_store.put(video_id, voice_style, measurement)
+    return mix_levels(measurement, levels_mode, video_volume, translation_volume)
+
+
+def rebuild_hls(source_file, packaged_dir):
+    """
+    Нарезать HLS заново из source_file во временную папку
+    Возвращает папку с новым HLS или None (ошибка ffmpeg)
+    """
+    staging_dir = f"{os.path.splitext(packaged_dir)[0]}.remix{HLS_DIR_SUFFIX}"
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    os.makedirs(staging_dir)
+    result = run_command(build_hls_command(source_file, staging_dir))
+    if result.returncode != 0 or not os.path.exists(os.path.join(staging_dir, HLS_PLAYLIST)):
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        return None
+    return staging_dir
+
+
+def remix_video(video_id, title, url, track_cache, output_dir, video_volume, translation_volume, voice_style, separate_tracks=False, levels_mode=MIX_LEVELS_FIXED, loudness_store=None, catalog=None, packaging=OUTPUT_PACKAGING):
+    """
+    Пересобрать один файл
+    separate_tracks - перевод и оригинал отдельными дорожками (только видео)
+    levels_mode - fixed: заданная громкость, auto/duck: по замерам дорожек
+    packaging - упаковка mp4/m4a (faststart); папка HLS, если она есть, нарезается заново
+    Возвращает: (success: bool, message: str)
+    """
+    final_file = find_output_file(output_dir, video_id, title, catalog)
+    if not final_file:
+        return False, "готовый файл не найден"
+
+    dub_file = track_cache.get(video_id, voice_style, KIND_DUB)
+    original_file = track_cache.get(video_id, voice_style, KIND_ORIGINAL)
+    if not dub_file or not original_file:
+        return False, "нет дорожек в кэше"
+
+    # Только HLS: видеопоток берём из плейлиста, микс - во временный mp4 для новой нарезки
+    hls_only = os.path.isdir(final_file)
+    video_source = os.path.join(final_file, HLS_PLAYLIST) if hls_only else final_file
+    packaged_dir = final_file if hls_only else hls_dir(final_file)
+    if not os.path.isdir(packaged_dir):
+        packaged_dir = None
+
+    stem, ext = os.path.splitext(final_file)
+    if hls_only:
+        ext = '.mp4'
+    remix_file = f"{stem}.remix{ext}"
+    audio_format = ext.lstrip('.')
+
+    duck = False
+    if levels_mode != MIX_LEVELS_FIXED and not separate_tracks:
+        video_volume, translation_volume, duck = remix_levels(video_id, original_file, dub_file, loudness_store,
+                                                              levels_mode, video_volume, translation_volume, voice_style)
+
+    if audio_format in AUDIO_CODECS:
+        cover_file = f"{stem}.jpg"
+        cmd = build_mix_command(original_file, dub_file, remix_file, video_volume, translation_volume,
+                                audio_only=True, cover_file=cover_file if os.path.exists(cover_file) else None,
+                                title=title, url=url, audio_format=audio_format, duck=duck)
+    else:
+        cmd = build_mix_command(original_file, dub_file, remix_file, video_volume, translation_volume,
+                                video_source=video_source, separate_tracks=separate_tracks, duck=duck)
+
+    result = run_command(with_faststart(cmd, remix_file, packaging))
+
+    if result.returncode != 0 or not os.path.exists(remix_file):
+        if os.path.exists(remix_file):
+            os.remove(remix_file)
+        return False, f"ошибка ffmpeg: {result.error_summary()}"
+
+    # HLS режется из нового микса, иначе в сегментах останется старый звук
+    staging_dir = rebuild_hls(remix_file, packaged_dir) if packaged_dir else None
+    if packaged_dir and not staging_dir:
+        os.remove(remix_file)
+        return False, "ошибка нарезки HLS"
+
+    # Заменяем старый результат только после успешной пересборки
+    if staging_dir:
+        shutil.rmtree(packaged_dir)
+        os.replace(staging_dir, packaged_dir)
+    if hls_only:
+        os.remove(remix_file)
+    else:
+        os.replace(remix_file, final_file)
+
+    file_size_kb = output_size(final_file) / 1024
+    conn = sqlite3.connect(DATABASE)
+    conn.execute('UPDATE processed_videos SET file_size_kb = ? WHERE video_id = ?', (file_size_kb, video_id))
+    conn.commit()
+    conn.close()
+
+    if catalog is not None:
+        catalog.record(video_id, file_size_kb=file_size_kb, output_path=os.path.abspath(final_file))
+
+    return True, os.path.basename(final_file)
+
+
+def main():
+    """Главная функция"""
+    parser = argparse.ArgumentParser(description="Пересборка видео с новой громкостью из кэша дорожек")
+    parser.add_argument('video_ids', nargs='*', help="ID видео (по умолчанию - все из кэша)")
+    parser.add_argument('--video-volume', type=float, default=0.05, help="Громкость оригинала (0.05 = 5%%)")
+    parser.add_argument('--translation-volume', type=float, default=0.58, help="Громкость перевода (0.58 = 58%%)")
+    parser.add_argument('--voice-style', default=VOICE_STYLE, help="Голос озвучки в кэше")
+    parser.add_argument('--output-dir', default="output")
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS)
+    parser.add_argument('--separate-tracks', action='store_true', help="Перевод и оригинал отдельными дорожками вместо смешивания")
+    parser.add_argument('--levels', choices=MIX_LEVEL_MODES, default=MIX_LEVELS_FIXED,
+                        help="Громкость: fixed - как задано, auto - по замерам дорожек, duck - то же с приглушением оригинала")
+    parser.add_argument('--packaging', choices=PACKAGING_MODES, default=OUTPUT_PACKAGING,
+                        help="Упаковка: plain - индекс mp4 в конце, остальные - faststart (папки HLS пересобираются всегда)")
+    args = parser.parse_args()
+
+    if not TRACK_CACHE_DIR or not os.path.exists(TRACK_CACHE_DIR):
+        safe_print("⚠️  Кэш дорожек не найден - пересобирать нечего")
+        return 1
+
+    track_cache = TrackCache(TRACK_CACHE_DIR, DATABASE)
+    loudness_store = LoudnessStore(DATABASE)
+    catalog = Catalog(DATABASE)
+    videos = load_videos()
+
+    video_ids = args.video_ids or track_cache.video_ids(args.voice_style)
+    if not video_ids:
+        safe_print("⚠️  В кэше нет видео с озвучкой и оригинальным звуком")
+        return 1
+
+    if args.levels == MIX_LEVELS_FIXED:
+        safe_print(f"🔊 Пересборка {len(video_ids)} видео (Оригинал {int(args.video_volume*100)}%, Перевод {int(args.translation_volume*100)}%)")
+    else:
+        safe_print(f"🔊 Пересборка {len(video_ids)} видео (громкость по замерам: {args.levels})")
+
+    success_count = 0
+    failed_count = 0
+
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = {
+            executor.submit(
+                remix_video,
+                video_id,
+                *videos.get(video_id, (None, None)),
+                track_cache,
+                args.output_dir,
+                args.video_volume,
+                args.translation_volume,
+                args.voice_style,
+                args.separate_tracks,
+                args.levels,
+                loudness_store,
+                catalog,
+                args.packaging
+            ): video_id for video_id in video_ids
+        }
+
+        for future in as_completed(futures):
+            video_id = futures[future]
+            success, message = future.result()
+            if success:
+                success_count += 1
+                safe_print(f"  ✅ [{video_id}] {message}")
+            else:
+                failed_count += 1
+                safe_print(f"  ⚠️  [{video_id}] {message}")
+
+    safe_print(f"\n🎉 Пересобрано: {success_count}, ошибок: {failed_count}")
+    return 0 if failed_count == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
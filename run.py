@@ -2,22 +2,20 @@
 """
 Пакетная обработка YouTube видео с переводом и живыми голосами
 """
-import subprocess
 import sys
 import os
 from pathlib import Path
 import time
 import glob
 import re
+import shutil
 import sqlite3
 from datetime import datetime
 
-try:
-    from deep_translator import GoogleTranslator
-    TRANSLATOR_AVAILABLE = True
-except ImportError:
-    TRANSLATOR_AVAILABLE = False
-    print("⚠️ Для перевода названий установите: pip install deep-translator")
+from progress import FFMPEG_PROGRESS_ARGS, YTDLP_PROGRESS_ARGS, ProgressBoard
+from runner import ProcessTimeout, run_command
+# Перевод названий: таблица переводов, Google или локальная модель (создаётся при первом переводе)
+from translation import get_translator
 
 # Пути к файлам
 FAILED_LOG = "failed.txt"
@@ -33,10 +31,9 @@ def extract_cookies_from_browser():
     
     for browser in browsers:
         try:
-            result = subprocess.run(
-                f'yt-dlp --cookies-from-browser {browser} --cookies {COOKIES_FILE} --skip-download "https://www.youtube.com/watch?v=dQw4w9WgXcQ"',
-                shell=True,
-                capture_output=True,
+            result = run_command(
+                ['yt-dlp', '--cookies-from-browser', browser, '--cookies', COOKIES_FILE,
+                 '--skip-download', 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'],
                 timeout=30
             )
             
@@ -136,14 +133,9 @@ def sanitize_filename(filename):
 
 def translate_to_russian(text):
     """Перевести текст на русский"""
-    if not TRANSLATOR_AVAILABLE or not text:
-        return text
-    
-    try:
-        translated = GoogleTranslator(source='auto', target='ru').translate(text)
-        return translated if translated else text
-    except:
+    if not text or not get_translator().available():
         return text
+    return get_translator().translate(text)
 
 def get_video_title(url, translate=True):
     """Получить название видео с YouTube"""
@@ -155,19 +147,13 @@ def get_video_title(url, translate=True):
         
         cmd.append(url)
         
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            encoding='utf-8',
-            shell=True
-        )
+        result = run_command(cmd)
         
         if result.returncode == 0:
-            title = result.stdout.strip()
+            title = result.stdout.text().strip()
             
             # Переводим на русский если нужно
-            if translate and TRANSLATOR_AVAILABLE:
+            if translate and get_translator().available():
                 print(f"  🔤 Оригинал: {title}")
                 translated = translate_to_russian(title)
                 print(f"  🇷🇺 Перевод: {translated}")
@@ -226,7 +212,7 @@ def process_batch(urls, output_dir="output", video_volume=0.05, translation_volu
         return
     
     print(f"📋 К обработке: {len(new_urls)} новых видео")
-    if translate_names and TRANSLATOR_AVAILABLE:
+    if translate_names and get_translator().available():
         print("🌍 Перевод названий: включен")
     print("📂 Обычные видео → videos/")
     print("📱 Shorts → shorts/")
@@ -246,37 +232,22 @@ def process_batch(urls, output_dir="output", video_volume=0.05, translation_volu
         print(f"\n[{i}/{len(new_urls)}] {video_type} - Скачивание озвучки...")
         print(f"  🆔 ID: {video_id}")
         
-        cmd = f'npx vot-cli-live --voice-style live --output "{target_dir}" "{url}"'
+        # Озвучка - в свою папку: искать mp3 среди тысяч готовых файлов долго
+        dub_dir = f"{target_dir}/dub_{video_id}"
+        Path(dub_dir).mkdir(exist_ok=True)
+        cmd = ['npx', 'vot-cli-live', '--voice-style', 'live', '--output', dub_dir, url]
+        dub_kept = False
         
         try:
             # Таймаут 3 минуты на озвучку
             print(f"  ⏱️  Максимум 5 минуты на перевод...")
             
-            process = subprocess.Popen(
-                cmd,
-                shell=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE
-            )
-            
             try:
-                # Ждём завершения с таймаутом
-                process.communicate(timeout=700)
-                returncode = process.returncode
-            except subprocess.TimeoutExpired:
-                # Принудительно убиваем процесс
-                print(f"  ⏱️ Таймаут (3 мин), убиваю процесс...")
-                
-                try:
-                    process.terminate()  # Сначала мягко
-                    process.wait(timeout=2)
-                except subprocess.TimeoutExpired:
-                    process.kill()  # Потом жёстко
-                    try:
-                        process.wait(timeout=2)
-                    except:
-                        pass
-                
+                # Ждём завершения с таймаутом (процесс с потомками убивается)
+                result = run_command(cmd, timeout=700)
+                returncode = result.returncode
+            except ProcessTimeout:
+                print(f"  ⏱️ Таймаут (3 мин), процесс остановлен")
                 print(f"  ⚠️ Видео пропущено")
                 log_failed_video(url, "Таймаут 3 минуты")
                 time.sleep(5)
@@ -285,7 +256,7 @@ def process_batch(urls, output_dir="output", video_volume=0.05, translation_volu
             if returncode == 0:
                 # Проверяем что mp3 файл действительно создан
                 time.sleep(2)
-                mp3_check = glob.glob(f"{target_dir}/*.mp3")
+                mp3_check = glob.glob(f"{dub_dir}/*.mp3")
                 
                 if mp3_check:
                     # Проверяем размер файла
@@ -297,14 +268,15 @@ def process_batch(urls, output_dir="output", video_volume=0.05, translation_volu
                         log_failed_video(url, f"Видео без речи ({file_size:.1f}KB)")
                         os.remove(latest_mp3)
                     else:
-                        downloaded_urls.append((url, original_url, target_dir, video_id))
+                        downloaded_urls.append((url, original_url, target_dir, video_id, latest_mp3))
+                        dub_kept = True
                         print(f"  ✅ Озвучка скачана ({file_size:.1f}KB)")
                 else:
                     print(f"  ⚠️ MP3 файл не создан, пропускаю")
                     log_failed_video(url, "MP3 файл не создан")
             else:
                 print(f"  ⚠️ Ошибка скачивания озвучки, пропускаю")
-                log_failed_video(url, f"Ошибка VOT (код {returncode})")
+                log_failed_video(url, f"Ошибка VOT (код {returncode}): {result.error_summary()}")
             
             # Пауза 5 секунд между запросами к VOT
             print(f"  ⏸️  Пауза 5 сек...")
@@ -314,6 +286,10 @@ def process_batch(urls, output_dir="output", video_volume=0.05, translation_volu
             print(f"  ❌ Неожиданная ошибка: {e}")
             log_failed_video(url, f"Ошибка: {str(e)}")
             continue
+        finally:
+            # Папка озвучки нужна этапу 2, только если озвучка скачалась
+            if not dub_kept:
+                shutil.rmtree(dub_dir, ignore_errors=True)
     
     if not downloaded_urls:
         print("\n❌ Ни одна озвучка не скачалась")
@@ -327,101 +303,110 @@ def process_batch(urls, output_dir="output", video_volume=0.05, translation_volu
     
     success_count = 0
     
-    for i, (url, original_url, target_dir, video_id) in enumerate(downloaded_urls, 1):
-        is_short = is_shorts_url(original_url)
-        video_type = "📱 Shorts" if is_short else "📹 Видео"
-        
-        print(f"\n[{i}/{len(downloaded_urls)}] {video_type} - Обработка...")
-        print(f"  🆔 ID: {video_id}")
-        
-        # Получаем название видео (с переводом если включено)
-        print(f"  🔍 Получение информации...")
-        title = get_video_title(url, translate=translate_names)
-        
-        # Используем название или ID
-        base_name = title if title else video_id
-        print(f"  📝 Финальное название: {base_name}")
-        
-        # Ищем скачанный mp3 в нужной папке
-        mp3_files = glob.glob(f"{target_dir}/*.mp3")
-        
-        if not mp3_files:
-            print(f"⚠️ Аудио файл не найден")
-            log_failed_video(url, "Аудио файл потерян перед обработкой")
-            continue
-        
-        # Берём последний mp3
-        temp_audio = max(mp3_files, key=os.path.getctime)
-        
-        # Пути к файлам в нужной папке
-        video_file = os.path.abspath(f"{target_dir}/{base_name}_temp.mp4")
-        final_file = os.path.abspath(f"{target_dir}/{base_name}.mp4")
-        thumbnail_file = f"{target_dir}/{base_name}.jpg"
-        
-        # Скачать видео с превью
-        print(f"  📥 Скачивание видео с превью...")
-        
-        # Формируем команду с cookies
-        cmd = f'yt-dlp -f "bestvideo[height<=1080]+ba[language=ru]/bestvideo[height<=1080]+ba/best" --merge-output-format mp4 --write-thumbnail --convert-thumbnails jpg --extractor-args "youtube:lang=ru"'
-        
-        if os.path.exists(COOKIES_FILE):
-            cmd += f' --cookies "{COOKIES_FILE}"'
-        
-        cmd += f' -o "{video_file}" "{url}"'
-        
-        result = subprocess.run(cmd, shell=True)
-        
-        if result.returncode != 0 or not os.path.exists(video_file):
-            print(f"  ❌ Ошибка скачивания видео")
-            log_failed_video(url, "Ошибка скачивания видео через yt-dlp")
-            continue
-        
-        # Микшировать
-        print(f"  🔊 Микширование (Оригинал {int(video_volume*100)}%, Перевод {int(translation_volume*100)}%)...")
-        
-        abs_audio = os.path.abspath(temp_audio)
-        
-        cmd = f'ffmpeg -i "{video_file}" -i "{abs_audio}" -filter_complex "[0:a]volume={video_volume}[a1];[1:a]volume={translation_volume}[a2];[a1][a2]amix=inputs=2:duration=shortest[aout]" -map 0:v -map "[aout]" -c:v copy -y "{final_file}"'
-        result = subprocess.run(cmd, shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        
-        if result.returncode == 0:
-            # Ищем и переименовываем превью от yt-dlp
-            temp_thumbnail_patterns = [
-                f"{target_dir}/{base_name}_temp.jpg",
-                f"{target_dir}/{base_name}_temp.webp",
-                f"{target_dir}/{Path(temp_audio).stem}.jpg",
-            ]
+    for i, (url, original_url, target_dir, video_id, temp_audio) in enumerate(downloaded_urls, 1):
+        try:
+            is_short = is_shorts_url(original_url)
+            video_type = "📱 Shorts" if is_short else "📹 Видео"
             
-            for pattern in temp_thumbnail_patterns:
-                if os.path.exists(pattern):
-                    try:
-                        os.rename(pattern, thumbnail_file)
-                        break
-                    except:
-                        pass
+            print(f"\n[{i}/{len(downloaded_urls)}] {video_type} - Обработка...")
+            print(f"  🆔 ID: {video_id}")
             
-            # Получаем размер финального файла
-            final_file_size = os.path.getsize(final_file) / 1024  # KB
+            # Получаем название видео (с переводом если включено)
+            print(f"  🔍 Получение информации...")
+            title = get_video_title(url, translate=translate_names)
             
-            # Сохраняем в базу данных
-            mark_video_processed(video_id, url, base_name, final_file_size)
+            # Используем название или ID
+            base_name = title if title else video_id
+            print(f"  📝 Финальное название: {base_name}")
             
-            # Очистка
-            try:
-                os.remove(temp_audio)
-                if os.path.exists(video_file):
-                    os.remove(video_file)
-            except:
-                pass
+            # Скачанный mp3 - в папке озвучки этого видео
+            if not os.path.exists(temp_audio):
+                print(f"⚠️ Аудио файл не найден")
+                log_failed_video(url, "Аудио файл потерян перед обработкой")
+                continue
             
-            print(f"  ✅ Готово: {base_name}.mp4 ({final_file_size/1024:.1f}MB)")
-            if os.path.exists(thumbnail_file):
-                print(f"  🖼️ Превью: {base_name}.jpg")
-            print(f"  💾 Сохранено в базу данных")
-            success_count += 1
-        else:
-            print(f"  ❌ Ошибка микшированиsя")
-            log_failed_video(url, "Ошибка микширования через ffmpeg")
+            # Пути к файлам в нужной папке
+            video_file = os.path.abspath(f"{target_dir}/{base_name}_temp.mp4")
+            final_file = os.path.abspath(f"{target_dir}/{base_name}.mp4")
+            thumbnail_file = f"{target_dir}/{base_name}.jpg"
+            
+            # Скачать видео с превью
+            print(f"  📥 Скачивание видео с превью...")
+            
+            # Формируем команду с cookies
+            cmd = ['yt-dlp', '-f', 'bestvideo[height<=1080]+ba[language=ru]/bestvideo[height<=1080]+ba/best',
+                   '--merge-output-format', 'mp4', '--write-thumbnail', '--convert-thumbnails', 'jpg',
+                   '--extractor-args', 'youtube:lang=ru']
+            
+            if os.path.exists(COOKIES_FILE):
+                cmd += ['--cookies', COOKIES_FILE]
+            
+            cmd += YTDLP_PROGRESS_ARGS + ['-o', video_file, url]
+            
+            # Прогресс yt-dlp - на панель, ошибки - в буфер для лога
+            with ProgressBoard(1) as board:
+                board.start_job(video_id)
+                board.set_stage(video_id, "загрузка")
+                result = run_command(cmd, on_line=board.ytdlp_handler(video_id))
+            
+            if result.returncode != 0 or not os.path.exists(video_file):
+                print(f"  ❌ Ошибка скачивания видео")
+                log_failed_video(url, f"Ошибка скачивания видео через yt-dlp: {result.error_summary()}")
+                continue
+            
+            # Микшировать
+            print(f"  🔊 Микширование (Оригинал {int(video_volume*100)}%, Перевод {int(translation_volume*100)}%)...")
+            
+            abs_audio = os.path.abspath(temp_audio)
+            
+            cmd = ['ffmpeg', '-i', video_file, '-i', abs_audio, '-filter_complex',
+                   f'[0:a]volume={video_volume}[a1];[1:a]volume={translation_volume}[a2];[a1][a2]amix=inputs=2:duration=shortest[aout]',
+                   '-map', '0:v', '-map', '[aout]', '-c:v', 'copy', '-y', final_file]
+            with ProgressBoard(1) as board:
+                board.start_job(video_id)
+                board.set_stage(video_id, "микширование")
+                result = run_command(['ffmpeg'] + FFMPEG_PROGRESS_ARGS + cmd[1:], on_line=board.ffmpeg_handler(video_id))
+            
+            if result.returncode == 0:
+                # Ищем и переименовываем превью от yt-dlp
+                temp_thumbnail_patterns = [
+                    f"{target_dir}/{base_name}_temp.jpg",
+                    f"{target_dir}/{base_name}_temp.webp",
+                    f"{target_dir}/{Path(temp_audio).stem}.jpg",
+                ]
+                
+                for pattern in temp_thumbnail_patterns:
+                    if os.path.exists(pattern):
+                        try:
+                            os.rename(pattern, thumbnail_file)
+                            break
+                        except:
+                            pass
+                
+                # Получаем размер финального файла
+                final_file_size = os.path.getsize(final_file) / 1024  # KB
+                
+                # Сохраняем в базу данных
+                mark_video_processed(video_id, url, base_name, final_file_size)
+                
+                # Очистка
+                try:
+                    if os.path.exists(video_file):
+                        os.remove(video_file)
+                except:
+                    pass
+                
+                print(f"  ✅ Готово: {base_name}.mp4 ({final_file_size/1024:.1f}MB)")
+                if os.path.exists(thumbnail_file):
+                    print(f"  🖼️ Превью: {base_name}.jpg")
+                print(f"  💾 Сохранено в базу данных")
+                success_count += 1
+            else:
+                print(f"  ❌ Ошибка микшированиsя")
+                log_failed_video(url, "Ошибка микширования через ffmpeg")
+        finally:
+            # Папка озвучки больше не нужна - ни после готового видео, ни после ошибки
+            shutil.rmtree(os.path.dirname(temp_audio), ignore_errors=True)
     
     print("\n" + "="*60)
     print(f"🎉 Успешно обработано: {success_count}/{len(new_urls)}")
@@ -3,45 +3,210 @@
 Пакетная обработка YouTube видео с переводом и живыми голосами v2.0
 Улучшенная версия с многопоточностью и исправлениями багов
 """
-import subprocess
 import sys
 import os
 from pathlib import Path
 import time
 import glob
+import shutil
 import re
 import sqlite3
 from datetime import datetime
 import threading
 from queue import Queue
 import uuid
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import asyncio
+from contextlib import asynccontextmanager
 
-try:
-    from deep_translator import GoogleTranslator
-    TRANSLATOR_AVAILABLE = True
-except ImportError:
-    TRANSLATOR_AVAILABLE = False
-    print("⚠️ Для перевода названий установите: pip install deep-translator")
+# Момент запуска - для замера времени до первой задачи
+LAUNCHED_AT = time.monotonic()
+
+from autoscale import OUTCOME_OK, AimdController, StageReport
+from bandwidth_budget import BandwidthBudget
+from catalog import Catalog
+from child_limits import StagePolicies
+from disk_budget import DiskBudget, estimate_footprint
+from identities import create_identity_pool
+from layout import LAYOUT_FLAT, shard_dir
+from loudness import (
+    DUCK_FILTER,
+    MIX_LEVEL_MODES,
+    MIX_LEVELS_AUTO,
+    MIX_LEVELS_DUCK,
+    MIX_LEVELS_FIXED,
+    LoudnessStore,
+    analyze_tracks_async,
+    mix_levels,
+)
+from media_cache import MediaCache
+from orchestrator import CallBatcher, StageLimits, run_jobs
+import partials
+from planner import InfoCache, StageHistory, estimate_plan, format_duration, format_size, job_work
+from preflight import VERDICT_LONG, VERDICT_NATIVE, VERDICT_RETRY, VERDICT_SKIP, check_eligibility
+from progress import FFMPEG_PROGRESS_ARGS, YTDLP_PROGRESS_ARGS, ProgressBoard, get_active_board
+from runner import ProcessTimeout, run_command, run_command_async
+from scheduling import POLICIES, POLICY_FIFO, JobScheduler
+from stream_packaging import (
+    HLS_MODES,
+    PACKAGING_FASTSTART,
+    PACKAGING_HLS_ONLY,
+    PACKAGING_MODES,
+    PACKAGING_PLAIN,
+    build_hls_command,
+    hls_dir,
+    output_size,
+    with_faststart,
+)
+from toolchain import Toolchain, vot_command
+from track_cache import KIND_DUB, KIND_ORIGINAL, TrackCache
+# Перевод названий: таблица переводов, Google или локальная модель (создаётся при первом переводе)
+from translation import get_translator
 
 # Пути к файлам
 FAILED_LOG = "failed.txt"
 DATABASE = "processed_videos.db"
 COOKIES_FILE = "cookies.txt"
+COOKIES_DIR = "cookies"  # Пул cookies: по файлу *.txt на аккаунт (папки нет - один COOKIES_FILE)
+PROXIES_FILE = "proxies.txt"  # Прокси для пула, по одному на строку (необязательно)
 URLS_FILE = "urls.txt"  # Новый файл со списком URL
+TRACK_CACHE_DIR = "cache/tracks"  # Кэш озвучек и оригинального звука (None = не кэшировать)
+MEDIA_CACHE_DIR = "cache/media"  # Кэш скачанных исходников (None = не кэшировать)
+MEDIA_CACHE_GB = 20  # Максимальный размер кэша исходников
+PARTIAL_DIR = "cache/partial"  # Недокачанные исходники: повтор продолжает загрузку с места обрыва
+PARTIAL_MAX_AGE_HOURS = 72  # Через сколько часов без повтора недокачанное удаляется (None = никогда)
+COOKIE_PROBE_RETRY_HOURS = 24  # Не удалось извлечь cookies из браузера - не пробовать снова столько часов
+
+# Цель по времени от запуска до первой задачи (сек): дольше - в лог выводится подсказка
+STARTUP_TARGET_SECONDS = 1.0
+
+# Голос озвучки VOT
+VOICE_STYLE = "live"
+
+# Настройки параллельности
+MAX_WORKERS = 3  # Количество одновременных загрузок видео
+
+# Сколько задач одновременно на каждой стадии (задачи asyncio, а не потоки)
+STAGE_LIMITS = {
+    'vot': 10,  # Ожидание озвучки VOT - почти не нагружает машину
+    'info': 8,  # Запросы названия и формата к yt-dlp
+    'download': MAX_WORKERS,  # Скачивание видео
+    'analyze': 2,  # Замер громкости дорожек перед микшированием
+    'mix': 2,  # Микширование ffmpeg
+    'package': 2,  # Нарезка HLS (без перекодирования - упирается в диск)
+}
+
+# Ограничения процессов стадий (потоки, nice, ядра, память) поверх DEFAULT_STAGE_POLICIES
+# из child_limits.py, например {'mix': {'threads': 4, 'nice': 0}}; {'mix': None} - без ограничений
+CHILD_LIMITS = {}
+CHILD_CGROUP = None  # Делегированная папка cgroup v2 для общих лимитов стадий (None = без cgroup)
+
+# Автоподбор параллельности (AIMD): лимит стадии растёт, пока сервис отвечает быстро и без ошибок,
+# и уменьшается вдвое при бот-проверке, 429 или таймаутах (STAGE_LIMITS - начальные значения)
+AUTOSCALE = True
+AUTOSCALE_BOUNDS = {
+    'vot': (2, 30),  # (минимум, максимум)
+    'info': (1, 8),
+    'download': (1, 8),
+}
+
+# Таймаут на озвучку одного видео (сек)
+VOT_TIMEOUT = 300
+
+# Предварительная проверка до VOT: недоступные, идущие трансляции, закрытые для VOT
+# и слишком длинные видео отсеиваются с причиной в failed.txt, видео с русской дорожкой
+# скачиваются без озвучки (правила - в preflight.py)
+PREFLIGHT = True
+INFO_BATCH_SIZE = 25  # Сколько видео проверять одним вызовом yt-dlp
+
+# Shorts обрабатываются пачками: один yt-dlp на много ID, один ffmpeg на несколько видео
+SHORTS_BATCHING = True
+SHORTS_BATCH_SIZE = 16  # Сколько Shorts скачивать одним вызовом yt-dlp
+SHORTS_BATCH_WINDOW = 2  # Сколько секунд ждать, пока наберётся пачка
+SHORTS_MIX_GROUP = 8  # Сколько Shorts смешивать одним процессом ffmpeg
+
+# Очерёдность задач: fifo (порядок файла), sjf (сначала короткие),
+# shorts (сначала Shorts) или round_robin (по очереди из каждого канала)
+SCHEDULING_POLICY = POLICY_FIFO
+
+# Живая панель прогресса всех задач (False = только обычный лог)
+DASHBOARD = True
+STAGE_TITLES = {
+    'vot': "озвучка",
+    'info': "название",
+    'download': "загрузка",
+    'analyze': "анализ громкости",
+    'mix': "микширование",
+    'package': "упаковка HLS",
+}
+
+# Формат скачивания видео
+VIDEO_FORMAT = "bestvideo[height<=1080]+ba[language=ru]/bestvideo[height<=1080]+ba/best"
+
+# Режим "только аудио": качаем только звуковую дорожку и сохраняем m4a/opus
+AUDIO_ONLY = False
+AUDIO_ONLY_FORMAT = "ba[language=ru]/ba/best"
+AUDIO_OUTPUT_FORMAT = "m4a"  # m4a (AAC, с обложкой) или opus
+AUDIO_CODECS = {
+    'm4a': ('aac', '128k'),
+    'opus': ('libopus', '64k'),
+}
+
+# Громкость микса: fixed (как задано, 5%/58%), auto (подбирается по замерам громкости
+# и речи каждого видео) или duck (то же + оригинал приглушается, пока звучит перевод)
+# auto и duck - по желанию (--levels=auto): замер добавляет проход ffmpeg на каждое видео
+MIX_LEVELS = MIX_LEVELS_FIXED
+
+# Раскладка готовых файлов: flat (все в output/videos), channel (по каналам),
+# date (по месяцам) или prefix (по началу ID). Путь каждого файла хранится в каталоге,
+# уже готовую библиотеку переносит relayout.py
+OUTPUT_LAYOUT = LAYOUT_FLAT
+
+# Оригинал и перевод отдельными дорожками вместо смешивания (только для видео):
+# оригинал копируется без перекодирования, перевод - дорожка по умолчанию,
+# громкость переключается в плеере
+SEPARATE_AUDIO_TRACKS = False
+
+# Упаковка для стриминга: plain (как раньше), faststart (индекс mp4/m4a в начале файла,
+# тем же проходом ffmpeg), hls (mp4 с faststart + HLS рядом) или hls_only (только HLS)
+# HLS - только для видео, подробности в stream_packaging.py
+OUTPUT_PACKAGING = PACKAGING_PLAIN
+DUB_TRACK_CODEC = ('aac', '128k')
+
+# Коды языков для тегов дорожек (ISO 639-2, как ждёт mp4)
+LANGUAGE_CODES = {
+    'en': 'eng', 'ru': 'rus', 'uk': 'ukr', 'de': 'deu', 'fr': 'fra', 'es': 'spa',
+    'it': 'ita', 'pt': 'por', 'ja': 'jpn', 'ko': 'kor', 'zh': 'zho',
+}
 
-# Настройки многопоточности
-MAX_WORKERS = 3  # Количество одновременных обработок
+# Настройки загрузки
+CONCURRENT_FRAGMENTS = 4  # Сколько фрагментов одного видео качать параллельно
+BANDWIDTH_LIMIT_MBIT = None  # Общий лимит скорости всех загрузок в Мбит/с (None = без лимита)
+
+# Контроль места на диске
+DISK_BUDGET_GB = None  # Сколько могут занять одновременные загрузки (None = без лимита)
+DISK_RESERVE_GB = 2  # Сколько места всегда оставлять свободным
+DEFAULT_BITRATE_KBPS = 5000  # Битрейт для оценки, если размер формата неизвестен
+DEFAULT_AUDIO_BITRATE_KBPS = 160  # То же для режима "только аудио"
 
 # Блокировка для потокобезопасной работы с БД и выводом
 db_lock = threading.Lock()
 print_lock = threading.Lock()
 
 def safe_print(*args, **kwargs):
-    """Потокобезопасный вывод"""
+    """Потокобезопасный вывод (над панелью прогресса, если она включена)"""
+    board = get_active_board()
+    if board is not None:
+        board.log(*args, **kwargs)
+        return
     with print_lock:
         print(*args, **kwargs)
 
+# Cookies и прокси для вызовов yt-dlp: каждый вызов берёт здоровую идентичность из пула
+identities = create_identity_pool(COOKIES_FILE, COOKIES_DIR, PROXIES_FILE, DATABASE, safe_print)
+
+# Ограничения дочерних процессов по стадиям, посчитанные под число ядер этой машины
+child_limits = StagePolicies(CHILD_LIMITS, STAGE_LIMITS, CHILD_CGROUP, safe_print)
+
 def extract_cookies_from_browser():
     """Извлечь cookies из браузера"""
     safe_print("🍪 Извлечение cookies из браузера...")
@@ -51,10 +216,9 @@ def extract_cookies_from_browser():
     
     for browser in browsers:
         try:
-            result = subprocess.run(
-                f'yt-dlp --cookies-from-browser {browser} --cookies {COOKIES_FILE} --skip-download "https://www.youtube.com/watch?v=dQw4w9WgXcQ"',
-                shell=True,
-                capture_output=True,
+            result = run_command(
+                ['yt-dlp', '--cookies-from-browser', browser, '--cookies', COOKIES_FILE,
+                 '--skip-download', 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'],
                 timeout=30
             )
             
@@ -83,6 +247,14 @@ def init_database():
     conn.commit()
     conn.close()
 
+def load_processed_ids():
+    """Все обработанные видео одним запросом (для проверки списка URL при запуске)"""
+    with db_lock:
+        conn = sqlite3.connect(DATABASE)
+        video_ids = {row[0] for row in conn.execute('SELECT video_id FROM processed_videos')}
+        conn.close()
+        return video_ids
+
 def is_video_processed(video_id):
     """Проверить обработано ли видео (потокобезопасно)"""
     with db_lock:
@@ -157,128 +329,603 @@ def sanitize_filename(filename):
 
 def translate_to_russian(text):
     """Перевести текст на русский"""
-    if not TRANSLATOR_AVAILABLE or not text:
+    if not text or not get_translator().available():
         return text
-    
+    return get_translator().translate(text)
+
+def parse_number(value):
+    """Преобразовать вывод yt-dlp в число (NA -> None)"""
     try:
-        translated = GoogleTranslator(source='auto', target='ru').translate(text)
-        return translated if translated else text
-    except Exception:
-        return text
+        return float(value)
+    except (TypeError, ValueError):
+        return None
 
-def get_video_title(url, translate=True):
-    """Получить название видео с YouTube"""
+# Одна строка на видео: ID, название, длительность, размер, формат, название и ID канала, язык,
+# статус трансляции, доступность, возрастное ограничение, языки звуковых дорожек
+VIDEO_INFO_TEMPLATE = "\t".join([
+    '%(id)s', '%(title)s', '%(duration)s', '%(filesize,filesize_approx)s', '%(format_id)s',
+    '%(channel,uploader)s', '%(channel_id,uploader_id)s', '%(language)s',
+    '%(live_status)s', '%(availability)s', '%(age_limit)s', '%(formats.:.language)l'
+])
+
+# Ошибка yt-dlp по конкретному видео: "ERROR: [youtube] <id>: <причина>"
+VIDEO_ERROR_PATTERN = re.compile(r'ERROR: \[[^\]]+\] ([0-9A-Za-z_-]{11}): (.+)')
+
+def empty_video_info():
+    """Данные о видео, когда yt-dlp ничего не сообщил"""
+    return {'title': None, 'original_title': None, 'duration': None, 'filesize': None, 'format_id': None, 'channel': None, 'channel_id': None, 'language': None,
+            'live_status': None, 'availability': None, 'age_limit': None, 'audio_languages': [], 'error': None}
+
+def optional_field(value):
+    """Поле VIDEO_INFO_TEMPLATE ('' и NA -> None)"""
+    value = value.strip()
+    return value if value not in ('', 'NA', 'None') else None
+
+def parse_video_info_line(line):
+    """Разобрать строку VIDEO_INFO_TEMPLATE: (video_id, info) или None"""
+    if line.count('\t') < 11:
+        return None
+    
+    # В названии может встретиться табуляция - режем с обоих концов
+    video_id, rest = line.split('\t', 1)
+    (title, duration, filesize, format_id, channel, channel_id, language,
+     live_status, availability, age_limit, audio_languages) = rest.rsplit('\t', 10)
+    
+    info = empty_video_info()
+    info['title'] = title.strip() or None
+    info['original_title'] = info['title']
+    info['duration'] = parse_number(duration.strip())
+    info['filesize'] = parse_number(filesize.strip())
+    info['format_id'] = optional_field(format_id)
+    info['channel'] = optional_field(channel)
+    info['channel_id'] = optional_field(channel_id)
+    info['language'] = optional_field(language)
+    info['live_status'] = optional_field(live_status)
+    info['availability'] = optional_field(availability)
+    info['age_limit'] = parse_number(age_limit.strip())
+    info['audio_languages'] = sorted({
+        language for language in map(optional_field, audio_languages.split(',')) if language
+    })
+    return video_id.strip(), info
+
+async def get_videos_info(urls, translate=True, format_selector=VIDEO_FORMAT):
+    """
+    Получить название, длительность, размер, ID формата, канал, язык и доступность
+    для нескольких видео за один вызов yt-dlp
+    Возвращает: {video_id: {'title', 'original_title', 'duration', 'filesize', 'format_id', 'channel', 'channel_id', 'language',
+    'live_status', 'availability', 'age_limit', 'audio_languages', 'error'}} (неизвестное = None)
+    error - ошибка yt-dlp по этому видео (недоступно, приватное и т.п.)
+    """
+    infos = {extract_video_id(url): empty_video_info() for url in urls}
+    
     try:
-        # Используем строку для лучшей совместимости с Windows
-        cmd = f'yt-dlp --print title --no-warnings'
+        cmd = ['yt-dlp', '-f', format_selector, '--print', VIDEO_INFO_TEMPLATE, '--no-warnings', '--ignore-errors']
         
-        if os.path.exists(COOKIES_FILE):
-            cmd += f' --cookies "{COOKIES_FILE}"'
-        
-        cmd += f' "{url}"'
+        cmd += list(urls)
         
         # Для Windows используем системную кодировку (cp1251/cp866)
-        import sys
         encoding = sys.stdout.encoding if sys.stdout.encoding else 'utf-8'
         
-        result = subprocess.run(
-            cmd,
-            shell=True,
-            capture_output=True,
-            text=True,
-            encoding=encoding,
-            errors='ignore'  # Игнорируем ошибки кодировки
-        )
+        # Cookies и прокси - из пула идентичностей
+        result = await identities.run_async(cmd, len(urls), encoding=encoding, limits=child_limits.get('info'))
         
-        if result.returncode == 0:
-            title = result.stdout.strip()
-            
-            if not title:
-                return None
-            
-            # Переводим на русский если нужно
-            if translate and TRANSLATOR_AVAILABLE:
-                translated = translate_to_russian(title)
-                if translated:
-                    title = translated
-            
-            return sanitize_filename(title)
-    except Exception:
-        pass
-    return None
+        # С --ignore-errors код возврата ненулевой, если упало хотя бы одно видео
+        for line in result.stdout.lines:
+            parsed = parse_video_info_line(line)
+            if parsed and parsed[0] in infos:
+                infos[parsed[0]] = parsed[1]
+        
+        for line in result.stderr.lines:
+            match = VIDEO_ERROR_PATTERN.search(line)
+            if match and match.group(1) in infos and not infos[match.group(1)]['title']:
+                infos[match.group(1)]['error'] = match.group(2).strip()
+    except ProcessTimeout:
+        return infos
+    except OSError:
+        return infos
+    
+    named = [info for info in infos.values() if info['title']]
+    titles = [info['title'] for info in named]
+    
+    # Переводим на русский одной пачкой (сетевой запрос - в отдельном потоке)
+    if translate and titles and get_translator().available():
+        titles = await asyncio.to_thread(get_translator().translate_batch, titles)
+    
+    for info, title in zip(named, titles):
+        info['title'] = sanitize_filename(title)
+    
+    return infos
+
+async def get_video_info(url, translate=True, format_selector=VIDEO_FORMAT):
+    """Данные об одном видео (см. get_videos_info)"""
+    infos = await get_videos_info([url], translate=translate, format_selector=format_selector)
+    return infos.get(extract_video_id(url)) or empty_video_info()
+
+def get_video_title(url, translate=True):
+    """Получить название видео с YouTube"""
+    return asyncio.run(get_video_info(url, translate=translate))['title']
 
-def process_single_video(url, output_dir="output", video_volume=0.05, translation_volume=0.58, translate_names=True):
+async def download_source(clean_url, url, video_id, temp_dir, audio_only=False, bandwidth_budget=None, rate_key=None, on_progress=None, report=None):
     """
-    Обработка одного видео (для многопоточности)
-    Возвращает: (success: bool, video_id: str, message: str)
+    Скачать исходник (видео или только звук) с превью в temp_dir
+    on_progress - обработчик строк вывода yt-dlp (панель прогресса)
+    report - StageReport, куда отметить ошибку (для автоподбора параллельности)
+    Возвращает путь к файлу или None (ошибка уже записана в лог)
     """
-    # Очищаем URL и определяем тип
-    clean_url, is_short = clean_youtube_url(url)
-    video_id = extract_video_id(clean_url)
+    if audio_only:
+        safe_print(f"  📥 [{video_id}] Скачивание аудио...")
+        cmd = ['yt-dlp', '-f', AUDIO_ONLY_FORMAT, '--write-thumbnail', '--convert-thumbnails', 'jpg']
+        output_template = f"{temp_dir}/audio.%(ext)s"
+    else:
+        safe_print(f"  📥 [{video_id}] Скачивание видео...")
+        cmd = ['yt-dlp', '-f', VIDEO_FORMAT, '--merge-output-format', 'mp4', '--write-thumbnail', '--convert-thumbnails', 'jpg']
+        output_template = f"{temp_dir}/video.mp4"
     
-    if not video_id:
-        return False, None, f"Невалидный URL: {url}"
+    if CONCURRENT_FRAGMENTS > 1:
+        cmd += ['--concurrent-fragments', str(CONCURRENT_FRAGMENTS)]
     
-    # Проверяем обработано ли уже
-    if is_video_processed(video_id):
-        return False, video_id, f"Видео {video_id} уже обработано"
+    # Доля общего лимита скорости на эту загрузку
+    rate_limit = await bandwidth_budget.acquire_async(rate_key) if bandwidth_budget is not None else None
+    if rate_limit:
+        cmd += ['--limit-rate', str(rate_limit)]
+        safe_print(f"  🚦 [{video_id}] Лимит скорости: {rate_limit * 8 / 1000 / 1000:.1f} Мбит/с")
     
-    video_type = "📱 Shorts" if is_short else "📹 Видео"
-    target_dir = f"{output_dir}/{'shorts' if is_short else 'videos'}"
-    Path(target_dir).mkdir(parents=True, exist_ok=True)
+    cmd += YTDLP_PROGRESS_ARGS + ['-o', output_template, clean_url]
     
-    # Создаём уникальную папку для этого видео (избегаем конфликтов)
-    unique_id = str(uuid.uuid4())[:8]
-    temp_dir = f"{target_dir}/temp_{video_id}_{unique_id}"
-    Path(temp_dir).mkdir(exist_ok=True)
+    # Недокачанное с прошлой попытки yt-dlp продолжит сам (--continue по умолчанию)
+    resumed = partials.partial_bytes(temp_dir)
+    if resumed:
+        safe_print(f"  ⏯️ [{video_id}] Продолжаю загрузку (уже скачано {resumed/1024**2:.1f}MB)")
     
     try:
-        safe_print(f"\n🎬 {video_type} [{video_id}] Начинаю обработку...")
+        # Cookies и прокси - из пула идентичностей
+        result = await identities.run_async(cmd, on_line=on_progress, limits=child_limits.get('download'))
+    finally:
+        if bandwidth_budget is not None:
+            bandwidth_budget.release(rate_key)
+    
+    # Главное - проверяем что файл создан (warnings не важны)
+    video_file = find_downloaded_file(temp_dir, "audio" if audio_only else "video")
+    if not video_file:
+        # Если файла нет - логируем последние строки ошибки
+        error_msg = '\n'.join(result.stderr.errors)
+        if not error_msg:
+            error_msg = "Файл не создан, причина неизвестна"
+        safe_print(f"  ❌ [{video_id}] yt-dlp error: {error_msg}")
+        log_failed_video(url, f"Ошибка yt-dlp: {error_msg}")
+        if report is not None:
+            report.fail(error_msg)
+        return None
+    
+    return video_file
+
+async def download_sources_batch(items, audio_only=False, bandwidth_budget=None, on_progress=None, report=None):
+    """
+    Скачать несколько исходников одним вызовом yt-dlp (пачка Shorts)
+    items - [(clean_url, url, video_id, temp_dir), ...]
+    Файлы раскладываются по temp_dir каждого видео под теми же именами, что и у download_source
+    report - StageReport, куда отметить ошибки (для автоподбора параллельности)
+    Возвращает список путей (None - ошибка, уже записана в лог)
+    """
+    stem = "audio" if audio_only else "video"
+    batch_dir = f"{os.path.dirname(items[0][3])}/temp_batch_{uuid.uuid4().hex[:8]}"
+    Path(batch_dir).mkdir(parents=True, exist_ok=True)
+    
+    if audio_only:
+        cmd = ['yt-dlp', '-f', AUDIO_ONLY_FORMAT]
+    else:
+        cmd = ['yt-dlp', '-f', VIDEO_FORMAT, '--merge-output-format', 'mp4']
+    cmd += ['--write-thumbnail', '--convert-thumbnails', 'jpg', '--ignore-errors']
+    
+    if CONCURRENT_FRAGMENTS > 1:
+        cmd += ['--concurrent-fragments', str(CONCURRENT_FRAGMENTS)]
+    
+    # Пачка - одна загрузка для общего лимита скорости
+    rate_key = os.path.basename(batch_dir)
+    rate_limit = await bandwidth_budget.acquire_async(rate_key) if bandwidth_budget is not None else None
+    if rate_limit:
+        cmd += ['--limit-rate', str(rate_limit)]
+    
+    cmd += YTDLP_PROGRESS_ARGS + ['-o', f"{batch_dir}/%(id)s.%(ext)s"] + [item[0] for item in items]
+    
+    safe_print(f"  📥 Скачивание пачки Shorts ({len(items)} шт.)...")
+    
+    try:
+        result = await identities.run_async(cmd, len(items), on_line=on_progress, limits=child_limits.get('download'))
+        
+        video_files = []
+        for clean_url, url, video_id, temp_dir in items:
+            downloaded = find_downloaded_file(batch_dir, video_id)
+            if not downloaded:
+                # Ошибки yt-dlp в пачке помечены ID видео
+                error_msg = '\n'.join(
+                    line for line in result.stderr.lines if 'ERROR' in line.upper() and video_id in line
+                ) or "Файл не создан, причина неизвестна"
+                safe_print(f"  ❌ [{video_id}] yt-dlp error: {error_msg}")
+                log_failed_video(url, f"Ошибка yt-dlp: {error_msg}")
+                if report is not None:
+                    report.fail(error_msg)
+                video_files.append(None)
+                continue
+            
+            video_file = f"{temp_dir}/{stem}{os.path.splitext(downloaded)[1]}"
+            shutil.move(downloaded, video_file)
+            for ext in ('jpg', 'webp'):
+                if os.path.exists(f"{batch_dir}/{video_id}.{ext}"):
+                    shutil.move(f"{batch_dir}/{video_id}.{ext}", f"{temp_dir}/{stem}.{ext}")
+            video_files.append(video_file)
+        
+        return video_files
+    finally:
+        if bandwidth_budget is not None:
+            bandwidth_budget.release(rate_key)
+        shutil.rmtree(batch_dir, ignore_errors=True)
+
+def create_disk_budget(output_dir):
+    """Создать контроль места для папки вывода (временные папки лежат в ней же)"""
+    budget_bytes = int(DISK_BUDGET_GB * 1024**3) if DISK_BUDGET_GB else None
+    return DiskBudget([output_dir, MEDIA_CACHE_DIR, PARTIAL_DIR], budget_bytes, int(DISK_RESERVE_GB * 1024**3))
+
+def create_bandwidth_budget(max_workers):
+    """Создать общий лимит скорости (None если лимит не задан)"""
+    if not BANDWIDTH_LIMIT_MBIT:
+        return None
+    return BandwidthBudget(int(BANDWIDTH_LIMIT_MBIT * 1000 * 1000 / 8), max_workers)
+
+# Промежуточные потоки yt-dlp до склейки (video.f137.mp4, video.f251.webm)
+INTERMEDIATE_STREAM_PATTERN = re.compile(r'\.f[\w-]+\.\w+$')
+
+def find_downloaded_file(temp_dir, stem):
+    """Найти скачанный yt-dlp файл с неизвестным заранее расширением"""
+    for path in glob.glob(f"{temp_dir}/{stem}.*"):
+        name = os.path.basename(path)
+        if path.endswith(('.jpg', '.webp')) or partials.is_partial_file(name):
+            continue
+        # В папке докачки могут лежать потоки прошлой попытки, ещё не склеенные
+        if INTERMEDIATE_STREAM_PATTERN.search(name[len(stem):]):
+            continue
+        return path
+    return None
+
+def build_mix_filter(video_volume, translation_volume, source_input=0, dub_input=1, label="aout", duck=False):
+    """
+    Фильтр ffmpeg: оригинал и озвучка с заданной громкостью в одну дорожку [label]
+    duck - оригинал приглушается компрессором по сигналу озвучки
+    """
+    if not duck:
+        return (f"[{source_input}:a]volume={video_volume}[{label}_a1];"
+                f"[{dub_input}:a]volume={translation_volume}[{label}_a2];"
+                f"[{label}_a1][{label}_a2]amix=inputs=2:duration=shortest[{label}]")
+    return (f"[{source_input}:a]volume={video_volume}[{label}_a0];"
+            f"[{dub_input}:a]volume={translation_volume},asplit=2[{label}_a2][{label}_sc];"
+            f"[{label}_a0][{label}_sc]{DUCK_FILTER}[{label}_a1];"
+            f"[{label}_a1][{label}_a2]amix=inputs=2:duration=shortest[{label}]")
+
+def language_tag(language):
+    """Тег языка дорожки ('en' -> 'eng', неизвестный -> 'und')"""
+    if not language:
+        return 'und'
+    language = language.split('-')[0].lower()
+    return LANGUAGE_CODES.get(language, language if len(language) == 3 else 'und')
+
+def build_tracks_args(source_input, dub_input, original_language=None):
+    """
+    Аргументы ffmpeg для двух дорожек: перевод (по умолчанию) и оригинал без перекодирования
+    Перекодируется только озвучка
+    """
+    codec, bitrate = DUB_TRACK_CODEC
+    return [
+        '-map', f'{dub_input}:a:0', '-map', f'{source_input}:a:0',
+        '-c:a:0', codec, '-b:a:0', bitrate, '-c:a:1', 'copy',
+        '-metadata:s:a:0', 'language=rus', '-metadata:s:a:0', 'title=Перевод',
+        '-metadata:s:a:1', f'language={language_tag(original_language)}', '-metadata:s:a:1', 'title=Оригинал',
+        '-disposition:a:0', 'default', '-disposition:a:1', '0',
+    ]
+
+def build_mix_command(source_file, dub_file, final_file, video_volume, translation_volume, audio_only=False, cover_file=None, title=None, url=None, audio_format=AUDIO_OUTPUT_FORMAT, video_source=None, original_audio_file=None, separate_tracks=False, original_language=None, duck=False):
+    """
+    Команда ffmpeg (список аргументов) для смешивания оригинала и озвучки
+    audio_only - без видео: только звук + обложка и метаданные
+    video_source - взять видеопоток из другого файла (пересборка из кэша)
+    original_audio_file - заодно сохранить оригинальный звук без перекодирования
+    separate_tracks - не смешивать: перевод и оригинал отдельными дорожками (только видео)
+    duck - приглушать оригинал, пока звучит перевод
+    """
+    mix_filter = build_mix_filter(video_volume, translation_volume, duck=duck)
+    
+    if not audio_only and separate_tracks:
+        cmd = ['ffmpeg', '-i', source_file, '-i', dub_file]
+        video_index = 0
+        if video_source:
+            cmd += ['-i', video_source]
+            video_index = 2
         
-        # ========== ЭТАП 1: Скачивание озвучки ==========
-        safe_print(f"  🎤 [{video_id}] Скачивание озвучки...")
+        cmd += ['-map', f'{video_index}:v', '-c:v', 'copy'] + build_tracks_args(0, 1, original_language) + ['-y', final_file]
+        
+        if original_audio_file:
+            cmd += ['-map', '0:a:0', '-c:a', 'copy', original_audio_file]
+        return cmd
+    
+    if not audio_only:
+        cmd = ['ffmpeg', '-i', source_file, '-i', dub_file]
+        video_index = 0
+        if video_source:
+            cmd += ['-i', video_source]
+            video_index = 2
+        
+        cmd += ['-filter_complex', mix_filter, '-map', f'{video_index}:v', '-map', '[aout]', '-c:v', 'copy', '-y', final_file]
+        
+        if original_audio_file:
+            cmd += ['-map', '0:a:0', '-c:a', 'copy', original_audio_file]
+        return cmd
+    
+    cmd = ['ffmpeg', '-i', source_file, '-i', dub_file]
+    
+    # Обложку умеет хранить только m4a
+    with_cover = cover_file and audio_format == 'm4a'
+    if with_cover:
+        cmd += ['-i', cover_file]
+    
+    cmd += ['-filter_complex', mix_filter, '-map', '[aout]']
+    cmd += build_audio_output_args(audio_format, 2 if with_cover else None, title, url)
+    cmd += ['-y', final_file]
+    return cmd
+
+def build_audio_output_args(audio_format, cover_input=None, title=None, url=None):
+    """Аргументы вывода режима "только аудио": кодек, обложка из входа cover_input, метаданные"""
+    codec, bitrate = AUDIO_CODECS[audio_format]
+    args = ['-c:a', codec, '-b:a', bitrate]
+    
+    if cover_input is not None:
+        args += ['-map', f'{cover_input}:v', '-c:v', 'mjpeg', '-disposition:v', 'attached_pic']
+    
+    if title:
+        args += ['-metadata', f'title={title}']
+    if url:
+        args += ['-metadata', f'comment={url}']
+    return args
+
+def build_native_command(source_file, final_file, audio_only=False, cover_file=None, title=None, url=None, audio_format=AUDIO_OUTPUT_FORMAT):
+    """
+    Команда ffmpeg для видео, где русская дорожка уже есть: без озвучки и смешивания
+    Видео и звук копируются, в режиме "только аудио" звук перекодируется в нужный формат
+    """
+    cmd = ['ffmpeg', '-i', source_file]
+    if not audio_only:
+        return cmd + ['-map', '0:v', '-map', '0:a:0', '-c', 'copy', '-y', final_file]
+    
+    with_cover = cover_file and audio_format == 'm4a'
+    if with_cover:
+        cmd += ['-i', cover_file]
+    
+    cmd += ['-map', '0:a:0'] + build_audio_output_args(audio_format, 1 if with_cover else None, title, url)
+    cmd += ['-y', final_file]
+    return cmd
+
+def build_group_mix_command(entries):
+    """
+    Одна команда ffmpeg на несколько видео (пачка Shorts)
+    entries - [(source_file, dub_file, final_file, original_audio_file или None, levels), ...]
+    levels - (громкость оригинала, громкость перевода, приглушение) - у каждого видео свои
+    """
+    cmd = ['ffmpeg']
+    filters = []
+    outputs = []
+    
+    for n, (source_file, dub_file, final_file, original_audio_file, levels) in enumerate(entries):
+        source_input, dub_input = 2 * n, 2 * n + 1
+        video_volume, translation_volume, duck = levels
+        cmd += ['-i', source_file, '-i', dub_file]
+        filters.append(build_mix_filter(video_volume, translation_volume, source_input, dub_input, f"aout{n}", duck))
+        outputs += ['-map', f'{source_input}:v', '-map', f'[aout{n}]', '-c:v', 'copy', '-y', final_file]
+        if original_audio_file:
+            outputs += ['-map', f'{source_input}:a:0', '-c:a', 'copy', original_audio_file]
+    
+    return cmd + ['-filter_complex', ';'.join(filters)] + outputs
+
+def create_track_cache():
+    """Создать кэш дорожек (None если кэш отключён)"""
+    if not TRACK_CACHE_DIR:
+        return None
+    return TrackCache(TRACK_CACHE_DIR, DATABASE)
+
+def create_media_cache():
+    """Создать кэш исходников (None если кэш отключён)"""
+    if not MEDIA_CACHE_DIR:
+        return None
+    return MediaCache(MEDIA_CACHE_DIR, int(MEDIA_CACHE_GB * 1024**3))
+
+class BatchResources:
+    """
+    Общие ресурсы пакета: лимиты стадий, контроль места и скорости, кэши, панель прогресса
+    Создаётся внутри цикла asyncio (семафоры привязаны к нему)
+    listener - получатель событий панели прогресса (см. ProgressBoard)
+    """
+    
+    def __init__(self, output_dir="output", max_workers=MAX_WORKERS, job_count=1, scheduler=None, listener=None):
+        self.limits = StageLimits(dict(STAGE_LIMITS, download=max_workers))
+        self.scheduler = scheduler or JobScheduler([])
+        self.progress = ProgressBoard(job_count, listener=listener)
+        self.disk_budget = create_disk_budget(output_dir)
+        self.bandwidth_budget = create_bandwidth_budget(max_workers)
+        if self.bandwidth_budget is not None:
+            self.bandwidth_budget.add_jobs(job_count)
+        self.track_cache = create_track_cache()
+        self.media_cache = create_media_cache()
+        self.loudness_store = LoudnessStore(DATABASE)
+        self.catalog = Catalog(DATABASE)
+        self.history = StageHistory(DATABASE)
+        self.info_batches = None  # InfoBatches, если данные о видео запрашиваются пачками
+        self.shorts = None  # ShortsBatches, если Shorts обрабатываются пачками
+        self.autoscale = None
+        if AUTOSCALE:
+            stages = {
+                stage: (self.limits.limits[stage], low, max(high, self.limits.limits[stage]))
+                for stage, (low, high) in AUTOSCALE_BOUNDS.items()
+            }
+            self.autoscale = AimdController(stages, self._resize_stage, safe_print)
+    
+    def _resize_stage(self, stage, limit):
+        """Применить лимит, подобранный автоподбором"""
+        self.limits.resize(stage, limit)
+        if stage == 'download' and self.bandwidth_budget is not None:
+            self.bandwidth_budget.resize(limit)
+    
+    @asynccontextmanager
+    async def slot(self, stage, priority=()):
+        """
+        Занять слот стадии; отдаёт StageReport, куда отмечается исход работы
+        Исход и время в слоте уходят в автоподбор параллельности и в историю стадий (для --plan)
+        """
+        report = StageReport()
+        async with self.limits(stage, priority):
+            started = time.monotonic()
+            yield report
+            seconds = time.monotonic() - started if report.timed else None
+            if self.autoscale is not None:
+                self.autoscale.record(stage, report.outcome, seconds, report.work)
+            if seconds is not None and report.outcome == OUTCOME_OK:
+                self.history.record(stage, seconds, report.work)
+    
+    @asynccontextmanager
+    async def stage(self, video_id, stage, priority=()):
+        """Войти в стадию с учётом её лимита и приоритета задачи, отметить это на панели"""
+        title = STAGE_TITLES.get(stage, stage)
+        self.progress.set_stage(video_id, title, waiting=True)
+        async with self.slot(stage, priority) as report:
+            self.progress.set_stage(video_id, title)
+            yield report
+
+def report_info_errors(report, infos):
+    """Отметить в StageReport ошибки yt-dlp по данным get_videos_info"""
+    infos = list(infos)
+    for info in infos:
+        if info['error']:
+            report.fail(info['error'])
+    if not any(info['title'] or info['error'] for info in infos):
+        report.fail("yt-dlp не вернул данных")
+
+class InfoBatches:
+    """
+    Данные о видео пакета пачками: один вызов yt-dlp на много URL
+    Все задачи стартуют одновременно, поэтому проверка всего пакета - несколько вызовов
+    Пачка занимает один слот стадии 'info'
+    """
+    
+    def __init__(self, resources, translate, audio_only):
+        self.resources = resources
+        self.translate = translate
+        self.audio_only = audio_only
+        self.batcher = CallBatcher(self._info_batch, INFO_BATCH_SIZE, SHORTS_BATCH_WINDOW)
+    
+    async def info(self, clean_url):
+        """Данные о видео (как get_video_info)"""
+        return await self.batcher.submit(clean_url)
+    
+    async def _info_batch(self, urls):
+        format_selector = AUDIO_ONLY_FORMAT if self.audio_only else VIDEO_FORMAT
+        async with self.resources.slot('info') as report:
+            report.work = len(urls)
+            infos = await get_videos_info(urls, translate=self.translate, format_selector=format_selector)
+            report_info_errors(report, infos.values())
+        return [infos.get(extract_video_id(url)) or empty_video_info() for url in urls]
+
+class ShortsBatches:
+    """
+    Общие вызовы yt-dlp и ffmpeg для Shorts пакета
+    Задачи отдают запросы по одному, наружу уходит один процесс на пачку
+    Пачка занимает один слот соответствующей стадии
+    """
+    
+    def __init__(self, resources, audio_only, packaging=OUTPUT_PACKAGING):
+        self.resources = resources
+        self.audio_only = audio_only
+        self.packaging = packaging
+        self.download_batcher = CallBatcher(self._download_batch, SHORTS_BATCH_SIZE, SHORTS_BATCH_WINDOW)
+        self.mix_batcher = CallBatcher(self._mix_batch, SHORTS_MIX_GROUP, SHORTS_BATCH_WINDOW)
+    
+    async def download(self, clean_url, url, video_id, temp_dir):
+        """Скачать исходник в temp_dir (как download_source)"""
+        return await self.download_batcher.submit((clean_url, url, video_id, temp_dir))
+    
+    async def _download_batch(self, items):
+        async with self.resources.slot('download') as report:
+            # Размеры Shorts неизвестны - время пачки несравнимо с одиночными загрузками
+            report.timed = False
+            return await download_sources_batch(items, self.audio_only, self.resources.bandwidth_budget,
+                                                on_progress=self.resources.progress.ytdlp_handler(), report=report)
+    
+    async def mix(self, source_file, dub_file, final_file, original_audio_file, levels):
+        """
+        Смешать звук (только режим видео)
+        levels - (громкость оригинала, громкость перевода, приглушение)
+        Возвращает: (код возврата ffmpeg, строки ошибки)
+        """
+        return await self.mix_batcher.submit((source_file, dub_file, final_file, original_audio_file, levels))
+    
+    async def _mix_batch(self, entries):
+        cmd = build_group_mix_command(entries)
+        for entry in entries:
+            cmd = with_faststart(cmd, entry[2], self.packaging)
+        async with self.resources.limits('mix'):
+            result = await run_command_async(cmd, limits=child_limits.get('mix'))
         
-        cmd = f'npx vot-cli-live --voice-style live --output "{temp_dir}" "{clean_url}"'
+        if result.returncode == 0 and all(os.path.exists(entry[2]) for entry in entries):
+            return [(0, "")] * len(entries)
         
+        # Одно битое видео роняет всю команду - смешиваем по одному
+        results = []
+        for source_file, dub_file, final_file, original_audio_file, (video_volume, translation_volume, duck) in entries:
+            cmd = build_mix_command(source_file, dub_file, final_file, video_volume, translation_volume,
+                                    original_audio_file=original_audio_file, duck=duck)
+            cmd = with_faststart(cmd, final_file, self.packaging)
+            async with self.resources.limits('mix'):
+                result = await run_command_async(cmd, limits=child_limits.get('mix'))
+            results.append((result.returncode, result.error_summary()))
+        return results
+
+async def fetch_dub(clean_url, url, video_id, temp_dir, resources, priority=(), duration=None):
+    """
+    Этап 2: получить озвучку (из кэша или от VOT)
+    duration - длительность видео (VOT переводит длинные дольше - для автоподбора параллельности)
+    Возвращает: (путь к mp3 или None, сообщение об ошибке)
+    """
+    track_cache = resources.track_cache
+    cached_dub = await asyncio.to_thread(track_cache.get, video_id, VOICE_STYLE, KIND_DUB) if track_cache is not None else None
+    
+    if cached_dub:
+        # Озвучка уже есть в кэше - VOT не нужен
+        temp_audio = f"{temp_dir}/{video_id}.mp3"
+        await asyncio.to_thread(shutil.copyfile, cached_dub, temp_audio)
+        safe_print(f"  ♻️ [{video_id}] Озвучка взята из кэша")
+        return temp_audio, None
+    
+    cmd = vot_command() + ['--voice-style', VOICE_STYLE, '--output', temp_dir, clean_url]
+    
+    async with resources.stage(video_id, 'vot', priority) as report:
+        report.work = duration / 60 if duration else None
         try:
-            process = subprocess.Popen(
-                cmd,
-                shell=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE
-            )
-            
-            # Таймаут 5 минут на озвучку (исправлено!)
-            process.communicate(timeout=300)
-            returncode = process.returncode
-            
-        except subprocess.TimeoutExpired:
-            safe_print(f"  ⏱️ [{video_id}] Таймаут (5 мин), убиваю процесс...")
-            
-            try:
-                process.terminate()
-                process.wait(timeout=2)
-            except subprocess.TimeoutExpired:
-                process.kill()
-                try:
-                    process.wait(timeout=2)
-                except Exception:
-                    pass
-            
+            # Таймаут 5 минут на озвучку
+            result = await run_command_async(cmd, timeout=VOT_TIMEOUT, limits=child_limits.get('vot'))
+        except ProcessTimeout:
+            safe_print(f"  ⏱️ [{video_id}] Таймаут (5 мин), процесс остановлен")
             log_failed_video(url, "Таймаут 5 минут")
-            return False, video_id, f"Таймаут при скачивании озвучки"
+            report.fail("Таймаут")
+            return None, "Таймаут при скачивании озвучки"
         
-        if returncode != 0:
-            log_failed_video(url, f"Ошибка VOT (код {returncode})")
-            return False, video_id, f"Ошибка скачивания озвучки (код {returncode})"
+        if result.returncode != 0:
+            log_failed_video(url, f"Ошибка VOT (код {result.returncode}): {result.error_summary()}")
+            report.fail(result.error_summary())
+            return None, f"Ошибка скачивания озвучки (код {result.returncode})"
         
         # Ждём и проверяем mp3
-        time.sleep(1)
+        await asyncio.sleep(1)
         mp3_files = glob.glob(f"{temp_dir}/*.mp3")
         
         if not mp3_files:
             log_failed_video(url, "MP3 файл не создан")
-            return False, video_id, "MP3 файл не создан"
+            report.fail("MP3 файл не создан")
+            return None, "MP3 файл не создан"
         
         # Берём первый mp3 (в temp_dir только один файл)
         temp_audio = mp3_files[0]
@@ -286,93 +933,314 @@ def process_single_video(url, output_dir="output", video_volume=0.05, translatio
         
         if file_size < 10:
             log_failed_video(url, f"Видео без речи ({file_size:.1f}KB)")
-            return False, video_id, f"Видео без речи ({file_size:.1f}KB)"
+            report.fail("Видео без речи")
+            return None, f"Видео без речи ({file_size:.1f}KB)"
         
         safe_print(f"  ✅ [{video_id}] Озвучка скачана ({file_size:.1f}KB)")
         
+        if track_cache is not None:
+            await asyncio.to_thread(track_cache.put, video_id, VOICE_STYLE, KIND_DUB, temp_audio)
+        
         # Пауза между запросами к VOT
-        time.sleep(5)
+        await asyncio.sleep(5)
+    
+    return temp_audio, None
+
+async def measure_mix_levels(video_id, source_file, dub_file, resources, levels_mode, video_volume, translation_volume, priority=()):
+    """
+    Громкость микса для видео: по замерам из базы или после одного прохода анализа
+    Возвращает: (громкость оригинала, громкость перевода, приглушение)
+    """
+    loudness_store = resources.loudness_store
+    measurement = await asyncio.to_thread(loudness_store.get, video_id, VOICE_STYLE)
+    
+    if measurement is None:
+        async with resources.stage(video_id, 'analyze', priority):
+            measurement = await analyze_tracks_async(source_file, dub_file, limits=child_limits.get('analyze'))
+        if measurement is None:
+            safe_print(f"  ⚠️ [{video_id}] Не удалось замерить громкость, громкость по умолчанию")
+            return video_volume, translation_volume, False
+        await asyncio.to_thread(loudness_store.put, video_id, VOICE_STYLE, measurement)
+    
+    return mix_levels(measurement, levels_mode, video_volume, translation_volume)
+
+async def process_video(url, output_dir="output", video_volume=0.05, translation_volume=0.58, translate_names=True, audio_only=AUDIO_ONLY, resources=None, separate_tracks=SEPARATE_AUDIO_TRACKS, levels_mode=MIX_LEVELS, packaging=OUTPUT_PACKAGING):
+    """
+    Обработка одного видео (задача asyncio)
+    audio_only - сохранить только звук (m4a/opus) без скачивания видео
+    resources - общие ресурсы пакета (BatchResources)
+    separate_tracks - перевод и оригинал отдельными дорожками вместо смешивания
+    levels_mode - громкость микса (fixed/auto/duck); video_volume/translation_volume -
+    громкость по умолчанию, если замеров нет
+    packaging - упаковка результата (см. stream_packaging.PACKAGING_MODES)
+    Возвращает: (success: bool, video_id: str, message: str)
+    """
+    if resources is None:
+        resources = BatchResources(output_dir)
+    
+    disk_budget = resources.disk_budget
+    bandwidth_budget = resources.bandwidth_budget
+    track_cache = resources.track_cache
+    media_cache = resources.media_cache
+    
+    # Очищаем URL и определяем тип
+    clean_url, is_short = clean_youtube_url(url)
+    video_id = extract_video_id(clean_url)
+    
+    if not video_id or is_video_processed(video_id):
+        # Задача не дойдёт до загрузки - не держим под неё долю скорости
+        if bandwidth_budget is not None:
+            bandwidth_budget.job_finished()
+        resources.progress.finish_job(video_id)
+        
+        if not video_id:
+            return False, None, f"Невалидный URL: {url}"
+        return False, video_id, f"Видео {video_id} уже обработано"
+    
+    video_type = "📱 Shorts" if is_short else "📹 Видео"
+    target_dir = f"{output_dir}/{'shorts' if is_short else 'videos'}"
+    Path(target_dir).mkdir(parents=True, exist_ok=True)
+    
+    # Создаём уникальную папку для этого видео (избегаем конфликтов)
+    unique_id = str(uuid.uuid4())[:8]
+    temp_dir = f"{target_dir}/temp_{video_id}_{unique_id}"
+    Path(temp_dir).mkdir(exist_ok=True)
+    
+    # Ключ резерва места на диске
+    disk_key = f"{video_id}_{unique_id}"
+    
+    # Запись кэша исходников, закреплённая этой задачей
+    cached_format_id = None
+    
+    progress = resources.progress
+    progress.start_job(video_id)
+    
+    try:
+        safe_print(f"\n🎬 {video_type} [{video_id}] Начинаю обработку...")
         
-        # ========== ЭТАП 2: Получение названия ==========
+        # ========== ЭТАП 1: Получение названия ==========
+        # Идёт первым: длительность и канал нужны планировщику для следующих стадий
         safe_print(f"  🔍 [{video_id}] Получение названия...")
-        title = get_video_title(clean_url, translate=translate_names)
+        scheduler = resources.scheduler
+        format_selector = AUDIO_ONLY_FORMAT if audio_only else VIDEO_FORMAT
+        shorts = resources.shorts if is_short else None
+        if resources.info_batches is not None:
+            progress.set_stage(video_id, "название (пачка)")
+            info = await resources.info_batches.info(clean_url)
+        else:
+            async with resources.stage(video_id, 'info', scheduler.priority(url, is_short)) as report:
+                info = await get_video_info(clean_url, translate=translate_names, format_selector=format_selector)
+                report_info_errors(report, [info])
+        
+        # Предварительная проверка: слоты VOT и загрузки - только видео, которые можно довести до конца
+        native = False
+        if PREFLIGHT:
+            verdict, reason = check_eligibility(info)
+            if verdict in (VERDICT_SKIP, VERDICT_LONG):
+                safe_print(f"  🚫 [{video_id}] {reason}")
+                log_failed_video(url, f"Предварительная проверка: {reason}")
+                return False, video_id, reason
+            if verdict == VERDICT_RETRY:
+                safe_print(f"  ⚠️ [{video_id}] {reason} - проверка пропущена, загрузка повторит запрос")
+            native = verdict == VERDICT_NATIVE
+        
+        title = info['title']
         base_name = title if title else video_id
+        priority = scheduler.priority(url, is_short, info)
         
         # Добавляем video_id к имени для уникальности
         base_name_unique = f"{base_name}_{video_id}"
         safe_print(f"  📝 [{video_id}] Название: {base_name}")
         
-        # ========== ЭТАП 3: Скачивание видео ==========
-        safe_print(f"  📥 [{video_id}] Скачивание видео...")
+        # ========== ЭТАП 2: Скачивание озвучки ==========
+        temp_audio = None
+        if native:
+            safe_print(f"  🇷🇺 [{video_id}] Русская дорожка уже есть - без озвучки")
+        else:
+            safe_print(f"  🎤 [{video_id}] Скачивание озвучки...")
+            
+            temp_audio, error = await fetch_dub(clean_url, url, video_id, temp_dir, resources, priority, info['duration'])
+            if not temp_audio:
+                return False, video_id, error
         
-        video_file = f"{temp_dir}/video.mp4"
+        # Ждём свободное место на диске под видео
+        if disk_budget is not None:
+            bitrate = DEFAULT_AUDIO_BITRATE_KBPS if audio_only else DEFAULT_BITRATE_KBPS
+            footprint = estimate_footprint(info['filesize'], info['duration'], bitrate)
+            safe_print(f"  💽 [{video_id}] Резервирую место на диске (~{footprint/1024**3:.1f}GB)...")
+            progress.set_stage(video_id, "место на диске", waiting=True)
+            
+            if not await disk_budget.acquire_async(disk_key, footprint, [temp_dir]):
+                log_failed_video(url, f"Недостаточно места на диске (нужно ~{footprint/1024**3:.1f}GB)")
+                return False, video_id, "Недостаточно места на диске"
         
-        cmd = f'yt-dlp -f "bestvideo[height<=1080]+ba[language=ru]/bestvideo[height<=1080]+ba/best" --merge-output-format mp4 --write-thumbnail --convert-thumbnails jpg'
+        # ========== ЭТАП 3: Скачивание видео ==========
+        source_stem = "audio" if audio_only else "video"
+        source_dir = temp_dir
         
-        if os.path.exists(COOKIES_FILE):
-            cmd += f' --cookies "{COOKIES_FILE}"'
+        cached_dir = await asyncio.to_thread(media_cache.get, video_id, info['format_id']) if media_cache is not None else None
+        video_file = find_downloaded_file(cached_dir, source_stem) if cached_dir else None
         
-        cmd += f' -o "{video_file}" "{clean_url}"'
+        if cached_dir and not video_file:
+            # Запись повреждена - удаляем и качаем заново
+            await asyncio.to_thread(media_cache.discard, video_id, info['format_id'])
         
-        result = subprocess.run(cmd, shell=True, capture_output=True, text=True, errors='ignore')
+        if video_file:
+            # Исходник уже скачан раньше - берём локальную копию
+            cached_format_id = info['format_id']
+            source_dir = cached_dir
+            safe_print(f"  ♻️ [{video_id}] {'Аудио' if audio_only else 'Видео'} взято из кэша")
+        else:
+            if shorts is not None:
+                progress.set_stage(video_id, "загрузка (пачка)")
+                video_file = await shorts.download(clean_url, url, video_id, temp_dir)
+            else:
+                # Качаем в постоянную папку видео: после обрыва повтор продолжит с того же места
+                download_dir = partials.work_dir(PARTIAL_DIR, video_id, info['format_id'], source_stem)
+                if disk_budget is not None:
+                    disk_budget.track(disk_key, download_dir)
+                async with resources.stage(video_id, 'download', priority) as report:
+                    report.work = info['filesize'] / 1024**2 if info['filesize'] else None
+                    video_file = await download_source(clean_url, url, video_id, download_dir, audio_only, bandwidth_budget, disk_key,
+                                                       on_progress=progress.ytdlp_handler(video_id), report=report)
+                if video_file:
+                    await asyncio.to_thread(partials.adopt, download_dir, temp_dir)
+                    video_file = find_downloaded_file(temp_dir, source_stem)
+                else:
+                    kept = partials.keep(download_dir)
+                    if kept:
+                        safe_print(f"  💾 [{video_id}] Недокачанное сохранено ({kept/1024**2:.1f}MB) - повтор продолжит загрузку")
+            if not video_file:
+                return False, video_id, "Файл видео не создан"
+            
+            safe_print(f"  ✅ [{video_id}] {'Аудио' if audio_only else 'Видео'} скачано")
+            
+            # Публикуем в кэш до микширования: повтор после ошибки не будет качать заново
+            if media_cache is not None and info['format_id']:
+                files = [video_file] + [
+                    f"{temp_dir}/{source_stem}.{ext}" for ext in ('jpg', 'webp')
+                    if os.path.exists(f"{temp_dir}/{source_stem}.{ext}")
+                ]
+                source_dir = await asyncio.to_thread(media_cache.publish, video_id, info['format_id'], files)
+                cached_format_id = info['format_id']
+                video_file = find_downloaded_file(source_dir, source_stem)
         
-        # Главное - проверяем что файл создан (warnings не важны)
-        if not os.path.exists(video_file):
-            # Если файла нет - логируем последние строки ошибки
-            error_lines = result.stderr.split('\n') if result.stderr else []
-            error_msg = '\n'.join([line for line in error_lines if 'ERROR' in line.upper()][-3:])
-            if not error_msg:
-                error_msg = "Файл не создан, причина неизвестна"
-            safe_print(f"  ❌ [{video_id}] yt-dlp error: {error_msg}")
-            log_failed_video(url, f"Ошибка yt-dlp: {error_msg}")
-            return False, video_id, "Файл видео не создан"
+        # ========== ЭТАП 4: Микширование ==========
+        separate_tracks = separate_tracks and not audio_only
+        if audio_only and packaging in HLS_MODES:
+            # Звук на сегменты не режем - m4a с индексом в начале и так играет сразу
+            packaging = PACKAGING_FASTSTART
+        levels = (video_volume, translation_volume, False)
+        if native:
+            safe_print(f"  🔊 [{video_id}] Сборка без озвучки...")
+        elif separate_tracks:
+            safe_print(f"  🔊 [{video_id}] Сборка дорожек (Перевод + Оригинал)...")
+        else:
+            if levels_mode != MIX_LEVELS_FIXED:
+                levels = await measure_mix_levels(video_id, video_file, temp_audio, resources, levels_mode,
+                                                  video_volume, translation_volume, priority)
+            ducking = ", приглушение оригинала" if levels[2] else ""
+            safe_print(f"  🔊 [{video_id}] Микширование (Оригинал {levels[0]*100:.0f}%, Перевод {levels[1]*100:.0f}%{ducking})...")
         
-        safe_print(f"  ✅ [{video_id}] Видео скачано")
+        final_ext = AUDIO_OUTPUT_FORMAT if audio_only else "mp4"
+        final_dir = shard_dir(target_dir, OUTPUT_LAYOUT, video_id, info['channel'])
+        final_file = f"{final_dir}/{base_name_unique}.{final_ext}"
+        # Только HLS: mp4 нужен лишь для нарезки и остаётся во временной папке
+        mix_file = f"{temp_dir}/packaged.mp4" if packaging == PACKAGING_HLS_ONLY else final_file
         
-        # ========== ЭТАП 4: Микширование ==========
-        safe_print(f"  🔊 [{video_id}] Микширование (Оригинал {int(video_volume*100)}%, Перевод {int(translation_volume*100)}%)...")
+        thumbnail_patterns = [
+            f"{source_dir}/{source_stem}.jpg",
+            f"{source_dir}/{source_stem}.webp",
+        ]
+        cover_file = next((p for p in thumbnail_patterns if os.path.exists(p)), None)
         
-        final_file = f"{target_dir}/{base_name_unique}.mp4"
+        # Оригинальный звук для кэша: в режиме видео достаём его тем же проходом ffmpeg
+        # (без озвучки пересобирать нечего - не кэшируем)
+        original_audio_file = None
+        if track_cache is not None and not native:
+            original_audio_file = video_file if audio_only else f"{temp_dir}/original.mka"
         
-        cmd = f'ffmpeg -i "{video_file}" -i "{temp_audio}" -filter_complex "[0:a]volume={video_volume}[a1];[1:a]volume={translation_volume}[a2];[a1][a2]amix=inputs=2:duration=shortest[aout]" -map 0:v -map "[aout]" -c:v copy -y "{final_file}"'
-        result = subprocess.run(cmd, shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        # Отдельные дорожки и так дешёвые (оригинал не декодируется) - пачка не нужна
+        if shorts is not None and not audio_only and not separate_tracks and not native:
+            progress.set_stage(video_id, "микширование (пачка)")
+            returncode, error = await shorts.mix(video_file, temp_audio, mix_file, original_audio_file, levels)
+        else:
+            if native:
+                cmd = build_native_command(video_file, mix_file, audio_only=audio_only, cover_file=cover_file,
+                                           title=base_name, url=clean_url)
+            else:
+                cmd = build_mix_command(video_file, temp_audio, mix_file, levels[0], levels[1],
+                                        audio_only=audio_only, cover_file=cover_file, title=base_name, url=clean_url,
+                                        original_audio_file=None if audio_only else original_audio_file,
+                                        separate_tracks=separate_tracks, original_language=info['language'], duck=levels[2])
+            cmd = with_faststart(cmd, mix_file, packaging)
+            cmd[1:1] = FFMPEG_PROGRESS_ARGS
+            async with resources.stage(video_id, 'mix', priority):
+                result = await run_command_async(cmd, on_line=progress.ffmpeg_handler(video_id, info['duration']), limits=child_limits.get('mix'))
+            returncode, error = result.returncode, result.error_summary()
         
-        if result.returncode != 0:
-            log_failed_video(url, "Ошибка микширования через ffmpeg")
+        if returncode != 0:
+            log_failed_video(url, f"Ошибка микширования через ffmpeg: {error}")
             return False, video_id, "Ошибка микширования"
         
-        # ========== ЭТАП 5: Сохранение превью ==========
-        thumbnail_patterns = [
-            f"{temp_dir}/video.jpg",
-            f"{temp_dir}/video.webp",
-        ]
+        if original_audio_file and os.path.exists(original_audio_file):
+            await asyncio.to_thread(track_cache.put, video_id, VOICE_STYLE, KIND_ORIGINAL, original_audio_file)
         
-        thumbnail_file = f"{target_dir}/{base_name_unique}.jpg"
+        # ========== ЭТАП 4б: Упаковка HLS ==========
+        if packaging in HLS_MODES:
+            safe_print(f"  📦 [{video_id}] Нарезка HLS...")
+            staging_dir = f"{temp_dir}/hls"
+            Path(staging_dir).mkdir(exist_ok=True)
+            cmd = build_hls_command(mix_file, staging_dir)
+            cmd[1:1] = FFMPEG_PROGRESS_ARGS
+            async with resources.stage(video_id, 'package', priority) as report:
+                report.work = info['duration'] / 60 if info['duration'] else None
+                result = await run_command_async(cmd, on_line=progress.ffmpeg_handler(video_id, info['duration']),
+                                                 limits=child_limits.get('package'))
+            if result.returncode != 0:
+                log_failed_video(url, f"Ошибка упаковки HLS: {result.error_summary()}")
+                return False, video_id, "Ошибка упаковки HLS"
+            
+            # Плейлист появляется на месте целиком: сервер не увидит недорезанный HLS
+            packaged_dir = hls_dir(final_file)
+            if os.path.isdir(packaged_dir):
+                await asyncio.to_thread(shutil.rmtree, packaged_dir)
+            await asyncio.to_thread(shutil.move, staging_dir, packaged_dir)
+            if packaging == PACKAGING_HLS_ONLY:
+                final_file, final_ext = packaged_dir, "hls"
+        
+        # ========== ЭТАП 5: Сохранение превью ==========
+        thumbnail_file = f"{final_dir}/{base_name_unique}.jpg"
         
         for pattern in thumbnail_patterns:
             if os.path.exists(pattern):
                 try:
                     # Конвертируем webp в jpg если нужно
                     if pattern.endswith('.webp'):
-                        subprocess.run(
-                            f'ffmpeg -i "{pattern}" -y "{thumbnail_file}"',
-                            shell=True,
-                            stdout=subprocess.DEVNULL,
-                            stderr=subprocess.DEVNULL
-                        )
-                    else:
+                        await run_command_async(['ffmpeg', '-i', pattern, '-y', thumbnail_file], limits=child_limits.get('mix'))
+                    elif source_dir == temp_dir:
                         os.rename(pattern, thumbnail_file)
+                    else:
+                        # Превью из кэша копируем, чтобы запись осталась целой
+                        shutil.copyfile(pattern, thumbnail_file)
                     break
                 except Exception:
                     pass
         
         # Получаем размер финального файла
-        final_file_size = os.path.getsize(final_file) / 1024  # KB
+        final_file_size = output_size(final_file) / 1024  # KB
         
-        # Сохраняем в базу данных
+        # Сохраняем в базу данных и каталог библиотеки
         mark_video_processed(video_id, url, base_name, final_file_size)
+        await asyncio.to_thread(
+            resources.catalog.record, video_id,
+            url=url, original_title=info['original_title'], title=base_name,
+            channel=info['channel'], channel_id=info['channel_id'], duration=info['duration'], language=info['language'],
+            output_path=os.path.abspath(final_file),
+            audio_only=audio_only, is_short=is_short, file_size_kb=final_file_size
+        )
         
-        safe_print(f"  ✅ [{video_id}] Готово: {base_name}.mp4 ({final_file_size/1024:.1f}MB)")
+        safe_print(f"  ✅ [{video_id}] Готово: {base_name}.{final_ext} ({final_file_size/1024:.1f}MB)")
         if os.path.exists(thumbnail_file):
             safe_print(f"  🖼️ [{video_id}] Превью: {base_name}.jpg")
         
@@ -383,13 +1251,37 @@ def process_single_video(url, output_dir="output", video_volume=0.05, translatio
         return False, video_id, f"Ошибка: {str(e)}"
     
     finally:
-        # Очистка временной папки
+        # Очистка временной папки (выполняется и при отмене задачи)
         try:
-            import shutil
             if os.path.exists(temp_dir):
                 shutil.rmtree(temp_dir)
         except Exception:
             pass
+        
+        # Место освобождено - пропускаем следующую загрузку
+        if disk_budget is not None:
+            disk_budget.release(disk_key)
+        
+        progress.finish_job(video_id)
+        
+        if bandwidth_budget is not None:
+            bandwidth_budget.job_finished()
+        
+        # Запись кэша больше не нужна этой задаче - её можно вытеснять
+        # (запись в базу - в потоке; последним шагом, чтобы повторная отмена не сорвала остальное)
+        if cached_format_id is not None:
+            await asyncio.to_thread(media_cache.release, video_id, cached_format_id)
+
+def process_single_video(url, output_dir="output", video_volume=0.05, translation_volume=0.58, translate_names=True, audio_only=AUDIO_ONLY, separate_tracks=SEPARATE_AUDIO_TRACKS, levels_mode=MIX_LEVELS, packaging=OUTPUT_PACKAGING):
+    """
+    Обработка одного видео вне пакета (синхронная обёртка над process_video)
+    Возвращает: (success: bool, video_id: str, message: str)
+    """
+    async def run():
+        return await process_video(url, output_dir, video_volume, translation_volume, translate_names, audio_only,
+                                   separate_tracks=separate_tracks, levels_mode=levels_mode, packaging=packaging)
+    
+    return asyncio.run(run())
 
 def load_urls_from_file(filename):
     """Загрузить URL из файла"""
@@ -401,16 +1293,155 @@ def load_urls_from_file(filename):
     
     return urls
 
-def process_batch_parallel(urls, output_dir="output", video_volume=0.05, translation_volume=0.58, translate_names=True, max_workers=MAX_WORKERS):
+def check_toolchain(tools, audio_only=False, separate_tracks=False, levels_mode=MIX_LEVELS):
     """
-    Параллельная обработка пакета видео
+    Сообщить о недостающих программах и возможностях ffmpeg для текущих настроек
+    Возвращает False, если обработка невозможна
+    """
+    if audio_only:
+        encoders = [AUDIO_CODECS[AUDIO_OUTPUT_FORMAT][0], 'mjpeg']
+    else:
+        encoders = [DUB_TRACK_CODEC[0]] if separate_tracks else []
+    filters = [] if separate_tracks and not audio_only else ['volume', 'amix']
+    if levels_mode != MIX_LEVELS_FIXED:
+        filters += ['amerge', 'apad']
+    if levels_mode == MIX_LEVELS_DUCK and filters[:1] == ['volume']:
+        filters.append('sidechaincompress')
+
+    if tools.probed:
+        safe_print("🔧 Программы проверены (результат сохранён до их обновления):")
+        for name in tools.probed:
+            tool = tools.tools[name]
+            safe_print(f"   {name}: {tool.version or '?'} ({tool.path})")
+    for problem in tools.warnings(encoders, filters):
+        safe_print(f"⚠️  {problem}")
+    if tools.missing():
+        safe_print(f"❌ Без {', '.join(tools.missing())} обработка невозможна")
+        return False
+    return True
+
+def plan_batch(urls, output_dir="output", max_workers=MAX_WORKERS, audio_only=AUDIO_ONLY, separate_tracks=SEPARATE_AUDIO_TRACKS, levels_mode=MIX_LEVELS, packaging=OUTPUT_PACKAGING):
+    """
+    План пакета без обработки (--plan): сколько новых видео, объём загрузки, пик места и время
+    Данные о видео - из кэша или пачками у yt-dlp; VOT не вызывается, ничего не скачивается
+    """
+    init_database()
+    processed_ids = load_processed_ids()
+    new_urls = {}
+    skipped_count = 0
+    for url in urls:
+        clean_url, _ = clean_youtube_url(url)
+        video_id = extract_video_id(clean_url)
+        if video_id and video_id in processed_ids:
+            skipped_count += 1
+        elif video_id:
+            new_urls.setdefault(video_id, clean_url)
+    
+    safe_print(f"\n{'='*60}")
+    safe_print(f"🧮 План пакета: {len(new_urls)} новых видео (уже обработано: {skipped_count})")
+    if not new_urls:
+        safe_print(f"{'='*60}")
+        return
+    
+    # Данные о видео: свежие - из кэша, остальные - пачками по INFO_BATCH_SIZE
+    format_selector = AUDIO_ONLY_FORMAT if audio_only else VIDEO_FORMAT
+    info_cache = InfoCache(DATABASE)
+    infos = info_cache.get_many(new_urls, format_selector)
+    missing = [clean_url for video_id, clean_url in new_urls.items() if video_id not in infos]
+    if missing:
+        safe_print(f"🔎 Запрашиваю данные о {len(missing)} видео у yt-dlp (из кэша: {len(infos)})...")
+        
+        async def fetch_infos():
+            limits = StageLimits({'info': STAGE_LIMITS['info']})
+            
+            async def fetch_batch(batch):
+                async with limits('info'):
+                    return await get_videos_info(batch, translate=False, format_selector=format_selector)
+            
+            batches = [missing[i:i + INFO_BATCH_SIZE] for i in range(0, len(missing), INFO_BATCH_SIZE)]
+            fetched = {}
+            for batch_infos in await asyncio.gather(*(fetch_batch(batch) for batch in batches)):
+                fetched.update(batch_infos)
+            return fetched
+        
+        fetched = asyncio.run(fetch_infos())
+        info_cache.store(fetched, format_selector)
+        infos.update(fetched)
+    
+    # Что отсеет предварительная проверка - в план не входит
+    stages = ['info', 'vot', 'download', 'mix']
+    if not separate_tracks and levels_mode != MIX_LEVELS_FIXED:
+        stages.insert(3, 'analyze')
+    if packaging in HLS_MODES and not audio_only:
+        stages.append('package')
+    bitrate = DEFAULT_AUDIO_BITRATE_KBPS if audio_only else DEFAULT_BITRATE_KBPS
+    verdicts = {VERDICT_SKIP: 0, VERDICT_LONG: 0, VERDICT_NATIVE: 0, VERDICT_RETRY: 0}
+    jobs = []
+    for video_id in new_urls:
+        info = infos.get(video_id) or empty_video_info()
+        verdict = check_eligibility(info)[0] if PREFLIGHT else None
+        if verdict in verdicts:
+            verdicts[verdict] += 1
+        if verdict in (VERDICT_SKIP, VERDICT_LONG):
+            continue
+        jobs.append((info, job_work(info, stages, bitrate, with_vot=verdict != VERDICT_NATIVE)))
+    
+    limits = dict(STAGE_LIMITS, download=max_workers)
+    rates = StageHistory(DATABASE).rates()
+    disk_budget_bytes = DISK_BUDGET_GB * 1024**3 if DISK_BUDGET_GB else None
+    plan = estimate_plan(jobs, limits, rates, bitrate, BANDWIDTH_LIMIT_MBIT, disk_budget_bytes)
+    
+    if verdicts[VERDICT_SKIP] or verdicts[VERDICT_LONG]:
+        safe_print(f"🚫 Отсеет предварительная проверка: {verdicts[VERDICT_SKIP]}, "
+                   f"уйдёт в run_longvideos.py: {verdicts[VERDICT_LONG]}")
+    if verdicts[VERDICT_NATIVE]:
+        safe_print(f"🇷🇺 С русской дорожкой (без озвучки): {verdicts[VERDICT_NATIVE]}")
+    if verdicts[VERDICT_RETRY]:
+        safe_print(f"🤖 Без данных (бот-проверка, 429 или сбой сети): {verdicts[VERDICT_RETRY]}")
+    safe_print(f"📥 Скачать: ~{format_size(plan['download_bytes'])}"
+               + (f" (без данных о размере: {plan['unknown_size']} - не учтены)" if plan['unknown_size'] else ""))
+    
+    Path(output_dir).mkdir(exist_ok=True)
+    free = shutil.disk_usage(output_dir).free
+    safe_print(f"💽 Пик места под загрузки: ~{format_size(plan['peak_disk_bytes'])} "
+               f"(свободно {format_size(free)})")
+    if plan['peak_disk_bytes'] > free:
+        safe_print("⚠️  Места не хватит: уменьшите MAX_WORKERS или задайте DISK_BUDGET_GB")
+    
+    safe_print(f"⏱️  Время: ~{format_duration(plan['wall_seconds'])} при начальных лимитах стадий"
+               + (f" (узкое место: {plan['bottleneck']})" if plan['bottleneck'] else ""))
+    for stage, seconds in plan['stage_seconds'].items():
+        rate, samples = rates[stage]
+        source = f"по {samples} замерам" if samples else "по умолчанию"
+        safe_print(f"   {STAGE_TITLES.get(stage, stage)}: {format_duration(seconds)} "
+                   f"({limits[stage]} одновременно, скорость {source})")
+    if not all(rates[stage][1] for stage in plan['stage_seconds']):
+        safe_print("💡 Для стадий без истории взяты средние значения - после первых запусков план станет точнее")
+    safe_print(f"{'='*60}")
+
+def prepare_batch(output_dir="output", audio_only=AUDIO_ONLY, separate_tracks=SEPARATE_AUDIO_TRACKS, levels_mode=MIX_LEVELS):
+    """
+    Подготовка перед обработкой: база, программы, cookies, папки, уборка недокачанного
+    Возвращает False, если обработка невозможна
     """
     # Инициализируем базу данных
     init_database()
     
+    # Программы ищутся и проверяются заново, только если их обновили
+    tools = Toolchain(DATABASE).load()
+    if not check_toolchain(tools, audio_only, separate_tracks, levels_mode):
+        return False
+    
     # Проверяем наличие cookies
-    if not os.path.exists(COOKIES_FILE):
-        extract_cookies_from_browser()
+    if len(identities.identities) > 1:
+        safe_print(f"🍪 Пул cookies и прокси: {', '.join(identity.label() for identity in identities.identities)}")
+    elif not os.path.exists(COOKIES_FILE):
+        # Перебор браузеров - несколько запусков yt-dlp; после неудачи не повторяем при каждом старте
+        if tools.probe_failed_recently('browser-cookies', COOKIE_PROBE_RETRY_HOURS):
+            safe_print(f"🍪 Cookies из браузера недавно не извлеклись - работаю без них "
+                       f"(повтор через {COOKIE_PROBE_RETRY_HOURS} ч или положите {COOKIES_FILE})")
+        else:
+            tools.record_probe('browser-cookies', extract_cookies_from_browser())
     else:
         safe_print(f"🍪 Используем существующий файл cookies: {COOKIES_FILE}")
     
@@ -418,22 +1449,49 @@ def process_batch_parallel(urls, output_dir="output", video_volume=0.05, transla
     Path(f"{output_dir}/videos").mkdir(exist_ok=True)
     Path(f"{output_dir}/shorts").mkdir(exist_ok=True)
     
+    # Недокачанное, к которому давно не возвращались, больше не пригодится
+    removed, freed = partials.collect_stale(PARTIAL_DIR, PARTIAL_MAX_AGE_HOURS)
+    if removed:
+        safe_print(f"🧹 Удалено недокачанных загрузок: {removed} ({freed/1024**2:.1f}MB)")
+    return True
+
+def process_batch_parallel(urls, output_dir="output", video_volume=0.05, translation_volume=0.58, translate_names=True, max_workers=MAX_WORKERS, audio_only=AUDIO_ONLY, policy=SCHEDULING_POLICY, separate_tracks=SEPARATE_AUDIO_TRACKS, levels_mode=MIX_LEVELS, packaging=OUTPUT_PACKAGING):
+    """
+    Параллельная обработка пакета видео
+    policy - очерёдность задач (см. scheduling.POLICIES)
+    levels_mode - громкость микса (см. loudness.MIX_LEVEL_MODES)
+    packaging - упаковка результата (см. stream_packaging.PACKAGING_MODES)
+    """
+    if not prepare_batch(output_dir, audio_only, separate_tracks, levels_mode):
+        return
+    
     # Фильтруем уже обработанные
     new_urls = []
     skipped_count = 0
+    duplicate_count = 0
+    processed_ids = load_processed_ids()
+    # Одно видео под разными ссылками (/shorts/ID и watch?v=ID) - одна задача:
+    # иначе две загрузки делят папку недокачанного в PARTIAL_DIR
+    seen_ids = set()
     
     for url in urls:
         clean_url, _ = clean_youtube_url(url)
         video_id = extract_video_id(clean_url)
         
-        if video_id and is_video_processed(video_id):
+        if video_id and video_id in processed_ids:
             safe_print(f"⏭️  Видео {video_id} уже обработано, пропускаю")
             skipped_count += 1
+        elif video_id and video_id in seen_ids:
+            duplicate_count += 1
         else:
+            if video_id:
+                seen_ids.add(video_id)
             new_urls.append(url)
     
     if skipped_count > 0:
         safe_print(f"📊 Пропущено уже обработанных: {skipped_count}")
+    if duplicate_count > 0:
+        safe_print(f"📊 Пропущено повторов в списке: {duplicate_count}")
     
     if not new_urls:
         safe_print("\n✅ Все видео уже обработаны!")
@@ -441,42 +1499,73 @@ def process_batch_parallel(urls, output_dir="output", video_volume=0.05, transla
     
     safe_print(f"\n{'='*60}")
     safe_print(f"📋 К обработке: {len(new_urls)} новых видео")
-    safe_print(f"🔄 Параллельных потоков: {max_workers}")
-    if translate_names and TRANSLATOR_AVAILABLE:
+    safe_print(f"🔄 Параллельных загрузок: {max_workers}, ожиданий VOT: {STAGE_LIMITS['vot']}"
+               + (" (автоподбор по ответам сервисов)" if AUTOSCALE else ""))
+    safe_print(f"🧮 Процессы: {child_limits.describe(('vot', 'download', 'analyze', 'mix'))}")
+    if policy != POLICY_FIFO:
+        safe_print(f"🗂️  Очерёдность: {policy}")
+    if DISK_BUDGET_GB:
+        safe_print(f"💽 Лимит места под загрузки: {DISK_BUDGET_GB}GB")
+    if BANDWIDTH_LIMIT_MBIT:
+        safe_print(f"🚦 Общий лимит скорости: {BANDWIDTH_LIMIT_MBIT} Мбит/с")
+    if audio_only:
+        safe_print(f"🎧 Режим: только аудио ({AUDIO_OUTPUT_FORMAT})")
+    if not audio_only and separate_tracks:
+        safe_print("🎚️  Перевод и оригинал - отдельные дорожки (без смешивания)")
+    elif levels_mode != MIX_LEVELS_FIXED:
+        safe_print(f"🎚️  Громкость микса: {levels_mode} (по замерам каждого видео)")
+    if OUTPUT_LAYOUT != LAYOUT_FLAT:
+        safe_print(f"🗄️  Раскладка файлов: {OUTPUT_LAYOUT}")
+    if packaging != PACKAGING_PLAIN:
+        safe_print(f"📦 Упаковка: {packaging}" + (" (HLS - только для видео)" if audio_only and packaging in HLS_MODES else ""))
+    if translate_names and get_translator().available():
         safe_print("🌍 Перевод названий: включен")
+    if PREFLIGHT:
+        safe_print("🛂 Предварительная проверка: включена")
     safe_print(f"{'='*60}\n")
     
     # Параллельная обработка
-    success_count = 0
-    failed_count = 0
-    
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # Запускаем все задачи
-        future_to_url = {
-            executor.submit(
-                process_single_video,
-                url,
-                output_dir,
-                video_volume,
-                translation_volume,
-                translate_names
-            ): url for url in new_urls
-        }
-        
-        # Собираем результаты по мере выполнения
-        for future in as_completed(future_to_url):
-            url = future_to_url[future]
-            try:
-                success, video_id, message = future.result()
-                if success:
-                    success_count += 1
-                else:
-                    failed_count += 1
-                    if video_id:
-                        safe_print(f"⚠️  [{video_id}] {message}")
-            except Exception as e:
-                failed_count += 1
-                safe_print(f"❌ Ошибка обработки {url}: {e}")
+    counts = {'success': 0, 'failed': 0}
+    
+    def on_result(result):
+        """Подсчёт результатов по мере выполнения"""
+        success, video_id, message = result
+        if success:
+            counts['success'] += 1
+        else:
+            counts['failed'] += 1
+            if video_id:
+                safe_print(f"⚠️  [{video_id}] {message}")
+    
+    async def run_batch():
+        # Задачи стартуют в порядке политики, дальше слоты стадий раздаются по приоритету
+        scheduler = JobScheduler(new_urls, policy)
+        ordered_urls = scheduler.order(new_urls, lambda url: clean_youtube_url(url)[1])
+        resources = BatchResources(output_dir, max_workers, len(new_urls), scheduler)
+        resources.info_batches = InfoBatches(resources, translate_names, audio_only)
+        if SHORTS_BATCHING:
+            resources.shorts = ShortsBatches(resources, audio_only, packaging)
+        startup = time.monotonic() - LAUNCHED_AT
+        safe_print(f"⏱️  От запуска до первой задачи: {startup:.2f} с"
+                   + ("" if startup <= STARTUP_TARGET_SECONDS else " (долго: проверка программ или cookies выше)"))
+        if DASHBOARD:
+            resources.progress.start()
+        try:
+            await run_jobs(
+                [
+                    process_video(url, output_dir, video_volume, translation_volume, translate_names, audio_only, resources,
+                                  separate_tracks, levels_mode, packaging)
+                    for url in ordered_urls
+                ],
+                on_result
+            )
+        finally:
+            resources.progress.stop()
+    
+    # Ctrl+C отменяет все задачи: их процессы убиваются, временные папки удаляются
+    asyncio.run(run_batch())
+    success_count = counts['success']
+    failed_count = counts['failed']
     
     # Итоговая статистика
     safe_print(f"\n{'='*60}")
@@ -521,7 +1610,33 @@ def main():
     
     # Запускаем обработку
     try:
-        process_batch_parallel(urls, translate_names=True, max_workers=MAX_WORKERS)
+        audio_only = AUDIO_ONLY or '--audio-only' in sys.argv[1:]
+        separate_tracks = SEPARATE_AUDIO_TRACKS or '--separate-tracks' in sys.argv[1:]
+        policy = SCHEDULING_POLICY
+        levels_mode = MIX_LEVELS
+        packaging = OUTPUT_PACKAGING
+        for arg in sys.argv[1:]:
+            if arg.startswith('--schedule='):
+                policy = arg.split('=', 1)[1]
+            elif arg.startswith('--levels='):
+                levels_mode = arg.split('=', 1)[1]
+            elif arg.startswith('--packaging='):
+                packaging = arg.split('=', 1)[1]
+        if policy not in POLICIES:
+            safe_print(f"⚠️  Неизвестная очерёдность {policy}, доступны: {', '.join(POLICIES)}")
+            policy = SCHEDULING_POLICY
+        if levels_mode not in MIX_LEVEL_MODES:
+            safe_print(f"⚠️  Неизвестный режим громкости {levels_mode}, доступны: {', '.join(MIX_LEVEL_MODES)}")
+            levels_mode = MIX_LEVELS
+        if packaging not in PACKAGING_MODES:
+            safe_print(f"⚠️  Неизвестная упаковка {packaging}, доступны: {', '.join(PACKAGING_MODES)}")
+            packaging = OUTPUT_PACKAGING
+        if '--plan' in sys.argv[1:]:
+            plan_batch(urls, max_workers=MAX_WORKERS, audio_only=audio_only, separate_tracks=separate_tracks,
+                       levels_mode=levels_mode, packaging=packaging)
+        else:
+            process_batch_parallel(urls, translate_names=True, max_workers=MAX_WORKERS, audio_only=audio_only, policy=policy,
+                                   separate_tracks=separate_tracks, levels_mode=levels_mode, packaging=packaging)
     except KeyboardInterrupt:
         safe_print("\n\n⚠️  Прервано пользователем (Ctrl+C)")
         safe_print("💡 Обработанные видео сохранены в базе данных")
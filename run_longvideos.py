@@ -3,12 +3,12 @@
 Пакетная обработка ДЛИННЫХ YouTube видео с переводом и живыми голосами
 Версия для видео которые не прошли в основном скрипте (таймаут 20 минут)
 """
-import subprocess
 import sys
 import os
 from pathlib import Path
 import time
 import glob
+import shutil
 import re
 import sqlite3
 from datetime import datetime
@@ -16,34 +16,99 @@ import threading
 from queue import Queue
 import uuid
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
 
-try:
-    from deep_translator import GoogleTranslator
-    TRANSLATOR_AVAILABLE = True
-except ImportError:
-    TRANSLATOR_AVAILABLE = False
-    print("⚠️ Для перевода названий установите: pip install deep-translator")
+# Момент запуска - для замера времени до первой задачи
+LAUNCHED_AT = time.monotonic()
+
+from autoscale import OUTCOME_IGNORED, OUTCOME_OK, AimdController, ThreadLimit, classify_failure
+from catalog import Catalog
+from child_limits import StagePolicies
+from identities import create_identity_pool
+from layout import LAYOUT_FLAT, shard_dir
+import partials
+from planner import InfoCache, StageHistory, estimate_plan, format_duration, format_size, job_work
+from progress import FFMPEG_PROGRESS_ARGS, YTDLP_PROGRESS_ARGS, ProgressBoard, get_active_board
+from runner import ProcessTimeout, run_command, terminate_all
+from stream_packaging import (
+    HLS_MODES,
+    PACKAGING_HLS_ONLY,
+    PACKAGING_MODES,
+    PACKAGING_PLAIN,
+    build_hls_command,
+    hls_dir,
+    output_size,
+    with_faststart,
+)
+from toolchain import Toolchain, vot_command
+# Перевод названий: таблица переводов, Google или локальная модель (создаётся при первом переводе)
+from translation import get_translator
 
 # Пути к файлам
 FAILED_LOG = "failed.txt"
 DATABASE = "processed_videos.db"
 COOKIES_FILE = "cookies.txt"
+COOKIES_DIR = "cookies"  # Пул cookies: по файлу *.txt на аккаунт (папки нет - один COOKIES_FILE)
+PROXIES_FILE = "proxies.txt"  # Прокси для пула, по одному на строку (необязательно)
+PARTIAL_DIR = "cache/partial"  # Недокачанные видео: повтор продолжает загрузку с места обрыва
+PARTIAL_MAX_AGE_HOURS = 72  # Через сколько часов без повтора недокачанное удаляется (None = никогда)
+COOKIE_PROBE_RETRY_HOURS = 24  # Не удалось извлечь cookies из браузера - не пробовать снова столько часов
+
+# Раскладка готовых файлов по подпапкам (как OUTPUT_LAYOUT в run2.py; канал здесь неизвестен)
+OUTPUT_LAYOUT = LAYOUT_FLAT
 
 # Настройки многопоточности
 MAX_WORKERS = 1  # Меньше потоков для длинных видео
 
+# Автоподбор числа одновременных видео (AIMD): растёт, пока VOT и YouTube справляются,
+# уменьшается вдвое при таймаутах и бот-проверке (MAX_WORKERS - начальное значение)
+AUTOSCALE = True
+AUTOSCALE_MAX_WORKERS = 3
+
+# Упаковка для стриминга (как OUTPUT_PACKAGING в run2.py): plain, faststart, hls или hls_only -
+# многочасовое видео начинает играть сразу и перематывается без чтения всего файла
+OUTPUT_PACKAGING = PACKAGING_PLAIN
+
+# Ограничения процессов стадий (как CHILD_LIMITS и CHILD_CGROUP в run2.py)
+CHILD_LIMITS = {}
+CHILD_CGROUP = None
+
+# Формат скачивания видео (как VIDEO_FORMAT в run2.py)
+VIDEO_FORMAT = "bestvideo[height<=1080]+ba[language=ru]/bestvideo[height<=1080]+ba/best"
+
+# Для плана (--plan): сколько видео проверять одним вызовом yt-dlp и битрейт, если размер неизвестен
+INFO_BATCH_SIZE = 25
+DEFAULT_BITRATE_KBPS = 5000
+
 # УВЕЛИЧЕННЫЙ ТАЙМАУТ ДЛЯ ДЛИННЫХ ВИДЕО
 LONG_VIDEO_TIMEOUT = 3000  # 20 минут вместо 5
 
+# Живая панель прогресса всех задач (False = только обычный лог)
+DASHBOARD = True
+
 # Блокировка для потокобезопасной работы с БД и выводом
 db_lock = threading.Lock()
 print_lock = threading.Lock()
 
+# Прогресс задач пакета
+progress_board = ProgressBoard()
+
 def safe_print(*args, **kwargs):
-    """Потокобезопасный вывод"""
+    """Потокобезопасный вывод (над панелью прогресса, если она включена)"""
+    board = get_active_board()
+    if board is not None:
+        board.log(*args, **kwargs)
+        return
     with print_lock:
         print(*args, **kwargs)
 
+# Cookies и прокси для вызовов yt-dlp: каждый вызов берёт здоровую идентичность из пула
+identities = create_identity_pool(COOKIES_FILE, COOKIES_DIR, PROXIES_FILE, DATABASE, safe_print)
+
+# Ограничения дочерних процессов по стадиям; на каждой стадии - до MAX_WORKERS видео сразу
+child_limits = StagePolicies(CHILD_LIMITS, dict.fromkeys(('info', 'vot', 'download', 'mix', 'package'), MAX_WORKERS),
+                             CHILD_CGROUP, safe_print)
+
 def extract_cookies_from_browser():
     """Извлечь cookies из браузера"""
     safe_print("🍪 Извлечение cookies из браузера...")
@@ -53,10 +118,9 @@ def extract_cookies_from_browser():
     
     for browser in browsers:
         try:
-            result = subprocess.run(
-                f'yt-dlp --cookies-from-browser {browser} --cookies {COOKIES_FILE} --skip-download "https://www.youtube.com/watch?v=dQw4w9WgXcQ"',
-                shell=True,
-                capture_output=True,
+            result = run_command(
+                ['yt-dlp', '--cookies-from-browser', browser, '--cookies', COOKIES_FILE,
+                 '--skip-download', 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'],
                 timeout=30
             )
             
@@ -85,6 +149,14 @@ def init_database():
     conn.commit()
     conn.close()
 
+def load_processed_ids():
+    """Все обработанные видео одним запросом (для проверки списка URL при запуске)"""
+    with db_lock:
+        conn = sqlite3.connect(DATABASE)
+        video_ids = {row[0] for row in conn.execute('SELECT video_id FROM processed_videos')}
+        conn.close()
+        return video_ids
+
 def is_video_processed(video_id):
     """Проверить обработано ли видео (потокобезопасно)"""
     with db_lock:
@@ -159,47 +231,31 @@ def sanitize_filename(filename):
 
 def translate_to_russian(text):
     """Перевести текст на русский"""
-    if not TRANSLATOR_AVAILABLE or not text:
-        return text
-    
-    try:
-        translated = GoogleTranslator(source='auto', target='ru').translate(text)
-        return translated if translated else text
-    except Exception:
+    if not text or not get_translator().available():
         return text
+    return get_translator().translate(text)
 
 def get_video_title(url, translate=True):
     """Получить название видео с YouTube"""
     try:
-        # Используем строку для лучшей совместимости с Windows
-        cmd = f'yt-dlp --print title --no-warnings'
-        
-        if os.path.exists(COOKIES_FILE):
-            cmd += f' --cookies "{COOKIES_FILE}"'
+        cmd = ['yt-dlp', '--print', 'title', '--no-warnings']
         
-        cmd += f' "{url}"'
+        cmd.append(url)
         
         # Для Windows используем системную кодировку (cp1251/cp866)
-        import sys
         encoding = sys.stdout.encoding if sys.stdout.encoding else 'utf-8'
         
-        result = subprocess.run(
-            cmd,
-            shell=True,
-            capture_output=True,
-            text=True,
-            encoding=encoding,
-            errors='ignore'  # Игнорируем ошибки кодировки
-        )
+        # Cookies и прокси - из пула идентичностей
+        result = identities.run(cmd, encoding=encoding, limits=child_limits.get('info'))
         
         if result.returncode == 0:
-            title = result.stdout.strip()
+            title = result.stdout.text().strip()
             
             if not title:
                 return None
             
             # Переводим на русский если нужно
-            if translate and TRANSLATOR_AVAILABLE:
+            if translate and get_translator().available():
                 translated = translate_to_russian(title)
                 if translated:
                     title = translated
@@ -209,6 +265,81 @@ def get_video_title(url, translate=True):
         pass
     return None
 
+def get_plan_infos(urls):
+    """
+    Длительность и размер видео для плана одним вызовом yt-dlp на пачку (без загрузки)
+    Возвращает: {video_id: {'duration', 'filesize'}} - только для ответивших видео
+    """
+    infos = {}
+    for start in range(0, len(urls), INFO_BATCH_SIZE):
+        batch = urls[start:start + INFO_BATCH_SIZE]
+        cmd = ['yt-dlp', '-f', VIDEO_FORMAT, '--print', '%(id)s\t%(duration)s\t%(filesize,filesize_approx)s',
+               '--no-warnings', '--ignore-errors'] + batch
+        try:
+            result = identities.run(cmd, len(batch), limits=child_limits.get('info'))
+        except (ProcessTimeout, OSError):
+            continue
+        for line in result.stdout.lines:
+            parts = line.strip().split('\t')
+            if len(parts) != 3:
+                continue
+            duration, filesize = (float(value) if re.fullmatch(r'[\d.]+', value) else None for value in parts[1:])
+            infos[parts[0]] = {'duration': duration, 'filesize': filesize}
+    return infos
+
+def plan_batch(urls, output_dir="output", max_workers=MAX_WORKERS):
+    """
+    План пакета без обработки (--plan): объём загрузки, пик места и время
+    Скорость стадий - из истории запусков run2.py; VOT не вызывается, ничего не скачивается
+    """
+    init_database()
+    processed_ids = load_processed_ids()
+    new_urls = {}
+    skipped_count = 0
+    for url in urls:
+        clean_url, _ = clean_youtube_url(url)
+        video_id = extract_video_id(clean_url)
+        if video_id and video_id in processed_ids:
+            skipped_count += 1
+        elif video_id:
+            new_urls.setdefault(video_id, clean_url)
+    
+    safe_print(f"\n{'='*60}")
+    safe_print(f"🧮 План пакета: {len(new_urls)} длинных видео (уже обработано: {skipped_count})")
+    if not new_urls:
+        safe_print(f"{'='*60}")
+        return
+    
+    info_cache = InfoCache(DATABASE)
+    infos = info_cache.get_many(new_urls, VIDEO_FORMAT)
+    missing = [clean_url for video_id, clean_url in new_urls.items() if video_id not in infos]
+    if missing:
+        safe_print(f"🔎 Запрашиваю данные о {len(missing)} видео у yt-dlp (из кэша: {len(infos)})...")
+        fetched = get_plan_infos(missing)
+        info_cache.store(fetched, VIDEO_FORMAT)
+        infos.update(fetched)
+    
+    # Здесь видео обрабатывается целиком в одном потоке: стадии идут подряд, потоков - max_workers
+    stages = ['vot', 'download', 'mix']
+    jobs = [(infos.get(video_id, {}), job_work(infos.get(video_id, {}), stages, DEFAULT_BITRATE_KBPS))
+            for video_id in new_urls]
+    limits = {'jobs': max_workers}
+    rates = StageHistory(DATABASE).rates()
+    plan = estimate_plan(jobs, limits, rates, DEFAULT_BITRATE_KBPS)
+    
+    safe_print(f"📥 Скачать: ~{format_size(plan['download_bytes'])}"
+               + (f" (без данных о размере: {plan['unknown_size']} - не учтены)" if plan['unknown_size'] else ""))
+    Path(output_dir).mkdir(exist_ok=True)
+    free = shutil.disk_usage(output_dir).free
+    safe_print(f"💽 Пик места под загрузки: ~{format_size(plan['peak_disk_bytes'])} (свободно {format_size(free)})")
+    if plan['peak_disk_bytes'] > free:
+        safe_print("⚠️  Места не хватит: уменьшите MAX_WORKERS")
+    safe_print(f"⏱️  Время: ~{format_duration(plan['wall_seconds'])} ({max_workers} видео одновременно"
+               + (f", автоподбор - до {AUTOSCALE_MAX_WORKERS}" if AUTOSCALE else "") + f"; самое долгое - ~{format_duration(plan['longest_job'])})")
+    if not all(rates[stage][1] for stage in stages):
+        safe_print("💡 Для стадий без истории взяты средние значения - после запусков run2.py план станет точнее")
+    safe_print(f"{'='*60}")
+
 def load_urls_from_failed_log():
     """Загрузить URL из failed.txt"""
     if not os.path.exists(FAILED_LOG):
@@ -227,7 +358,7 @@ def load_urls_from_failed_log():
     # Убираем дубликаты
     return list(set(urls))
 
-def process_single_video(url, output_dir="output", video_volume=0.05, translation_volume=0.58, translate_names=True):
+def process_single_video(url, output_dir="output", video_volume=0.05, translation_volume=0.58, translate_names=True, packaging=OUTPUT_PACKAGING):
     """
     Обработка одного ДЛИННОГО видео (для многопоточности)
     Возвращает: (success: bool, video_id: str, message: str)
@@ -237,10 +368,12 @@ def process_single_video(url, output_dir="output", video_volume=0.05, translatio
     video_id = extract_video_id(clean_url)
     
     if not video_id:
+        progress_board.finish_job(None)
         return False, None, f"Невалидный URL: {url}"
     
     # Проверяем обработано ли уже
     if is_video_processed(video_id):
+        progress_board.finish_job(video_id)
         return False, video_id, f"Видео {video_id} уже обработано"
     
     video_type = "📱 Shorts" if is_short else "📹 Длинное видео"
@@ -252,45 +385,30 @@ def process_single_video(url, output_dir="output", video_volume=0.05, translatio
     temp_dir = f"{target_dir}/temp_{video_id}_{unique_id}"
     Path(temp_dir).mkdir(exist_ok=True)
     
+    progress_board.start_job(video_id)
+    
     try:
         safe_print(f"\n🎬 {video_type} [{video_id}] Начинаю обработку (таймаут 20 минут)...")
+        progress_board.set_stage(video_id, "озвучка")
         
         # ========== ЭТАП 1: Скачивание озвучки ==========
         safe_print(f"  🎤 [{video_id}] Скачивание озвучки (это может занять до 20 минут)...")
         
-        cmd = f'npx vot-cli-live --voice-style live --output "{temp_dir}" "{clean_url}"'
+        cmd = vot_command() + ['--voice-style', 'live', '--output', temp_dir, clean_url]
         
         try:
-            process = subprocess.Popen(
-                cmd,
-                shell=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE
-            )
-            
             # УВЕЛИЧЕННЫЙ ТАЙМАУТ: 20 минут для длинных видео
             safe_print(f"  ⏱️  [{video_id}] Жду до 20 минут на перевод...")
-            process.communicate(timeout=LONG_VIDEO_TIMEOUT)
-            returncode = process.returncode
-            
-        except subprocess.TimeoutExpired:
-            safe_print(f"  ⏱️ [{video_id}] Таймаут (20 мин), убиваю процесс...")
-            
-            try:
-                process.terminate()
-                process.wait(timeout=2)
-            except subprocess.TimeoutExpired:
-                process.kill()
-                try:
-                    process.wait(timeout=2)
-                except Exception:
-                    pass
+            result = run_command(cmd, timeout=LONG_VIDEO_TIMEOUT, limits=child_limits.get('vot'))
+            returncode = result.returncode
             
+        except ProcessTimeout:
+            safe_print(f"  ⏱️ [{video_id}] Таймаут (20 мин), процесс остановлен")
             log_failed_video(url, "Таймаут 20 минут (очень длинное видео)")
             return False, video_id, f"Таймаут даже при 20 минутах - видео слишком длинное"
         
         if returncode != 0:
-            log_failed_video(url, f"Ошибка VOT (код {returncode})")
+            log_failed_video(url, f"Ошибка VOT (код {returncode}): {result.error_summary()}")
             return False, video_id, f"Ошибка скачивания озвучки (код {returncode})"
         
         # Ждём и проверяем mp3
@@ -316,6 +434,7 @@ def process_single_video(url, output_dir="output", video_volume=0.05, translatio
         
         # ========== ЭТАП 2: Получение названия ==========
         safe_print(f"  🔍 [{video_id}] Получение названия...")
+        progress_board.set_stage(video_id, "название")
         title = get_video_title(clean_url, translate=translate_names)
         base_name = title if title else video_id
         
@@ -326,61 +445,92 @@ def process_single_video(url, output_dir="output", video_volume=0.05, translatio
         # ========== ЭТАП 3: Скачивание видео ==========
         safe_print(f"  📥 [{video_id}] Скачивание видео...")
         
-        video_file = f"{temp_dir}/video.mp4"
-        
-        cmd = f'yt-dlp -f "bestvideo[height<=1080]+ba[language=ru]/bestvideo[height<=1080]+ba/best" --merge-output-format mp4 --write-thumbnail --convert-thumbnails jpg'
+        # Качаем в постоянную папку видео: после обрыва повтор продолжит с того же места
+        download_dir = partials.work_dir(PARTIAL_DIR, video_id)
+        video_file = f"{download_dir}/video.mp4"
+        resumed = partials.partial_bytes(download_dir)
+        if resumed:
+            safe_print(f"  ⏯️ [{video_id}] Продолжаю загрузку (уже скачано {resumed/1024**2:.1f}MB)")
         
-        if os.path.exists(COOKIES_FILE):
-            cmd += f' --cookies "{COOKIES_FILE}"'
+        cmd = ['yt-dlp', '-f', VIDEO_FORMAT, '--merge-output-format', 'mp4', '--write-thumbnail', '--convert-thumbnails', 'jpg']
         
-        cmd += f' -o "{video_file}" "{clean_url}"'
+        cmd += YTDLP_PROGRESS_ARGS + ['-o', video_file, clean_url]
         
-        result = subprocess.run(cmd, shell=True, capture_output=True, text=True, errors='ignore')
+        progress_board.set_stage(video_id, "загрузка")
+        # Cookies и прокси - из пула идентичностей
+        result = identities.run(cmd, on_line=progress_board.ytdlp_handler(video_id), limits=child_limits.get('download'))
         
         # Главное - проверяем что файл создан (warnings не важны)
         if not os.path.exists(video_file):
             # Если файла нет - логируем последние строки ошибки
-            error_lines = result.stderr.split('\n') if result.stderr else []
-            error_msg = '\n'.join([line for line in error_lines if 'ERROR' in line.upper()][-3:])
+            error_msg = '\n'.join(result.stderr.errors)
             if not error_msg:
                 error_msg = "Файл не создан, причина неизвестна"
             safe_print(f"  ❌ [{video_id}] yt-dlp error: {error_msg}")
             log_failed_video(url, f"Ошибка yt-dlp: {error_msg}")
+            kept = partials.keep(download_dir)
+            if kept:
+                safe_print(f"  💾 [{video_id}] Недокачанное сохранено ({kept/1024**2:.1f}MB) - повтор продолжит загрузку")
             return False, video_id, "Файл видео не создан"
         
+        partials.adopt(download_dir, temp_dir)
+        video_file = f"{temp_dir}/video.mp4"
         safe_print(f"  ✅ [{video_id}] Видео скачано")
         
         # ========== ЭТАП 4: Микширование ==========
         safe_print(f"  🔊 [{video_id}] Микширование (Оригинал {int(video_volume*100)}%, Перевод {int(translation_volume*100)}%)...")
         
-        final_file = f"{target_dir}/{base_name_unique}.mp4"
+        final_dir = shard_dir(target_dir, OUTPUT_LAYOUT, video_id)
+        final_file = f"{final_dir}/{base_name_unique}.mp4"
+        # Только HLS: mp4 нужен лишь для нарезки и остаётся во временной папке
+        mix_file = f"{temp_dir}/packaged.mp4" if packaging == PACKAGING_HLS_ONLY else final_file
         
-        cmd = f'ffmpeg -i "{video_file}" -i "{temp_audio}" -filter_complex "[0:a]volume={video_volume}[a1];[1:a]volume={translation_volume}[a2];[a1][a2]amix=inputs=2:duration=shortest[aout]" -map 0:v -map "[aout]" -c:v copy -y "{final_file}"'
-        result = subprocess.run(cmd, shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        cmd = ['ffmpeg'] + FFMPEG_PROGRESS_ARGS + ['-i', video_file, '-i', temp_audio, '-filter_complex',
+               f'[0:a]volume={video_volume}[a1];[1:a]volume={translation_volume}[a2];[a1][a2]amix=inputs=2:duration=shortest[aout]',
+               '-map', '0:v', '-map', '[aout]', '-c:v', 'copy', '-y', mix_file]
+        cmd = with_faststart(cmd, mix_file, packaging)
+        progress_board.set_stage(video_id, "микширование")
+        result = run_command(cmd, on_line=progress_board.ffmpeg_handler(video_id), limits=child_limits.get('mix'))
         
         if result.returncode != 0:
-            log_failed_video(url, "Ошибка микширования через ffmpeg")
+            log_failed_video(url, f"Ошибка микширования через ffmpeg: {result.error_summary()}")
             return False, video_id, "Ошибка микширования"
         
+        # ========== ЭТАП 4б: Упаковка HLS ==========
+        if packaging in HLS_MODES:
+            safe_print(f"  📦 [{video_id}] Нарезка HLS...")
+            staging_dir = f"{temp_dir}/hls"
+            Path(staging_dir).mkdir(exist_ok=True)
+            cmd = build_hls_command(mix_file, staging_dir)
+            cmd[1:1] = FFMPEG_PROGRESS_ARGS
+            progress_board.set_stage(video_id, "упаковка HLS")
+            result = run_command(cmd, on_line=progress_board.ffmpeg_handler(video_id), limits=child_limits.get('package'))
+            if result.returncode != 0:
+                log_failed_video(url, f"Ошибка упаковки HLS: {result.error_summary()}")
+                return False, video_id, "Ошибка упаковки HLS"
+            
+            # Плейлист появляется на месте целиком: сервер не увидит недорезанный HLS
+            packaged_dir = hls_dir(final_file)
+            if os.path.isdir(packaged_dir):
+                shutil.rmtree(packaged_dir)
+            shutil.move(staging_dir, packaged_dir)
+            if packaging == PACKAGING_HLS_ONLY:
+                final_file = packaged_dir
+        
         # ========== ЭТАП 5: Сохранение превью ==========
         thumbnail_patterns = [
             f"{temp_dir}/video.jpg",
             f"{temp_dir}/video.webp",
         ]
         
-        thumbnail_file = f"{target_dir}/{base_name_unique}.jpg"
+        thumbnail_file = f"{final_dir}/{base_name_unique}.jpg"
         
         for pattern in thumbnail_patterns:
             if os.path.exists(pattern):
                 try:
                     # Конвертируем webp в jpg если нужно
                     if pattern.endswith('.webp'):
-                        subprocess.run(
-                            f'ffmpeg -i "{pattern}" -y "{thumbnail_file}"',
-                            shell=True,
-                            stdout=subprocess.DEVNULL,
-                            stderr=subprocess.DEVNULL
-                        )
+                        run_command(['ffmpeg', '-i', pattern, '-y', thumbnail_file], limits=child_limits.get('mix'))
                     else:
                         os.rename(pattern, thumbnail_file)
                     break
@@ -388,12 +538,14 @@ def process_single_video(url, output_dir="output", video_volume=0.05, translatio
                     pass
         
         # Получаем размер финального файла
-        final_file_size = os.path.getsize(final_file) / 1024  # KB
+        final_file_size = output_size(final_file) / 1024  # KB
         
         # Сохраняем в базу данных
         mark_video_processed(video_id, url, base_name, final_file_size)
+        Catalog(DATABASE).record(video_id, url=url, title=base_name, output_path=os.path.abspath(final_file),
+                                 is_short=is_short, file_size_kb=final_file_size)
         
-        safe_print(f"  ✅ [{video_id}] Готово: {base_name}.mp4 ({final_file_size/1024:.1f}MB)")
+        safe_print(f"  ✅ [{video_id}] Готово: {base_name}.{os.path.splitext(final_file)[1].lstrip('.')} ({final_file_size/1024:.1f}MB)")
         if os.path.exists(thumbnail_file):
             safe_print(f"  🖼️ [{video_id}] Превью: {base_name}.jpg")
         
@@ -406,22 +558,59 @@ def process_single_video(url, output_dir="output", video_volume=0.05, translatio
     finally:
         # Очистка временной папки
         try:
-            import shutil
             if os.path.exists(temp_dir):
                 shutil.rmtree(temp_dir)
         except Exception:
             pass
+        
+        progress_board.finish_job(video_id)
 
-def process_batch_parallel(urls, output_dir="output", video_volume=0.05, translation_volume=0.58, translate_names=True, max_workers=MAX_WORKERS):
+def process_limited(job_limit, autoscale, *args):
+    """
+    Обработать видео, дождавшись свободного места под лимитом
+    Исход уходит в автоподбор параллельности (время не учитывается - длина видео очень разная)
+    """
+    with job_limit:
+        success, video_id, message = process_single_video(*args)
+    
+    if autoscale is not None:
+        if success:
+            outcome = OUTCOME_OK
+        elif not video_id or message.endswith("уже обработано"):
+            outcome = OUTCOME_IGNORED
+        else:
+            outcome = classify_failure(message)
+        autoscale.record('jobs', outcome)
+    return success, video_id, message
+
+def process_batch_parallel(urls, output_dir="output", video_volume=0.05, translation_volume=0.58, translate_names=True, max_workers=MAX_WORKERS, packaging=OUTPUT_PACKAGING):
     """
     Параллельная обработка пакета ДЛИННЫХ видео
+    packaging - упаковка результата (см. stream_packaging.PACKAGING_MODES)
     """
     # Инициализируем базу данных
     init_database()
     
+    # Программы ищутся и проверяются заново, только если их обновили
+    tools = Toolchain(DATABASE).load()
+    for name in tools.probed:
+        safe_print(f"🔧 {name}: {tools.tools[name].version or '?'} ({tools.tools[name].path})")
+    for problem in tools.warnings(encoders=['aac'], filters=['volume', 'amix']):
+        safe_print(f"⚠️  {problem}")
+    if tools.missing():
+        safe_print(f"❌ Без {', '.join(tools.missing())} обработка невозможна")
+        return
+    
     # Проверяем наличие cookies
-    if not os.path.exists(COOKIES_FILE):
-        extract_cookies_from_browser()
+    if len(identities.identities) > 1:
+        safe_print(f"🍪 Пул cookies и прокси: {', '.join(identity.label() for identity in identities.identities)}")
+    elif not os.path.exists(COOKIES_FILE):
+        # Перебор браузеров - несколько запусков yt-dlp; после неудачи не повторяем при каждом старте
+        if tools.probe_failed_recently('browser-cookies', COOKIE_PROBE_RETRY_HOURS):
+            safe_print(f"🍪 Cookies из браузера недавно не извлеклись - работаю без них "
+                       f"(повтор через {COOKIE_PROBE_RETRY_HOURS} ч или положите {COOKIES_FILE})")
+        else:
+            tools.record_probe('browser-cookies', extract_cookies_from_browser())
     else:
         safe_print(f"🍪 Используем существующий файл cookies: {COOKIES_FILE}")
     
@@ -429,22 +618,38 @@ def process_batch_parallel(urls, output_dir="output", video_volume=0.05, transla
     Path(f"{output_dir}/videos").mkdir(exist_ok=True)
     Path(f"{output_dir}/shorts").mkdir(exist_ok=True)
     
+    # Недокачанное, к которому давно не возвращались, больше не пригодится
+    removed, freed = partials.collect_stale(PARTIAL_DIR, PARTIAL_MAX_AGE_HOURS)
+    if removed:
+        safe_print(f"🧹 Удалено недокачанных загрузок: {removed} ({freed/1024**2:.1f}MB)")
+    
     # Фильтруем уже обработанные
     new_urls = []
     skipped_count = 0
+    duplicate_count = 0
+    processed_ids = load_processed_ids()
+    # Одно видео под разными ссылками (/shorts/ID и watch?v=ID) - одна задача:
+    # иначе две загрузки делят папку недокачанного в PARTIAL_DIR
+    seen_ids = set()
     
     for url in urls:
         clean_url, _ = clean_youtube_url(url)
         video_id = extract_video_id(clean_url)
         
-        if video_id and is_video_processed(video_id):
+        if video_id and video_id in processed_ids:
             safe_print(f"⏭️  Видео {video_id} уже обработано, пропускаю")
             skipped_count += 1
+        elif video_id and video_id in seen_ids:
+            duplicate_count += 1
         else:
+            if video_id:
+                seen_ids.add(video_id)
             new_urls.append(url)
     
     if skipped_count > 0:
         safe_print(f"📊 Пропущено уже обработанных: {skipped_count}")
+    if duplicate_count > 0:
+        safe_print(f"📊 Пропущено повторов в списке: {duplicate_count}")
     
     if not new_urls:
         safe_print("\n✅ Все видео уже обработаны!")
@@ -453,8 +658,11 @@ def process_batch_parallel(urls, output_dir="output", video_volume=0.05, transla
     safe_print(f"\n{'='*60}")
     safe_print(f"📋 К обработке: {len(new_urls)} длинных видео")
     safe_print(f"⏱️  Таймаут на видео: 20 минут")
-    safe_print(f"🔄 Параллельных потоков: {max_workers}")
-    if translate_names and TRANSLATOR_AVAILABLE:
+    safe_print(f"🔄 Параллельных потоков: {max_workers}" + (f" (автоподбор до {AUTOSCALE_MAX_WORKERS})" if AUTOSCALE else ""))
+    safe_print(f"🧮 Процессы: {child_limits.describe(('vot', 'download', 'mix'))}")
+    if packaging != PACKAGING_PLAIN:
+        safe_print(f"📦 Упаковка: {packaging}")
+    if translate_names and get_translator().available():
         safe_print("🌍 Перевод названий: включен")
     safe_print(f"{'='*60}\n")
     
@@ -462,33 +670,57 @@ def process_batch_parallel(urls, output_dir="output", video_volume=0.05, transla
     success_count = 0
     failed_count = 0
     
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+    progress_board.add_jobs(len(new_urls))
+    dashboard = progress_board if DASHBOARD else nullcontext()
+    
+    # Потоков - на максимум автоподбора, одновременно работают столько, сколько разрешает лимит
+    job_limit = ThreadLimit(max_workers)
+    autoscale = None
+    thread_count = max_workers
+    if AUTOSCALE:
+        high = max(AUTOSCALE_MAX_WORKERS, max_workers)
+        autoscale = AimdController({'jobs': (max_workers, 1, high)}, lambda stage, limit: job_limit.resize(limit), safe_print)
+        thread_count = high
+    
+    safe_print(f"⏱️  От запуска до первой задачи: {time.monotonic() - LAUNCHED_AT:.2f} с")
+    
+    with dashboard, ThreadPoolExecutor(max_workers=thread_count) as executor:
         # Запускаем все задачи
         future_to_url = {
             executor.submit(
-                process_single_video,
+                process_limited,
+                job_limit,
+                autoscale,
                 url,
                 output_dir,
                 video_volume,
                 translation_volume,
-                translate_names
+                translate_names,
+                packaging
             ): url for url in new_urls
         }
         
         # Собираем результаты по мере выполнения
-        for future in as_completed(future_to_url):
-            url = future_to_url[future]
-            try:
-                success, video_id, message = future.result()
-                if success:
-                    success_count += 1
-                else:
+        try:
+            for future in as_completed(future_to_url):
+                url = future_to_url[future]
+                try:
+                    success, video_id, message = future.result()
+                    if success:
+                        success_count += 1
+                    else:
+                        failed_count += 1
+                        if video_id:
+                            safe_print(f"⚠️  [{video_id}] {message}")
+                except Exception as e:
                     failed_count += 1
-                    if video_id:
-                        safe_print(f"⚠️  [{video_id}] {message}")
-            except Exception as e:
-                failed_count += 1
-                safe_print(f"❌ Ошибка обработки {url}: {e}")
+                    safe_print(f"❌ Ошибка обработки {url}: {e}")
+        except KeyboardInterrupt:
+            # Не ждём 20 минут: убиваем запущенные npx/yt-dlp/ffmpeg и снимаем очередь
+            executor.shutdown(wait=False, cancel_futures=True)
+            job_limit.close()
+            terminate_all()
+            raise
     
     # Итоговая статистика
     safe_print(f"\n{'='*60}")
@@ -527,7 +759,17 @@ def main():
     
     # Запускаем обработку
     try:
-        process_batch_parallel(urls, translate_names=True, max_workers=MAX_WORKERS)
+        packaging = OUTPUT_PACKAGING
+        for arg in sys.argv[1:]:
+            if arg.startswith('--packaging='):
+                packaging = arg.split('=', 1)[1]
+        if packaging not in PACKAGING_MODES:
+            safe_print(f"⚠️  Неизвестная упаковка {packaging}, доступны: {', '.join(PACKAGING_MODES)}")
+            packaging = OUTPUT_PACKAGING
+        if '--plan' in sys.argv[1:]:
+            plan_batch(urls, max_workers=MAX_WORKERS)
+        else:
+            process_batch_parallel(urls, translate_names=True, max_workers=MAX_WORKERS, packaging=packaging)
     except KeyboardInterrupt:
         safe_print("\n\n⚠️  Прервано пользователем (Ctrl+C)")
         safe_print("💡 Обработанные видео сохранены в базе данных")
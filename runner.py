@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Единый запуск внешних программ (npx, yt-dlp, ffmpeg) для всех скриптов
+Без shell: аргументы передаются списком
+Вывод читается построчно в кольцевой буфер, поэтому память на задачу
+не растёт даже для многочасовых загрузок
+"""
+import asyncio
+import collections
+import os
+import re
+import shutil
+import signal
+import subprocess
+import threading
+
+# Сколько последних строк вывода хранить на процесс
+TAIL_LINES = 200
+
+# Сколько последних строк с ошибками хранить для лога
+ERROR_LINES = 3
+
+# Слишком длинные строки обрезаются (защита от вывода без переводов строк)
+MAX_LINE_CHARS = 4096
+
+# Размер блока чтения из канала
+READ_CHUNK = 64 * 1024
+
+# Сколько ждать мягкого завершения процесса перед kill
+TERMINATE_GRACE_SECONDS = 2
+
+# Найденные исполняемые файлы {имя: путь} - PATH перебирается один раз на программу
+_executables = {}
+
+# Запущенные синхронно процессы - чтобы убить их при Ctrl+C
+_live_processes = set()
+_live_lock = threading.Lock()
+
+
+class ProcessTimeout(Exception):
+    """Процесс не уложился в таймаут и был убит"""
+
+
+class OutputTail:
+    """
+    Кольцевой буфер последних строк вывода
+    Отдельно запоминает последние строки с ERROR
+    """
+
+    def __init__(self, max_lines=TAIL_LINES, max_errors=ERROR_LINES):
+        self.lines = collections.deque(maxlen=max_lines)
+        self.errors = collections.deque(maxlen=max_errors)
+
+    def add(self, line):
+        """Добавить строку"""
+        self.lines.append(line)
+        if 'ERROR' in line.upper():
+            self.errors.append(line)
+
+    def text(self):
+        """Сохранённые строки одним текстом"""
+        return '\n'.join(self.lines)
+
+    def error_summary(self):
+        """Последние строки с ошибками (или последняя строка вывода)"""
+        if self.errors:
+            return '\n'.join(self.errors)
+        return self.lines[-1] if self.lines else ''
+
+
+class LineSplitter:
+    """Разбивает поток байт на строки по \\n и \\r (прогресс yt-dlp пишется через \\r)"""
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        self.buffer = b''
+
+    def feed(self, chunk):
+        """Добавить байты, вернуть готовые строки"""
+        self.buffer += chunk
+        parts = re.split(rb'[\r\n]', self.buffer)
+        self.buffer = parts.pop()
+        if len(self.buffer) > MAX_LINE_CHARS * 4:
+            self.buffer = self.buffer[-MAX_LINE_CHARS:]
+        return [self._decode(part) for part in parts if part.strip()]
+
+    def flush(self):
+        """Остаток без перевода строки в конце"""
+        rest, self.buffer = self.buffer, b''
+        return [self._decode(rest)] if rest.strip() else []
+
+    def _decode(self, raw):
+        return raw.decode(self.encoding, errors='ignore')[:MAX_LINE_CHARS]
+
+
+class CommandResult:
+    """Результат запуска: код возврата и хвосты stdout/stderr"""
+
+    def __init__(self, returncode, stdout, stderr):
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+
+    def error_summary(self):
+        """Последние строки ошибок для log_failed_video"""
+        return self.stderr.error_summary() or self.stdout.error_summary()
+
+
+def register_executable(name, path):
+    """Запомнить путь к программе (см. toolchain.py), чтобы не искать её при каждом запуске"""
+    _executables[name] = path
+
+
+def resolve_command(argv):
+    """Найти исполняемый файл (на Windows npx - это npx.cmd)"""
+    executable = _executables.get(argv[0])
+    if executable is None:
+        executable = shutil.which(argv[0])
+        if executable is not None:
+            _executables[argv[0]] = executable
+    return [executable or argv[0]] + [str(arg) for arg in argv[1:]]
+
+
+def signal_process_tree(pid, force=False):
+    """Отправить сигнал процессу и всем его потомкам"""
+    try:
+        if os.name == 'nt':
+            # npx.cmd запускает node дочерним процессом - убиваем всё дерево
+            subprocess.run(
+                ['taskkill', '/T', '/F', '/PID', str(pid)],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL
+            )
+        else:
+            os.killpg(pid, signal.SIGKILL if force else signal.SIGTERM)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _popen_kwargs(capture_stdout, extra=None):
+    """Общие параметры запуска (extra - от ограничений процесса, см. child_limits.py)"""
+    return dict(
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE if capture_stdout else None,
+        stderr=subprocess.PIPE,
+        # Своя группа процессов, чтобы убивать потомков вместе с родителем
+        start_new_session=(os.name != 'nt'),
+        **(extra or {})
+    )
+
+
+def _prepare(argv, limits):
+    """Команда и доп. параметры запуска с учётом ограничений (limits - ChildPolicy или None)"""
+    if limits is None:
+        return resolve_command(argv), None
+    argv, extra = limits.prepare(argv)
+    return resolve_command(argv), extra
+
+
+def _kill_sync(process):
+    """Завершить процесс с потомками: сначала мягко, потом жёстко"""
+    if process.poll() is not None:
+        return
+    signal_process_tree(process.pid)
+    try:
+        process.wait(timeout=TERMINATE_GRACE_SECONDS)
+    except subprocess.TimeoutExpired:
+        signal_process_tree(process.pid, force=True)
+        process.wait()
+
+
+def _pump(stream, tail, encoding, on_line, on_chunk=None):
+    """
+    Читать канал процесса построчно в буфер (в отдельном потоке)
+    on_chunk - вместо разбора на строки отдавать сырые блоки байт
+    """
+    splitter = LineSplitter(encoding)
+    for chunk in iter(lambda: stream.read1(READ_CHUNK), b''):
+        if on_chunk is not None:
+            on_chunk(chunk)
+            continue
+        for line in splitter.feed(chunk):
+            tail.add(line)
+            if on_line is not None:
+                on_line(line)
+    for line in splitter.flush():
+        tail.add(line)
+        if on_line is not None:
+            on_line(line)
+    stream.close()
+
+
+def run_command(argv, timeout=None, capture_stdout=True, encoding='utf-8', on_line=None, on_stdout=None, limits=None):
+    """
+    Запустить программу и дождаться её (для потоков)
+    capture_stdout=False - stdout идёт прямо в консоль
+    on_line - вызывается для каждой строки вывода
+    on_stdout - получает stdout сырыми блоками байт (PCM и прочие двоичные данные)
+    limits - ограничения процесса по стадии (child_limits.ChildPolicy)
+    Возвращает CommandResult, при таймауте - ProcessTimeout
+    """
+    command, extra = _prepare(argv, limits)
+    process = subprocess.Popen(command, **_popen_kwargs(capture_stdout, extra))
+    if limits is not None:
+        limits.attach(process.pid)
+    with _live_lock:
+        _live_processes.add(process)
+
+    stdout_tail = OutputTail()
+    stderr_tail = OutputTail()
+    readers = [threading.Thread(target=_pump, args=(process.stderr, stderr_tail, encoding, on_line), daemon=True)]
+    if capture_stdout:
+        readers.append(threading.Thread(target=_pump, args=(process.stdout, stdout_tail, encoding, on_line, on_stdout), daemon=True))
+    for reader in readers:
+        reader.start()
+
+    try:
+        process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        _kill_sync(process)
+        raise ProcessTimeout(f"{argv[0]}: таймаут {timeout} сек")
+    except BaseException:
+        # Ctrl+C и прочее - не оставляем процесс сиротой
+        _kill_sync(process)
+        raise
+    finally:
+        with _live_lock:
+            _live_processes.discard(process)
+
+    for reader in readers:
+        reader.join()
+
+    return CommandResult(process.returncode, stdout_tail, stderr_tail)
+
+
+def terminate_all():
+    """Убить все процессы, запущенные через run_command (при Ctrl+C)"""
+    with _live_lock:
+        processes = list(_live_processes)
+    for process in processes:
+        _kill_sync(process)
+
+
+async def _kill_async(process):
+    """Завершить процесс с потомками: сначала мягко, потом жёстко"""
+    if process.returncode is not None:
+        return
+    signal_process_tree(process.pid)
+    try:
+        await asyncio.wait_for(process.wait(), TERMINATE_GRACE_SECONDS)
+    except asyncio.TimeoutError:
+        signal_process_tree(process.pid, force=True)
+        await process.wait()
+
+
+async def _pump_async(stream, tail, encoding, on_line, on_chunk=None):
+    """Читать канал процесса построчно в буфер (задача asyncio)"""
+    splitter = LineSplitter(encoding)
+    while True:
+        chunk = await stream.read(READ_CHUNK)
+        if not chunk:
+            break
+        if on_chunk is not None:
+            on_chunk(chunk)
+            continue
+        for line in splitter.feed(chunk):
+            tail.add(line)
+            if on_line is not None:
+                on_line(line)
+    for line in splitter.flush():
+        tail.add(line)
+        if on_line is not None:
+            on_line(line)
+
+
+async def run_command_async(argv, timeout=None, capture_stdout=True, encoding='utf-8', on_line=None, on_stdout=None, limits=None):
+    """
+    То же что run_command, но для asyncio
+    При таймауте или отмене задачи процесс (с потомками) убивается
+    """
+    command, extra = _prepare(argv, limits)
+    process = await asyncio.create_subprocess_exec(*command, **_popen_kwargs(capture_stdout, extra))
+    if limits is not None:
+        limits.attach(process.pid)
+
+    stdout_tail = OutputTail()
+    stderr_tail = OutputTail()
+    readers = [_pump_async(process.stderr, stderr_tail, encoding, on_line)]
+    if capture_stdout:
+        readers.append(_pump_async(process.stdout, stdout_tail, encoding, on_line, on_stdout))
+
+    async def wait():
+        await asyncio.gather(*readers)
+        return await process.wait()
+
+    try:
+        returncode = await asyncio.wait_for(wait(), timeout)
+    except asyncio.TimeoutError:
+        await _kill_async(process)
+        raise ProcessTimeout(f"{argv[0]}: таймаут {timeout} сек")
+    except asyncio.CancelledError:
+        await _kill_async(process)
+        raise
+
+    return CommandResult(returncode, stdout_tail, stderr_tail)
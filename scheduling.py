@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Политики очерёдности задач пакета
+Политика превращает задачу в ключ приоритета: меньший ключ получает слот стадии раньше
+"""
+import threading
+
+POLICY_FIFO = "fifo"  # В порядке файла
+POLICY_SJF = "sjf"  # Сначала короткие (по длительности/размеру)
+POLICY_SHORTS = "shorts"  # Сначала Shorts, остальное в порядке файла
+POLICY_ROUND_ROBIN = "round_robin"  # По очереди из каждого канала
+
+POLICIES = (POLICY_FIFO, POLICY_SJF, POLICY_SHORTS, POLICY_ROUND_ROBIN)
+
+# Ожидаемая длительность, если yt-dlp её не сообщил
+SHORTS_EXPECTED_DURATION = 60
+UNKNOWN_EXPECTED_DURATION = 3600
+
+# Битрейт для оценки длительности по размеру файла
+ESTIMATE_BITRATE_KBPS = 5000
+
+
+def expected_duration(is_short, info=None):
+    """Ожидаемая длительность видео в секундах (для оценки длины задачи)"""
+    if info:
+        if info.get('duration'):
+            return info['duration']
+        if info.get('filesize'):
+            return info['filesize'] * 8 / (ESTIMATE_BITRATE_KBPS * 1000)
+    return SHORTS_EXPECTED_DURATION if is_short else UNKNOWN_EXPECTED_DURATION
+
+
+class JobScheduler:
+    """
+    Ключи приоритета задач по выбранной политике (потокобезопасно)
+    Порядковый номер задачи - её позиция в списке URL
+    """
+
+    def __init__(self, urls, policy=POLICY_FIFO):
+        if policy not in POLICIES:
+            raise ValueError(f"Неизвестная политика очерёдности: {policy} (доступны: {', '.join(POLICIES)})")
+        self.policy = policy
+        self.positions = {}
+        for position, url in enumerate(urls):
+            self.positions.setdefault(url, position)
+        self.source_counts = {}
+        self.source_turns = {}
+        self.lock = threading.Lock()
+
+    def add(self, url):
+        """Поставить задачу в конец очереди (пакет пополняется на ходу, см. api.py)"""
+        with self.lock:
+            self.positions.setdefault(url, len(self.positions))
+
+    def needs_info(self):
+        """Нужны ли политике данные о видео (длительность, канал)"""
+        return self.policy in (POLICY_SJF, POLICY_ROUND_ROBIN)
+
+    def _source_turn(self, url, source):
+        """Номер задачи внутри своего канала (0, 1, 2...) - назначается один раз"""
+        with self.lock:
+            if url not in self.source_turns:
+                turn = self.source_counts.get(source, 0)
+                self.source_counts[source] = turn + 1
+                self.source_turns[url] = turn
+            return self.source_turns[url]
+
+    def priority(self, url, is_short, info=None):
+        """
+        Ключ приоритета задачи (кортеж, меньше = раньше)
+        info - результат get_video_info, если уже известен
+        """
+        position = self.positions.get(url, len(self.positions))
+
+        if self.policy == POLICY_SJF:
+            return (expected_duration(is_short, info), position)
+        if self.policy == POLICY_SHORTS:
+            return (0 if is_short else 1, position)
+        if self.policy == POLICY_ROUND_ROBIN:
+            # ID канала не меняется при переименовании; без него - название
+            source = (info or {}).get('channel_id') or (info or {}).get('channel')
+            if not source:
+                # Канал неизвестен - задача сама себе источник
+                return (0, position)
+            return (self._source_turn(url, source), position)
+        return (position,)
+
+    def order(self, urls, is_short):
+        """URL в порядке запуска (по ключам, известным до получения данных о видео)"""
+        return sorted(urls, key=lambda url: self.priority(url, is_short(url)))
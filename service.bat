@@ -0,0 +1,17 @@
+@echo off
+chcp 65001 >nul
+title Dubbing Job Service
+color 0A
+
+cls
+echo ========================================
+echo   Local job service (HTTP)
+echo   http://127.0.0.1:8765/jobs
+echo   Stop: Ctrl+C
+echo ========================================
+echo.
+
+python service.py %*
+
+echo.
+pause
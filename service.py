@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Локальный HTTP-сервис задач поверх api.Pipeline: один тёплый процесс на все пакеты
+    POST   /jobs              {"url": "..."} или {"urls": [...]} -> 202 и принятые задачи
+    GET    /jobs              все задачи
+    GET    /jobs/<id>         состояние задачи и её последние события
+    GET    /jobs/<id>/events  события построчно (JSON на строку), пока задача не завершится;
+                              ?after=N - только новее события N
+    DELETE /jobs/<id>         отменить задачу
+    GET    /health            сервис жив, сколько задач в работе
+По умолчанию слушает только localhost; с --token запросы должны нести
+заголовок "Authorization: Bearer <token>"
+Пример: python service.py --port 8765
+"""
+import argparse
+import hmac
+import json
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from api import FINISHED_STATUSES, Pipeline
+from run2 import MAX_WORKERS, OUTPUT_PACKAGING, safe_print
+from stream_packaging import PACKAGING_MODES
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Больше URL за один запрос не принимаем
+MAX_URLS_PER_REQUEST = 1000
+
+# Поток событий: пустая строка раз в столько секунд, чтобы прокси и клиенты не рвали соединение
+EVENTS_KEEPALIVE = 15
+
+
+class JobHandler(BaseHTTPRequestHandler):
+    """Обработчик запросов; конвейер и токен - в атрибутах сервера"""
+
+    server_version = "DubService/1.0"
+
+    def log_message(self, format, *args):
+        safe_print(f"🌐 {self.address_string()} {format % args}")
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status, message):
+        self._send_json(status, {'error': message})
+
+    def _authorized(self):
+        token = self.server.token
+        # Сравнение за постоянное время: по задержке ответа токен не подобрать
+        if token and not hmac.compare_digest(self.headers.get('Authorization', '').encode('utf-8'),
+                                             f"Bearer {token}".encode('utf-8')):
+            self._error(401, "Нужен заголовок Authorization: Bearer <token>")
+            return False
+        return True
+
+    def _route(self):
+        """Путь -> (ID задачи или None, остаток пути)"""
+        parts = [part for part in urlsplit(self.path).path.split('/') if part]
+        if not parts or parts[0] != 'jobs':
+            return None, parts
+        return (parts[1] if len(parts) > 1 else None), parts[2:]
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        path = urlsplit(self.path)
+        if path.path == '/health':
+            active = sum(1 for job in self.server.pipeline.list_jobs() if job.status not in FINISHED_STATUSES)
+            self._send_json(200, {'status': 'ok', 'active_jobs': active})
+            return
+
+        job_id, rest = self._route()
+        if path.path.rstrip('/') == '/jobs':
+            self._send_json(200, {'jobs': [job.to_dict() for job in self.server.pipeline.list_jobs()]})
+            return
+        job = self.server.pipeline.get(job_id) if job_id else None
+        if job is None:
+            self._error(404, "Задача не найдена")
+        elif rest == ['events']:
+            after = parse_qs(path.query).get('after', ['0'])[0]
+            self._stream_events(job, int(after) if after.isdigit() else 0)
+        elif not rest:
+            self._send_json(200, dict(job.to_dict(), events=job.recent_events()))
+        else:
+            self._error(404, "Неизвестный путь")
+
+    def _stream_events(self, job, after):
+        """События задачи построчно до её завершения (соединение закрывается в конце)"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson; charset=utf-8')
+        self.end_headers()
+        try:
+            while True:
+                for event in job.events(after, timeout=EVENTS_KEEPALIVE):
+                    after = event['seq']
+                    self.wfile.write(json.dumps(event, ensure_ascii=False).encode('utf-8') + b'\n')
+                    self.wfile.flush()
+                if job.done():
+                    return
+                self.wfile.write(b'\n')
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # Клиент ушёл - задача продолжается
+            return
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        job_id, _ = self._route()
+        if urlsplit(self.path).path.rstrip('/') != '/jobs' or job_id:
+            self._error(404, "Неизвестный путь")
+            return
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            self._error(400, "Тело запроса - не JSON")
+            return
+
+        if not isinstance(payload, dict):
+            payload = {}
+        urls = payload.get('urls') or ([payload['url']] if payload.get('url') else [])
+        if not isinstance(urls, list) or not all(isinstance(url, str) and url.strip() for url in urls) or not urls:
+            self._error(400, 'Нужно {"url": "..."} или {"urls": ["...", ...]}')
+            return
+        if len(urls) > MAX_URLS_PER_REQUEST:
+            self._error(413, f"Не больше {MAX_URLS_PER_REQUEST} URL за запрос")
+            return
+        try:
+            jobs = [self.server.pipeline.submit(url.strip()) for url in urls]
+        except RuntimeError as e:
+            self._error(503, str(e))
+            return
+        self._send_json(202, {'jobs': [job.to_dict() for job in jobs]})
+
+    def do_DELETE(self):
+        if not self._authorized():
+            return
+        job_id, rest = self._route()
+        job = self.server.pipeline.get(job_id) if job_id and not rest else None
+        if job is None:
+            self._error(404, "Задача не найдена")
+            return
+        job.cancel()
+        self._send_json(202, job.to_dict())
+
+
+def serve(pipeline, host=DEFAULT_HOST, port=DEFAULT_PORT, token=None):
+    """Обслуживать запросы, пока не нажмут Ctrl+C"""
+    server = ThreadingHTTPServer((host, port), JobHandler)
+    server.daemon_threads = True
+    server.pipeline = pipeline
+    server.token = token
+    safe_print(f"🌐 Сервис задач: http://{host}:{port}/jobs" + (" (с токеном)" if token else ""))
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+def main():
+    """Главная функция"""
+    parser = argparse.ArgumentParser(description="Локальный HTTP-сервис задач озвучки (один тёплый процесс)")
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f"Адрес (по умолчанию {DEFAULT_HOST} - только этот компьютер)")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--token', help="Требовать заголовок Authorization: Bearer <token>")
+    parser.add_argument('--output-dir', default="output")
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS, help="Одновременных загрузок")
+    parser.add_argument('--audio-only', action='store_true', help="Сохранять только звук (m4a/opus)")
+    parser.add_argument('--packaging', choices=PACKAGING_MODES, default=OUTPUT_PACKAGING,
+                        help="Упаковка для стриминга: faststart, HLS рядом с mp4 (hls) или вместо него (hls_only)")
+    args = parser.parse_args()
+
+    if args.host not in ('127.0.0.1', 'localhost', '::1') and not args.token:
+        safe_print("⚠️  Сервис доступен из сети без токена - любой сможет ставить задачи (--token)")
+
+    pipeline = Pipeline(args.output_dir, args.workers, audio_only=args.audio_only, packaging=args.packaging)
+    try:
+        pipeline.start()
+    except RuntimeError as e:
+        safe_print(f"❌ {e}")
+        return 1
+
+    try:
+        serve(pipeline, args.host, args.port, args.token)
+    except KeyboardInterrupt:
+        safe_print("\n⚠️  Остановка: незавершённые задачи отменяются")
+    except OSError as e:
+        safe_print(f"❌ Не удалось открыть порт {args.port}: {e}")
+        return 1
+    finally:
+        pipeline.close(wait=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Упаковка готовых видео для локального стриминга
+Обычный mp4 от ffmpeg хранит индекс (moov) в конце: медиасервер и плеер читают весь файл,
+прежде чем начать показ. faststart переносит индекс в начало тем же проходом ffmpeg,
+HLS режет видео на сегменты (fMP4/CMAF) с плейлистом - показ начинается сразу, а перемотка
+многочасового видео запрашивает только нужный сегмент
+    <название>_<id>.mp4        - видео (faststart)
+    <название>_<id>.hls/       - HLS рядом с ним или вместо него:
+        index.m3u8, init.mp4, 00000.m4s, 00001.m4s, ...
+"""
+import os
+
+PACKAGING_PLAIN = "plain"  # Как раньше: индекс в конце файла
+PACKAGING_FASTSTART = "faststart"  # Индекс в начале mp4/m4a
+PACKAGING_HLS = "hls"  # mp4 с faststart и HLS рядом
+PACKAGING_HLS_ONLY = "hls_only"  # Только HLS, без mp4
+PACKAGING_MODES = (PACKAGING_PLAIN, PACKAGING_FASTSTART, PACKAGING_HLS, PACKAGING_HLS_ONLY)
+
+# Режимы, в которых после микширования собирается HLS (только для видео)
+HLS_MODES = (PACKAGING_HLS, PACKAGING_HLS_ONLY)
+
+# Контейнеры, у которых есть moov
+FASTSTART_EXTENSIONS = ('.mp4', '.m4a', '.mov')
+
+# Папка HLS рядом с видео и плейлист в ней
+HLS_DIR_SUFFIX = ".hls"
+HLS_PLAYLIST = "index.m3u8"
+
+# Длительность сегмента (сек): ffmpeg режет по ключевым кадрам, поэтому это цель, а не точное значение
+HLS_SEGMENT_SECONDS = 6
+
+# Тип сегментов: fmp4 (CMAF, .m4s) или mpegts (.ts - для совсем старых плееров)
+HLS_SEGMENT_TYPE = "fmp4"
+
+
+def faststart_args(output_file, mode):
+    """Аргументы вывода ffmpeg для индекса в начале файла (пусто, если не нужно или не mp4)"""
+    if mode == PACKAGING_PLAIN or os.path.splitext(output_file)[1].lower() not in FASTSTART_EXTENSIONS:
+        return []
+    return ['-movflags', '+faststart']
+
+
+def with_faststart(cmd, output_file, mode):
+    """Команда ffmpeg с faststart для вывода output_file (аргументы вывода - перед его именем)"""
+    args = faststart_args(output_file, mode)
+    if not args or output_file not in cmd:
+        return cmd
+    index = len(cmd) - 1 - cmd[::-1].index(output_file)
+    return cmd[:index] + args + cmd[index:]
+
+
+def hls_dir(media_file):
+    """Папка HLS для видео: 'Название_id.mp4' -> 'Название_id.hls'"""
+    return os.path.splitext(media_file)[0] + HLS_DIR_SUFFIX
+
+
+def build_hls_command(source_file, output_dir, segment_seconds=HLS_SEGMENT_SECONDS, segment_type=HLS_SEGMENT_TYPE):
+    """
+    Команда ffmpeg: нарезать готовое видео на сегменты HLS без перекодирования
+    Все дорожки звука (перевод и оригинал) попадают в сегменты как есть
+    """
+    extension = 'm4s' if segment_type == 'fmp4' else 'ts'
+    cmd = [
+        'ffmpeg', '-i', source_file, '-map', '0:v:0', '-map', '0:a', '-c', 'copy',
+        '-f', 'hls', '-hls_time', str(segment_seconds), '-hls_playlist_type', 'vod',
+        '-hls_flags', 'independent_segments', '-hls_segment_type', segment_type,
+        '-hls_segment_filename', os.path.join(output_dir, f'%05d.{extension}'),
+    ]
+    if segment_type == 'fmp4':
+        cmd += ['-hls_fmp4_init_filename', 'init.mp4']
+    return cmd + ['-y', os.path.join(output_dir, HLS_PLAYLIST)]
+
+
+def output_size(path):
+    """Размер готового результата в байтах: файла или всей папки HLS"""
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
@@ -0,0 +1,77 @@
+from autoscale import (
+    OUTCOME_FAILED,
+    OUTCOME_IGNORED,
+    OUTCOME_OK,
+    OUTCOME_OVERLOAD,
+    AimdController,
+    StageReport,
+    classify_failure,
+)
+
+
+def make_controller(limit=4, low=1, high=8):
+    applied = []
+    controller = AimdController({'vot': (limit, low, high)}, lambda stage, value: applied.append((stage, value)))
+    return controller, applied
+
+
+def test_classify_failure():
+    assert classify_failure("HTTP Error 429: Too Many Requests") == OUTCOME_OVERLOAD
+    assert classify_failure("Таймаут 300 сек") == OUTCOME_OVERLOAD
+    assert classify_failure("ERROR: Private video") == OUTCOME_IGNORED
+    assert classify_failure("ffmpeg exited with 1") == OUTCOME_FAILED
+
+
+def test_stage_report_keeps_most_severe():
+    report = StageReport()
+    report.fail("Video unavailable")
+    report.fail("something broke")
+    report.fail("Video unavailable")
+    assert report.outcome == OUTCOME_FAILED
+    report.fail("HTTP Error 429")
+    assert report.outcome == OUTCOME_OVERLOAD
+
+
+def test_initial_limit_is_applied():
+    controller, applied = make_controller()
+    assert applied == [('vot', 4)]
+    assert controller.limits() == {'vot': 4}
+
+
+def test_additive_increase_after_good_window():
+    controller, applied = make_controller()
+    for _ in range(4):
+        controller.record('vot', OUTCOME_OK, seconds=10, work=1)
+    assert controller.limits() == {'vot': 5}
+    assert applied[-1] == ('vot', 5)
+
+
+def test_multiplicative_decrease_and_grace():
+    controller, _ = make_controller(limit=8)
+    controller.record('vot', OUTCOME_OVERLOAD)
+    assert controller.limits() == {'vot': 4}
+    # Работы, начатые до уменьшения, не уменьшают лимит повторно
+    for _ in range(3):
+        controller.record('vot', OUTCOME_OVERLOAD)
+    assert controller.limits() == {'vot': 4}
+
+
+def test_latency_growth_stops_increase():
+    controller, _ = make_controller(limit=3)
+    for _ in range(3):
+        controller.record('vot', OUTCOME_OK, seconds=10)
+    assert controller.limits() == {'vot': 4}
+    for _ in range(4):
+        controller.record('vot', OUTCOME_OK, seconds=30)
+    assert controller.limits() == {'vot': 4}
+
+
+def test_limits_stay_in_bounds_and_ignore_video_errors():
+    controller, _ = make_controller(limit=1, low=1, high=2)
+    controller.record('vot', OUTCOME_OVERLOAD)
+    assert controller.limits() == {'vot': 1}
+    for _ in range(20):
+        controller.record('vot', OUTCOME_IGNORED)
+        controller.record('vot', OUTCOME_OK)
+    assert controller.limits() == {'vot': 2}
+    controller.record('unknown', OUTCOME_OVERLOAD)
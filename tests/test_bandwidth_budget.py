@@ -0,0 +1,72 @@
+import asyncio
+import threading
+
+from bandwidth_budget import BandwidthBudget
+
+
+def make_budget(limit=900, slots=3, jobs=3):
+    budget = BandwidthBudget(limit, slots)
+    budget.add_jobs(jobs)
+    return budget
+
+
+def test_no_limit():
+    budget = BandwidthBudget(None, 3)
+    assert budget.acquire('a') is None
+    assert budget.try_acquire('a') is None
+
+
+def test_single_job_gets_whole_limit():
+    budget = make_budget(jobs=1)
+    assert budget.acquire('a') == 900
+
+
+def test_parallel_jobs_split_limit():
+    budget = make_budget()
+    shares = [budget.acquire(key) for key in 'abc']
+    assert shares == [300, 300, 300]
+
+
+def test_shares_never_exceed_limit_after_resize():
+    # Одиночная загрузка взяла весь лимит, потом autoscale добавил слотов
+    budget = make_budget(slots=1, jobs=3)
+    assert budget.acquire('a') == 900
+    budget.resize(3)
+    assert budget.try_acquire('b') == 0
+    assert sum(budget.allocations.values()) == 900
+
+
+def test_share_capped_by_free_bandwidth():
+    budget = make_budget(jobs=2, slots=2)
+    budget.allocations['old'] = 850
+    assert budget.acquire('a') == 50
+    assert sum(budget.allocations.values()) == 900
+
+
+def test_acquire_waits_for_release():
+    budget = make_budget(slots=1, jobs=2)
+    budget.acquire('a')
+    shares = []
+    waiter = threading.Thread(target=lambda: shares.append(budget.acquire('b')))
+    waiter.start()
+    waiter.join(0.2)
+    assert waiter.is_alive() and not shares
+    budget.job_finished()
+    budget.release('a')
+    waiter.join(2)
+    assert shares == [900]
+
+
+def test_acquire_async_waits_for_release(monkeypatch):
+    monkeypatch.setattr('bandwidth_budget.ASYNC_POLL_INTERVAL', 0.01)
+    budget = make_budget(slots=1, jobs=2)
+    budget.acquire('a')
+
+    async def scenario():
+        task = asyncio.create_task(budget.acquire_async('b'))
+        await asyncio.sleep(0.05)
+        assert not task.done()
+        budget.release('a')
+        return await asyncio.wait_for(task, 1)
+
+    assert asyncio.run(scenario()) == 900
@@ -0,0 +1,36 @@
+import sqlite3
+
+from catalog import Catalog
+
+CHANNEL_ID = 'UC' + 'a' * 22
+
+
+def test_search_by_channel_name_and_id(tmp_path):
+    catalog = Catalog(str(tmp_path / 'videos.db'))
+    catalog.record('AAAAAAAAAAA', title='Лекция', channel='3Blue1Brown', channel_id=CHANNEL_ID)
+    catalog.record('BBBBBBBBBBB', title='Другое', channel='Other', channel_id='UC' + 'b' * 22)
+
+    assert [e['video_id'] for e in catalog.search(channel='3blue1brown')] == ['AAAAAAAAAAA']
+    assert [e['video_id'] for e in catalog.search(channel=CHANNEL_ID)] == ['AAAAAAAAAAA']
+    # Название канала участвует в полнотекстовом поиске
+    assert [e['video_id'] for e in catalog.search('3Blue1Brown')] == ['AAAAAAAAAAA']
+
+
+def test_old_catalog_moves_channel_id_to_own_column(tmp_path):
+    database = str(tmp_path / 'videos.db')
+    old = Catalog(database)
+    old.record('AAAAAAAAAAA', channel=CHANNEL_ID)
+    old.record('BBBBBBBBBBB', channel='Named')
+    # Каталог до появления колонки channel_id
+    conn = sqlite3.connect(database)
+    conn.execute("DROP INDEX catalog_channel_id")
+    conn.execute("ALTER TABLE catalog DROP COLUMN channel_id")
+    conn.commit()
+    conn.close()
+
+    catalog = Catalog(database)
+    entries = {e['video_id']: e for e in catalog.search()}
+    assert entries['AAAAAAAAAAA']['channel'] is None
+    assert entries['AAAAAAAAAAA']['channel_id'] == CHANNEL_ID
+    assert entries['BBBBBBBBBBB']['channel'] == 'Named'
+    assert entries['BBBBBBBBBBB']['channel_id'] is None
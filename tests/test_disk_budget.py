@@ -0,0 +1,101 @@
+import asyncio
+import shutil
+from collections import namedtuple
+
+import pytest
+
+import disk_budget
+from disk_budget import DiskBudget, estimate_footprint, written_bytes
+
+MB = 1024**2
+Usage = namedtuple('Usage', 'total used free')
+
+
+@pytest.fixture
+def free_space(monkeypatch):
+    """Подменяет свободное место на диске; free_space['free'] можно менять в тесте"""
+    state = {'free': 1000 * MB}
+    monkeypatch.setattr(shutil, 'disk_usage', lambda path: Usage(0, 0, state['free']))
+    return state
+
+
+def test_estimate_footprint():
+    assert estimate_footprint(filesize=100 * MB) == int(100 * MB * disk_budget.FOOTPRINT_FACTOR
+                                                        + disk_budget.FOOTPRINT_OVERHEAD)
+    assert estimate_footprint(duration=60) < estimate_footprint(duration=600)
+    assert estimate_footprint() == estimate_footprint(duration=3600)
+
+
+def test_written_bytes(tmp_path):
+    (tmp_path / 'a').write_bytes(b'x' * 10)
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / 'sub' / 'b').write_bytes(b'x' * 5)
+    assert written_bytes(str(tmp_path)) == 15
+    assert written_bytes(str(tmp_path / 'a')) == 10
+    assert written_bytes(str(tmp_path / 'missing')) == 0
+
+
+def test_try_acquire_respects_free_space(tmp_path, free_space):
+    budget = DiskBudget([str(tmp_path)], reserve_bytes=100 * MB)
+    assert budget.try_acquire('a', 600 * MB) is True
+    assert budget.try_acquire('b', 600 * MB) is None
+    budget.release('a')
+    assert budget.try_acquire('b', 600 * MB) is True
+
+
+def test_try_acquire_too_big_without_others(tmp_path, free_space):
+    budget = DiskBudget([str(tmp_path)])
+    assert budget.try_acquire('a', 2000 * MB) is False
+
+
+def test_budget_limit_and_single_oversized_job(tmp_path, free_space):
+    budget = DiskBudget([str(tmp_path)], budget_bytes=500 * MB)
+    assert budget.try_acquire('a', 300 * MB) is True
+    assert budget.try_acquire('b', 300 * MB) is None
+    budget.release('a')
+    # Задача больше бюджета идёт, но только одна
+    assert budget.try_acquire('big', 700 * MB) is True
+
+
+def test_written_part_is_not_counted_twice(tmp_path, free_space):
+    job_dir = tmp_path / 'job'
+    job_dir.mkdir()
+    budget = DiskBudget([str(tmp_path)])
+    assert budget.try_acquire('a', 600 * MB, [str(job_dir)]) is True
+    assert budget.try_acquire('b', 600 * MB) is None
+
+    # Задача записала 400MB: их уже нет в свободном месте, а остаток резерва - 200MB
+    (job_dir / 'video.mp4').write_bytes(b'')
+    with open(job_dir / 'video.mp4', 'r+b') as f:
+        f.truncate(400 * MB)
+    free_space['free'] = 600 * MB
+    assert budget.try_acquire('b', 400 * MB) is True
+
+
+def test_track_adds_path(tmp_path, free_space):
+    extra = tmp_path / 'partial'
+    extra.mkdir()
+    with open(extra / 'part', 'wb') as f:
+        f.truncate(500 * MB)
+    free_space['free'] = 500 * MB
+    budget = DiskBudget([str(tmp_path)])
+    budget.try_acquire('a', 500 * MB)
+    assert budget.try_acquire('b', 400 * MB) is None
+    budget.track('a', str(extra))
+    assert budget.try_acquire('b', 400 * MB) is True
+
+
+def test_acquire_async_wakes_on_release(tmp_path, free_space, monkeypatch):
+    monkeypatch.setattr(disk_budget, 'POLL_INTERVAL', 30)
+    budget = DiskBudget([str(tmp_path)])
+    budget.try_acquire('a', 800 * MB)
+
+    async def scenario():
+        task = asyncio.create_task(budget.acquire_async('b', 800 * MB))
+        await asyncio.sleep(0.1)
+        assert not task.done()
+        budget.release('a')
+        return await asyncio.wait_for(task, 2)
+
+    assert asyncio.run(scenario()) is True
+    assert budget.waiters == []
@@ -0,0 +1,87 @@
+import time
+
+import identities
+from identities import Identity, IdentityPool, is_bot_check
+
+BOT_ERROR = "ERROR: [youtube] abc: Sign in to confirm you're not a bot"
+
+
+def make_pool(count, budget=None):
+    return IdentityPool([Identity(f"id{n}") for n in range(count)], budget_per_hour=budget)
+
+
+def test_bot_check_patterns():
+    assert is_bot_check(BOT_ERROR)
+    assert is_bot_check("HTTP Error 429: Too Many Requests")
+    assert not is_bot_check("ERROR: Video unavailable")
+    assert not is_bot_check("")
+
+
+def test_default_budget_is_unlimited():
+    assert identities.REQUEST_BUDGET_PER_HOUR is None
+    pool = make_pool(2)
+    for _ in range(1000):
+        identity, wait = pool._pick(2)
+        assert identity is not None and wait == 0
+
+
+def test_single_identity_never_cools_down():
+    pool = make_pool(1)
+    identity = pool.acquire()
+    pool.report(identity, BOT_ERROR)
+    assert identity.cooldown_until == 0.0
+    assert identity.health == 1.0
+    assert pool._pick(1) == (identity, 0)
+
+
+def test_single_identity_ignores_budget():
+    pool = make_pool(1, budget=1)
+    for _ in range(5):
+        assert pool._pick(1)[0] is not None
+
+
+def test_flagged_identity_rests_and_other_is_used():
+    pool = make_pool(2)
+    first = pool.acquire()
+    pool.report(first, BOT_ERROR)
+    assert first.cooldown_until > time.time()
+    assert first.strikes == 1 and first.health < 1.0
+    for _ in range(3):
+        identity, _ = pool._pick(1)
+        assert identity is not first
+
+
+def test_repeated_report_during_cooldown_is_same_strike():
+    pool = make_pool(2)
+    identity = pool.acquire()
+    pool.report(identity, BOT_ERROR)
+    pool.report(identity, BOT_ERROR)
+    assert identity.strikes == 1
+
+
+def test_success_restores_health():
+    pool = make_pool(2)
+    identity = pool.identities[0]
+    identity.strikes, identity.health = 2, 0.5
+    pool.report(identity, "")
+    assert identity.strikes == 0
+    assert identity.health > 0.5
+
+
+def test_budget_makes_identity_wait():
+    pool = make_pool(2, budget=2)
+    for identity in pool.identities:
+        identity.requests = [time.time()] * 2
+    identity, wait = pool._pick(1)
+    assert identity is None
+    assert 0 < wait <= 3600
+
+
+def test_all_resting_returns_shortest_wait():
+    pool = make_pool(2)
+    now = time.time()
+    pool.identities[0].cooldown_until = now + 100
+    pool.identities[1].cooldown_until = now + 50
+    identity, wait = pool._pick(1)
+    assert identity is None
+    assert 40 < wait <= 50
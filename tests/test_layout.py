@@ -0,0 +1,53 @@
+import os
+from datetime import datetime
+
+import pytest
+
+from layout import (
+    LAYOUT_CHANNEL,
+    LAYOUT_DATE,
+    LAYOUT_FLAT,
+    LAYOUT_PREFIX,
+    UNKNOWN_CHANNEL,
+    move_with_sidecars,
+    remove_empty_dirs,
+    shard_dir,
+    shard_path,
+)
+
+
+def test_shard_path_layouts():
+    assert shard_path(LAYOUT_FLAT, 'AbCdEfGhIjK') == ''
+    assert shard_path(LAYOUT_PREFIX, 'AbCdEfGhIjK') == 'ab'
+    assert shard_path(LAYOUT_CHANNEL, 'AbCdEfGhIjK', 'Kurzgesagt – In a Nutshell') == 'Kurzgesagt – In a Nutshell'
+    assert shard_path(LAYOUT_DATE, 'AbCdEfGhIjK', processed_at='2026-03-07T10:00:00') == os.path.join('2026', '03')
+    assert shard_path(LAYOUT_DATE, 'AbCdEfGhIjK', processed_at=datetime(2025, 12, 1)) == os.path.join('2025', '12')
+
+
+def test_channel_folder_is_safe():
+    assert shard_path(LAYOUT_CHANNEL, 'x', 'AC/DC: "Live"?.') == 'ACDC Live'
+    assert shard_path(LAYOUT_CHANNEL, 'x', None) == UNKNOWN_CHANNEL
+    assert shard_path(LAYOUT_CHANNEL, 'x', '...') == UNKNOWN_CHANNEL
+    assert len(shard_path(LAYOUT_CHANNEL, 'x', 'a' * 300)) == 100
+
+
+def test_unknown_layout():
+    with pytest.raises(ValueError):
+        shard_path('random', 'x')
+
+
+def test_shard_dir_and_moves(tmp_path):
+    source = shard_dir(str(tmp_path), LAYOUT_FLAT, 'AAAAAAAAAAA')
+    video = os.path.join(source, 'Title_AAAAAAAAAAA.mp4')
+    for path in (video, os.path.join(source, 'Title_AAAAAAAAAAA.jpg')):
+        open(path, 'wb').close()
+    os.makedirs(os.path.join(source, 'Title_AAAAAAAAAAA.hls'))
+    open(os.path.join(source, 'Title_AAAAAAAAAAA.hls', 'index.m3u8'), 'wb').close()
+
+    target = shard_dir(str(tmp_path), LAYOUT_PREFIX, 'AAAAAAAAAAA')
+    assert move_with_sidecars(video, target) == os.path.join(target, 'Title_AAAAAAAAAAA.mp4')
+    assert sorted(os.listdir(target)) == ['Title_AAAAAAAAAAA.hls', 'Title_AAAAAAAAAAA.jpg', 'Title_AAAAAAAAAAA.mp4']
+
+    os.makedirs(tmp_path / 'old' / 'empty')
+    assert remove_empty_dirs(str(tmp_path)) == 2
+    assert os.path.isdir(target)
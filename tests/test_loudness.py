@@ -0,0 +1,91 @@
+import math
+import struct
+
+import pytest
+
+import loudness
+from loudness import (
+    MIX_LEVELS_AUTO,
+    MIX_LEVELS_DUCK,
+    MIX_LEVELS_FIXED,
+    PcmMeter,
+    frame_energies,
+    integrated_loudness,
+    mix_levels,
+    speech_ratio,
+)
+
+MEASUREMENT = {'original_lufs': -20.0, 'dub_lufs': -22.0, 'original_speech': 0.9, 'dub_speech': 0.5}
+
+
+def energy(lufs):
+    """Средний квадрат кадра с громкостью lufs"""
+    return 10 ** ((lufs + 0.691) / 10)
+
+
+def test_integrated_loudness_constant_signal():
+    assert integrated_loudness([energy(-23)] * 50) == pytest.approx(-23, abs=0.01)
+
+
+def test_integrated_loudness_ignores_silence_and_quiet_parts():
+    energies = [energy(-20)] * 40 + [0.0] * 40 + [energy(-60)] * 40
+    # Блоки на стыке с тишиной чуть тише - отсюда допуск
+    assert integrated_loudness(energies) == pytest.approx(-20, abs=0.5)
+
+
+def test_integrated_loudness_silence():
+    assert integrated_loudness([0.0] * 20) is None
+    assert integrated_loudness([]) is None
+
+
+def test_speech_ratio():
+    energies = [energy(-20)] * 30 + [0.0] * 10
+    assert speech_ratio(energies, integrated_loudness(energies)) == 0.75
+    assert speech_ratio(energies, None) == 0.0
+
+
+def test_frame_energies_without_numpy(monkeypatch):
+    monkeypatch.setattr(loudness, 'NUMPY_AVAILABLE', False)
+    data = struct.pack('<4h', 16384, 0, -16384, 0)
+    assert frame_energies(data, 2, 2) == [(0.25, 0.0)]
+
+
+def test_pcm_meter_accepts_any_chunks():
+    meter = PcmMeter(channels=2, sample_rate=100)  # Кадр - 10 отсчётов
+    samples = [int(8000 * math.sin(i / 3)) for i in range(200)]
+    data = b''.join(struct.pack('<hh', sample, 0) for sample in samples)
+    for start in range(0, len(data), 7):
+        meter.feed(data[start:start + 7])
+    assert len(meter.energies) == 20
+    (original, _), (dub, dub_speech) = meter.measure()
+    assert original is not None
+    assert dub is None and dub_speech == 0.0
+
+
+def test_mix_levels_fixed_or_unmeasured():
+    assert mix_levels(MEASUREMENT, MIX_LEVELS_FIXED, 0.05, 0.58) == (0.05, 0.58, False)
+    assert mix_levels(None, MIX_LEVELS_AUTO, 0.05, 0.58) == (0.05, 0.58, False)
+    assert mix_levels(dict(MEASUREMENT, dub_lufs=None), MIX_LEVELS_AUTO, 0.05, 0.58) == (0.05, 0.58, False)
+
+
+def test_mix_levels_auto():
+    video, translation, duck = mix_levels(MEASUREMENT, MIX_LEVELS_AUTO, 0.05, 0.58)
+    assert not duck
+    # Перевод поднимается до цели, оригинал уходит ниже перевода на ORIGINAL_BELOW_DUB_DB
+    assert translation == pytest.approx(2 * 10 ** ((loudness.TARGET_DUB_LUFS + 22) / 20), rel=1e-3)
+    target_original = loudness.TARGET_DUB_LUFS - loudness.ORIGINAL_BELOW_DUB_DB
+    assert video == pytest.approx(2 * 10 ** ((target_original + 20) / 20), rel=1e-3)
+
+
+def test_mix_levels_duck():
+    video, _, duck = mix_levels(MEASUREMENT, MIX_LEVELS_DUCK, 0.05, 0.58)
+    assert duck
+    assert video > mix_levels(MEASUREMENT, MIX_LEVELS_AUTO, 0.05, 0.58)[0]
+    # Перевод звучит почти всё время - приглушать нечего
+    assert not mix_levels(dict(MEASUREMENT, dub_speech=0.95), MIX_LEVELS_DUCK, 0.05, 0.58)[2]
+
+
+def test_mix_levels_gain_is_clamped():
+    low, high = loudness.GAIN_RANGE
+    video, translation, _ = mix_levels(dict(MEASUREMENT, original_lufs=20.0, dub_lufs=-90.0), MIX_LEVELS_AUTO, 0.05, 0.58)
+    assert video == low and translation == high
@@ -0,0 +1,113 @@
+import asyncio
+
+from orchestrator import CallBatcher, PrioritySemaphore, StageLimits
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_batcher_flushes_when_full():
+    calls = []
+
+    async def run_batch(items):
+        calls.append(list(items))
+        return [item * 10 for item in items]
+
+    async def scenario():
+        batcher = CallBatcher(run_batch, max_size=3, window=60)
+        return await asyncio.gather(*(batcher.submit(n) for n in range(3)))
+
+    assert run(scenario()) == [0, 10, 20]
+    assert calls == [[0, 1, 2]]
+
+
+def test_batcher_flushes_after_window():
+    calls = []
+
+    async def run_batch(items):
+        calls.append(list(items))
+        return [str(item) for item in items]
+
+    async def scenario():
+        batcher = CallBatcher(run_batch, max_size=10, window=0.05)
+        first = asyncio.ensure_future(batcher.submit('a'))
+        second = asyncio.ensure_future(batcher.submit('b'))
+        return await asyncio.wait_for(asyncio.gather(first, second), 1)
+
+    assert run(scenario()) == ['a', 'b']
+    assert calls == [['a', 'b']]
+
+
+def test_batcher_error_goes_to_every_request():
+    async def run_batch(items):
+        raise RuntimeError("yt-dlp упал")
+
+    async def scenario():
+        batcher = CallBatcher(run_batch, max_size=2, window=60)
+        return await asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True)
+
+    results = run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_batcher_skips_cancelled_requests():
+    calls = []
+
+    async def run_batch(items):
+        calls.append(list(items))
+        return list(items)
+
+    async def scenario():
+        batcher = CallBatcher(run_batch, max_size=10, window=0.05)
+        cancelled = asyncio.ensure_future(batcher.submit('gone'))
+        kept = asyncio.ensure_future(batcher.submit('kept'))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        return await asyncio.wait_for(kept, 1)
+
+    assert run(scenario()) == 'kept'
+    assert calls == [['kept']]
+
+
+def test_priority_semaphore_wakes_lowest_priority_first():
+    order = []
+
+    async def worker(semaphore, priority, name):
+        async with semaphore.slot(priority):
+            order.append(name)
+            await asyncio.sleep(0)
+
+    async def scenario():
+        semaphore = PrioritySemaphore(1)
+        await semaphore.acquire()
+        tasks = [asyncio.ensure_future(worker(semaphore, priority, name))
+                 for priority, name in (((2,), 'late'), ((0,), 'urgent'), ((1,), 'normal'))]
+        await asyncio.sleep(0)
+        semaphore.release()
+        await asyncio.gather(*tasks)
+
+    run(scenario())
+    assert order == ['urgent', 'normal', 'late']
+
+
+def test_stage_limits_resize():
+    async def scenario():
+        limits = StageLimits({'download': 1})
+        await limits.semaphores['download'].acquire()
+        waiter = asyncio.ensure_future(limits.semaphores['download'].acquire())
+        await asyncio.sleep(0)
+        assert not waiter.done()
+        limits.resize('download', 2)
+        await asyncio.wait_for(waiter, 1)
+
+    run(scenario())
+
+
+def test_unknown_stage_is_unlimited():
+    async def scenario():
+        limits = StageLimits({})
+        for _ in range(5):
+            await asyncio.wait_for(limits('unknown').__aenter__(), 1)
+
+    run(scenario())
@@ -0,0 +1,50 @@
+import partials
+
+
+def test_resumable_files():
+    assert partials.is_partial_file('video.mp4.part')
+    assert partials.is_partial_file('video.f137.mp4.part-Frag12')
+    assert partials.is_partial_file('video.mp4.ytdl')
+    assert partials.is_format_part('video.f137.mp4')
+    assert partials.is_format_part('video.f251-drc.webm')
+    assert not partials.is_format_part('video.f137.mp4.part')
+    assert not partials.is_format_part('video.mp4')
+    assert not partials.is_resumable_file('video.jpg')
+
+
+def test_keep_saves_finished_format_parts(tmp_path):
+    path = partials.work_dir(str(tmp_path), 'abc', '137+140')
+    with open(f"{path}/video.f137.mp4", 'wb') as f:
+        f.write(b'x' * 100)
+    with open(f"{path}/video.f140.m4a.part", 'wb') as f:
+        f.write(b'x' * 10)
+    with open(f"{path}/video.jpg", 'wb') as f:
+        f.write(b'x' * 5)
+
+    assert partials.keep(path) == 110
+    assert (tmp_path / 'abc_video_137+140' / 'video.f137.mp4').exists()
+
+
+def test_keep_removes_folder_without_downloads(tmp_path):
+    path = partials.work_dir(str(tmp_path), 'abc')
+    with open(f"{path}/video.jpg", 'wb') as f:
+        f.write(b'x' * 5)
+
+    assert partials.keep(path) == 0
+    assert not (tmp_path / 'abc_video_best').exists()
+
+
+def test_adopt_moves_finished_files(tmp_path):
+    path = partials.work_dir(str(tmp_path), 'abc')
+    target = tmp_path / 'job'
+    target.mkdir()
+    with open(f"{path}/video.mp4", 'wb') as f:
+        f.write(b'x')
+    with open(f"{path}/video.mp4.ytdl", 'wb') as f:
+        f.write(b'x')
+
+    moved = partials.adopt(path, str(target))
+
+    assert moved == [str(target / 'video.mp4')]
+    assert not (target / 'video.mp4.ytdl').exists()
+    assert not (tmp_path / 'abc_video_best').exists()
@@ -0,0 +1,84 @@
+import pytest
+
+from disk_budget import estimate_footprint
+from planner import StageHistory, estimate_plan, format_duration, format_size, job_work
+
+MB = 1024**2
+STAGES = ['info', 'vot', 'download', 'mix']
+RATES = {'info': (1.0, 0), 'vot': (10.0, 0), 'download': (1.0, 0), 'mix': (30.0, 0)}
+
+
+def test_job_work():
+    work = job_work({'duration': 600, 'filesize': 100 * MB}, STAGES, 5000)
+    assert work == {'info': 1, 'vot': 10, 'download': 100, 'mix': 1}
+    # Без размера - по длительности и битрейту; с русской дорожкой VOT не нужен
+    work = job_work({'duration': 60}, STAGES + ['analyze'], 8000, with_vot=False)
+    assert work['download'] == pytest.approx(60 * 1000 * 1000 / MB)
+    assert work['vot'] == 0 and work['analyze'] == 0
+
+
+def test_estimate_plan_bottleneck_and_totals():
+    jobs = [({'duration': 600, 'filesize': 100 * MB}, job_work({'duration': 600, 'filesize': 100 * MB}, STAGES, 5000))
+            for _ in range(4)]
+    limits = {'info': 8, 'vot': 2, 'download': 2, 'mix': 1}
+    plan = estimate_plan(jobs, limits, RATES, 5000)
+
+    assert plan['download_bytes'] == 400 * MB
+    assert plan['unknown_size'] == 0
+    assert plan['stage_seconds']['vot'] == 4 * 100 / 2
+    assert plan['stage_seconds']['mix'] == 4 * 30
+    assert plan['bottleneck'] == 'vot'
+    assert plan['longest_job'] == 1 + 100 + 100 + 30
+    assert plan['wall_seconds'] == 231
+    assert plan['peak_disk_bytes'] == 2 * estimate_footprint(100 * MB, 600, 5000)
+
+
+def test_estimate_plan_bandwidth_and_disk_budget():
+    info = {'filesize': 1000 * MB}
+    jobs = [(info, job_work(info, STAGES, 5000)) for _ in range(3)]
+    plan = estimate_plan(jobs, {'download': 3}, RATES, 5000, bandwidth_limit_mbit=8,
+                         disk_budget_bytes=500 * MB)
+    # 3000MB по 1 МБ/с (8 Мбит/с) дольше, чем по истории стадии
+    assert plan['stage_seconds']['download'] == pytest.approx(3000 * MB * 8 / (8 * 10**6))
+    # Бюджет меньше одного видео - пик не меньше самого крупного
+    assert plan['peak_disk_bytes'] == estimate_footprint(1000 * MB)
+
+
+def test_estimate_plan_unknown_size():
+    plan = estimate_plan([({}, job_work({}, STAGES, 5000))], {'download': 1}, RATES, 5000)
+    assert plan['unknown_size'] == 1
+    assert plan['download_bytes'] == 0 and plan['peak_disk_bytes'] == 0
+
+
+def test_stage_history_rates(tmp_path):
+    history = StageHistory(str(tmp_path / 'history.db'))
+    assert history.rates()['vot'][1] == 0
+    for seconds in (10, 20, 600):
+        history.record('vot', seconds, work=10)
+    history.record('vot', 5)  # Без объёма работы - не пишется
+    history.record('mix', 40)
+    rates = history.rates()
+    assert rates['vot'] == (2.0, 3)
+    assert rates['mix'] == (40, 1)
+
+
+def test_formatting():
+    assert format_duration(40) == "40 с"
+    assert format_duration(7 * 60 + 5) == "7 мин"
+    assert format_duration(2 * 3600 + 15 * 60) == "2 ч 15 мин"
+    assert format_size(0)
+
+
+def test_plan_batch_counts_only_processed_videos(monkeypatch):
+    import run2
+
+    printed = []
+    monkeypatch.setattr(run2, 'init_database', lambda: None)
+    monkeypatch.setattr(run2, 'load_processed_ids', lambda: {'AAAAAAAAAAA'})
+    monkeypatch.setattr(run2, 'safe_print', printed.append)
+
+    run2.plan_batch(['https://www.youtube.com/watch?v=AAAAAAAAAAA',
+                     'https://www.youtube.com/shorts/AAAAAAAAAAA',
+                     'not a url'])
+
+    assert "0 новых видео (уже обработано: 2)" in printed[1]
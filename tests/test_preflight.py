@@ -0,0 +1,73 @@
+import preflight
+from preflight import (
+    VERDICT_LONG,
+    VERDICT_NATIVE,
+    VERDICT_OK,
+    VERDICT_RETRY,
+    VERDICT_SKIP,
+    check_eligibility,
+    classify_error,
+)
+
+
+def make_info(**fields):
+    info = {'title': 'Title', 'duration': 600, 'language': 'en', 'audio_languages': ['en'],
+            'live_status': 'not_live', 'availability': 'public', 'age_limit': 0, 'error': None}
+    info.update(fields)
+    return info
+
+
+def test_classify_error():
+    assert classify_error("ERROR: [youtube] abc: Video unavailable") == "Видео недоступно"
+    assert classify_error("Join this channel to get access") == "Только для спонсоров канала"
+    assert classify_error("HTTP Error 429: Too Many Requests") == "YouTube ограничил частоту запросов"
+    assert classify_error("something new") == "something new"
+
+
+def test_ordinary_video():
+    assert check_eligibility(make_info()) == (VERDICT_OK, None)
+
+
+def test_no_data_is_not_skipped():
+    assert check_eligibility({})[0] == VERDICT_OK
+
+
+def test_bot_check_and_rate_limit_are_retried():
+    for error in ("Sign in to confirm you're not a bot. Use --cookies-from-browser",
+                  "HTTP Error 429: Too Many Requests"):
+        verdict, reason = check_eligibility({'error': error})
+        assert verdict == VERDICT_RETRY
+        assert reason
+
+
+def test_video_errors_are_skipped():
+    assert check_eligibility({'error': "Private video"}) == (VERDICT_SKIP, "Приватное видео")
+    assert check_eligibility({'error': "This video has been removed by the uploader"}) == (VERDICT_SKIP, "Видео удалено")
+
+
+def test_unknown_errors_are_retried():
+    for error in ("Unable to download webpage: <urlopen error [Errno -3] Temporary failure in name resolution>",
+                  "Read timed out.",
+                  "HTTP Error 503: Service Unavailable",
+                  "Unable to extract removed_formats"):
+        verdict, reason = check_eligibility({'error': error})
+        assert verdict == VERDICT_RETRY
+        assert reason == error
+
+
+def test_not_ready_and_closed_videos():
+    assert check_eligibility(make_info(live_status='is_live'))[0] == VERDICT_SKIP
+    assert check_eligibility(make_info(availability='subscriber_only'))[0] == VERDICT_SKIP
+    assert check_eligibility(make_info(age_limit=18))[0] == VERDICT_SKIP
+
+
+def test_russian_audio():
+    assert check_eligibility(make_info(audio_languages=['en', 'ru-RU']))[0] == VERDICT_NATIVE
+    assert check_eligibility(make_info(language='ru'))[0] == VERDICT_NATIVE
+
+
+def test_long_videos_are_opt_in():
+    assert preflight.LONG_VIDEO_DURATION is None
+    assert check_eligibility(make_info(duration=3 * 3600))[0] == VERDICT_OK
+    assert check_eligibility(make_info(duration=3 * 3600), long_duration=3600)[0] == VERDICT_LONG
+    assert check_eligibility(make_info(duration=5 * 3600))[0] == VERDICT_SKIP
@@ -0,0 +1,61 @@
+import asyncio
+import sys
+
+import pytest
+
+import runner
+from runner import LineSplitter, OutputTail, ProcessTimeout, run_command, run_command_async
+
+PRINT_LINES = "import sys; print('one'); print('ERROR: two', file=sys.stderr); sys.exit(3)"
+
+
+def test_line_splitter_handles_cr_and_partial_chunks():
+    splitter = LineSplitter('utf-8')
+    assert splitter.feed(b'[download]  10%\r[download]  20%\rpar') == ['[download]  10%', '[download]  20%']
+    assert splitter.feed(b'tial\n\n') == ['partial']
+    assert splitter.feed(b'tail') == []
+    assert splitter.flush() == ['tail']
+    assert splitter.flush() == []
+
+
+def test_line_splitter_multibyte_split_between_chunks():
+    splitter = LineSplitter('utf-8')
+    data = 'Привет\n'.encode('utf-8')
+    assert splitter.feed(data[:3]) == []
+    assert splitter.feed(data[3:]) == ['Привет']
+
+
+def test_line_splitter_limits_line_length():
+    splitter = LineSplitter('utf-8')
+    splitter.feed(b'x' * (runner.MAX_LINE_CHARS * 5))
+    assert len(splitter.buffer) <= runner.MAX_LINE_CHARS * 4
+    assert len(splitter.flush()[0]) <= runner.MAX_LINE_CHARS
+
+
+def test_output_tail_keeps_errors():
+    tail = OutputTail(max_lines=2, max_errors=1)
+    for line in ('ERROR: first', 'ok', 'ERROR: second', 'last'):
+        tail.add(line)
+    assert list(tail.lines) == ['ERROR: second', 'last']
+    assert tail.error_summary() == 'ERROR: second'
+    assert OutputTail().error_summary() == ''
+
+
+def test_run_command_collects_output():
+    lines = []
+    result = run_command([sys.executable, '-c', PRINT_LINES], on_line=lines.append)
+    assert result.returncode == 3
+    assert result.stdout.text() == 'one'
+    assert result.error_summary() == 'ERROR: two'
+    assert sorted(lines) == ['ERROR: two', 'one']
+
+
+def test_run_command_timeout():
+    with pytest.raises(ProcessTimeout):
+        run_command([sys.executable, '-c', 'import time; time.sleep(30)'], timeout=0.5)
+
+
+def test_run_command_async():
+    result = asyncio.run(run_command_async([sys.executable, '-c', PRINT_LINES]))
+    assert result.returncode == 3
+    assert result.stdout.text() == 'one'
@@ -0,0 +1,54 @@
+from types import SimpleNamespace
+
+import pytest
+
+import run2
+from api import JOB_CANCELLED, Job, Pipeline
+from service import JobHandler
+
+
+class FakeHandler:
+    def __init__(self, token, authorization=None):
+        self.server = SimpleNamespace(token=token)
+        self.headers = {} if authorization is None else {'Authorization': authorization}
+        self.errors = []
+
+    def _error(self, status, message):
+        self.errors.append(status)
+
+
+def test_authorization():
+    assert JobHandler._authorized(FakeHandler(None))
+    assert JobHandler._authorized(FakeHandler('secret', 'Bearer secret'))
+    for header in (None, 'Bearer wrong', 'secret', 'Bearer секрет'):
+        handler = FakeHandler('secret', header)
+        assert not JobHandler._authorized(handler)
+        assert handler.errors == [401]
+
+
+def test_cancel_before_start_is_not_lost():
+    pipeline = Pipeline()
+    job = Job('job1', 'https://www.youtube.com/watch?v=AAAAAAAAAAA', 'AAAAAAAAAAA', pipeline)
+    pipeline.active[job.video_id] = job
+
+    # Отмена пришла раньше, чем цикл конвейера дошёл до _start_job
+    job.cancel()
+    pipeline._start_job(job)
+
+    assert job.task is None
+    assert job.status == JOB_CANCELLED
+    assert job.wait(0) == (False, 'AAAAAAAAAAA', "Отменено")
+    assert job.video_id not in pipeline.active
+
+
+def test_startup_error_is_raised(monkeypatch):
+    def broken_resources(*args, **kwargs):
+        raise OSError("нет доступа к output")
+
+    monkeypatch.setattr(run2, 'prepare_batch', lambda *args: True)
+    monkeypatch.setattr(run2, 'BatchResources', broken_resources)
+    pipeline = Pipeline()
+
+    with pytest.raises(RuntimeError, match="нет доступа к output"):
+        pipeline.start()
+    assert pipeline.thread is None
@@ -0,0 +1,46 @@
+from stream_packaging import (
+    HLS_PLAYLIST,
+    PACKAGING_FASTSTART,
+    PACKAGING_HLS_ONLY,
+    PACKAGING_PLAIN,
+    build_hls_command,
+    hls_dir,
+    output_size,
+    with_faststart,
+)
+
+MIX = ['ffmpeg', '-i', 'video.mp4', '-i', 'dub.mp3', '-c:v', 'copy', '-y', 'out.mp4']
+
+
+def test_faststart_goes_before_output():
+    cmd = with_faststart(MIX, 'out.mp4', PACKAGING_FASTSTART)
+    assert cmd == MIX[:-1] + ['-movflags', '+faststart', 'out.mp4']
+    # Исходная команда не меняется
+    assert '-movflags' not in MIX
+
+
+def test_faststart_only_for_output_file():
+    cmd = ['ffmpeg', '-i', 'out.mp4', '-y', 'out.mp4']
+    result = with_faststart(cmd, 'out.mp4', PACKAGING_HLS_ONLY)
+    assert result == ['ffmpeg', '-i', 'out.mp4', '-y', '-movflags', '+faststart', 'out.mp4']
+
+
+def test_faststart_skipped():
+    assert with_faststart(MIX, 'out.mp4', PACKAGING_PLAIN) == MIX
+    assert with_faststart(MIX, 'missing.mp4', PACKAGING_FASTSTART) == MIX
+    cmd = ['ffmpeg', '-i', 'a.mp3', '-y', 'out.mp3']
+    assert with_faststart(cmd, 'out.mp3', PACKAGING_FASTSTART) == cmd
+
+
+def test_hls_paths(tmp_path):
+    assert hls_dir('output/videos/Title_abc.mp4') == 'output/videos/Title_abc.hls'
+    cmd = build_hls_command('in.mp4', str(tmp_path))
+    assert cmd[-1] == str(tmp_path / HLS_PLAYLIST)
+    assert '-c' in cmd and cmd[cmd.index('-c') + 1] == 'copy'
+
+
+def test_output_size(tmp_path):
+    (tmp_path / 'a.m4s').write_bytes(b'x' * 7)
+    (tmp_path / HLS_PLAYLIST).write_bytes(b'x' * 3)
+    assert output_size(str(tmp_path)) == 10
+    assert output_size(str(tmp_path / 'a.m4s')) == 7
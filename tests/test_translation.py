@@ -0,0 +1,62 @@
+import translation
+from translation import DictionaryBackend, LocalModelBackend, Translator, is_russian
+
+
+class FakeBackend:
+    name = "fake"
+    expected_latency = 0.1
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.calls = []
+
+    def available(self):
+        return True
+
+    def translate_batch(self, texts):
+        self.calls.append(list(texts))
+        if self.fail:
+            raise RuntimeError("нет сети")
+        return [f"перевод {text}" for text in texts]
+
+
+def test_is_russian():
+    assert is_russian("Привет, мир")
+    assert not is_russian("Hello world")
+
+
+def test_local_model_available_without_import(monkeypatch):
+    monkeypatch.setattr(translation, 'LOCAL_MODEL_AVAILABLE', True)
+    backend = LocalModelBackend()
+    assert backend.available()
+    backend.installed = False
+    assert not backend.available()
+
+
+def test_translate_batch_uses_dictionary_first(tmp_path):
+    dictionary = DictionaryBackend(str(tmp_path / 'translations.json'))
+    dictionary.learn({"Known": "Известное"})
+    backend = FakeBackend()
+    translator = Translator([backend], dictionary)
+
+    result = translator.translate_batch(["Known", "New", "Уже русское", ""])
+    assert result == ["Известное", "перевод New", "Уже русское", ""]
+    assert backend.calls == [["New"]]
+    # Новый перевод запомнен
+    assert DictionaryBackend(dictionary.path).table["New"] == "перевод New"
+
+
+def test_failed_backend_is_skipped():
+    broken, working = FakeBackend(fail=True), FakeBackend()
+    working.name, working.expected_latency = "working", 0.5
+    translator = Translator([broken, working])
+    assert translator.translate("Title") == "перевод Title"
+    translator.translate("Other")
+    assert len(broken.calls) == 1
+
+
+def test_get_translator_is_lazy_and_shared(monkeypatch):
+    monkeypatch.setattr(translation, 'translator', None)
+    monkeypatch.setattr(translation, 'create_translator', lambda: object())
+    first = translation.get_translator()
+    assert translation.get_translator() is first
@@ -0,0 +1,42 @@
+import os
+
+from verify import hls_stat, scan_output
+
+
+def write(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+
+
+def test_scan_output_prefers_mp4_and_skips_temp(tmp_path):
+    videos = tmp_path / 'videos'
+    write(videos / 'Title_AAAAAAAAAAA.mp4', b'v')
+    write(videos / 'Title_AAAAAAAAAAA.hls' / 'index.m3u8', b'p')
+    write(videos / 'Other_BBBBBBBBBBB.hls' / 'index.m3u8', b'p')
+    write(videos / 'Chan' / 'Deep_CCCCCCCCCCC.m4a', b'a')
+    write(videos / 'temp_DDDDDDDDDDD_1234' / 'Temp_DDDDDDDDDDD.mp4', b'v')
+    write(videos / 'Remix_EEEEEEEEEEE.remix.mp4', b'v')
+
+    files = scan_output(str(tmp_path))
+    assert sorted(files) == ['AAAAAAAAAAA', 'BBBBBBBBBBB', 'CCCCCCCCCCC']
+    assert [os.path.basename(path) for path, _ in files['AAAAAAAAAAA']] == ['Title_AAAAAAAAAAA.mp4']
+    assert files['BBBBBBBBBBB'][0][0].endswith('.hls')
+
+
+def test_hls_stat_follows_segments(tmp_path):
+    packaged = tmp_path / 'Title_AAAAAAAAAAA.hls'
+    write(packaged / 'index.m3u8', b'playlist')
+    write(packaged / '00000.m4s', b'x' * 10)
+    first = hls_stat(str(packaged))
+    assert first.st_size == 18
+
+    # Сегмент переписан на месте: stat папки прежний, ключ кэша - нет
+    segment = packaged / '00000.m4s'
+    segment.write_bytes(b'y' * 10)
+    os.utime(segment, ns=(first.st_mtime_ns + 10**9, first.st_mtime_ns + 10**9))
+    second = hls_stat(str(packaged))
+    assert second.st_size == first.st_size
+    assert second.st_mtime_ns > first.st_mtime_ns
+
+    segment.write_bytes(b'y' * 4)
+    assert hls_stat(str(packaged)).st_size == 12
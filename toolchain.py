@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Внешние программы (yt-dlp, ffmpeg, node, vot-cli-live): поиск, версии и возможности
+Проверка идёт один раз: пути, версии и списки кодеков/фильтров ffmpeg хранятся в базе
+и перепроверяются, только когда сам исполняемый файл заменили (обновили) -
+запуск не тратит секунды на `ffmpeg -encoders` и `npx` каждый раз
+"""
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import runner
+
+# Программы и аргументы, которые печатают версию
+TOOLS = {
+    'yt-dlp': ['--version'],
+    'ffmpeg': ['-hide_banner', '-version'],
+    'node': ['--version'],
+}
+
+# Без этих программ обработка невозможна
+REQUIRED_TOOLS = ('yt-dlp', 'ffmpeg', 'node')
+
+# Минимальные версии (кортежи чисел); yt-dlp проверяется по возрасту
+MIN_VERSIONS = {
+    'ffmpeg': (4, 4),
+    'node': (18,),
+}
+
+# Старше скольких дней yt-dlp обычно уже не справляется с изменениями YouTube
+YTDLP_MAX_AGE_DAYS = 90
+
+# Пакет озвучки: локальная установка (npm install) запускается напрямую, без npx
+VOT_PACKAGE = "vot-cli-live"
+NODE_MODULES_BIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "node_modules", ".bin")
+
+# Таймаут одной проверки версии (сек)
+PROBE_TIMEOUT = 20
+
+toolchain_lock = threading.Lock()
+_vot_command = None
+
+
+def vot_command():
+    """
+    Команда запуска vot-cli-live (список аргументов)
+    npx на каждый вызов заново разбирает npm-окружение (~0.5-1 с), поэтому
+    установленный рядом пакет запускается напрямую
+    """
+    global _vot_command
+    if _vot_command is None:
+        local = shutil.which(VOT_PACKAGE, path=NODE_MODULES_BIN) if os.path.isdir(NODE_MODULES_BIN) else None
+        _vot_command = [local] if local else ['npx', VOT_PACKAGE]
+    return list(_vot_command)
+
+
+def parse_version(name, output):
+    """Номер версии из вывода программы: кортеж чисел или None"""
+    pattern = {
+        'yt-dlp': r'(\d{4})\.(\d+)\.(\d+)',
+        'ffmpeg': r'version n?(\d+)\.(\d+)',
+        'node': r'v(\d+)\.(\d+)\.(\d+)',
+    }.get(name)
+    match = re.search(pattern, output) if pattern else None
+    return tuple(int(part) for part in match.groups()) if match else None
+
+
+def parse_ffmpeg_list(output):
+    """Имена из `ffmpeg -encoders` / `ffmpeg -filters` (второй столбец после флагов)"""
+    names = []
+    for line in output.splitlines():
+        parts = line.split()
+        # Строки списка: " A....D aac   AAC (Advanced Audio Coding)", " ... amix  N->A  ..."
+        if len(parts) >= 2 and re.fullmatch(r'[A-Z.|]{3,6}', parts[0]) and parts[1] != '=':
+            names.append(parts[1])
+    return names
+
+
+def file_signature(path):
+    """Размер и время изменения файла: изменились - программу обновили"""
+    stat = os.stat(path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def probe_tool(name, path):
+    """
+    Узнать версию и возможности программы (медленно - запускает её)
+    Возвращает: (строка версии, {'encoders': [...], 'filters': [...]})
+    """
+    result = runner.run_command([path] + TOOLS[name], timeout=PROBE_TIMEOUT)
+    output = result.stdout.text() or result.stderr.text()
+    version = output.strip().splitlines()[0] if output.strip() else ""
+
+    capabilities = {}
+    if name == 'ffmpeg':
+        for kind in ('encoders', 'filters'):
+            listing = runner.run_command([path, '-hide_banner', f'-{kind}'], timeout=PROBE_TIMEOUT)
+            capabilities[kind] = parse_ffmpeg_list(listing.stdout.text())
+    return version, capabilities
+
+
+class Tool:
+    """Найденная программа"""
+
+    def __init__(self, name, path, version="", capabilities=None):
+        self.name = name
+        self.path = path
+        self.version = version
+        self.capabilities = capabilities or {}
+
+    def version_tuple(self):
+        return parse_version(self.name, self.version)
+
+
+class Toolchain:
+    """
+    Найденные программы с кэшем проверок в базе (потокобезопасно)
+    Использование: tools = Toolchain(DATABASE).load(); tools.missing(), tools.has_encoder('libopus')
+    """
+
+    def __init__(self, database):
+        self.database = database
+        self.tools = {}
+        self.probed = []  # Какие программы пришлось проверять заново
+
+    def _connect(self):
+        conn = sqlite3.connect(self.database)
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS toolchain (
+                name TEXT PRIMARY KEY,
+                path TEXT NOT NULL,
+                signature TEXT NOT NULL,
+                version TEXT,
+                encoders TEXT,
+                filters TEXT,
+                checked_at REAL NOT NULL
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS startup_probes (
+                name TEXT PRIMARY KEY,
+                failed_at REAL NOT NULL
+            )
+        ''')
+        return conn
+
+    def load(self):
+        """
+        Найти программы; проверить только новые и изменившиеся (параллельно)
+        Найденные пути запоминаются в runner - дальше PATH не перебирается
+        """
+        with toolchain_lock:
+            conn = self._connect()
+            cached = {row[0]: row[1:] for row in conn.execute(
+                'SELECT name, path, signature, version, encoders, filters FROM toolchain')}
+            conn.close()
+
+        stale = {}
+        for name in TOOLS:
+            path = shutil.which(name)
+            if path is None:
+                continue
+            runner.register_executable(name, path)
+            entry = cached.get(name)
+            signature = file_signature(path)
+            if entry and entry[0] == path and entry[1] == signature:
+                encoders, filters = entry[3], entry[4]
+                capabilities = {'encoders': encoders.split(), 'filters': filters.split()} if encoders is not None else {}
+                self.tools[name] = Tool(name, path, entry[2] or "", capabilities)
+            else:
+                stale[name] = (path, signature)
+
+        if stale:
+            with ThreadPoolExecutor(max_workers=len(stale)) as pool:
+                probes = {name: pool.submit(probe_tool, name, path) for name, (path, _) in stale.items()}
+            with toolchain_lock:
+                conn = self._connect()
+                for name, (path, signature) in stale.items():
+                    try:
+                        version, capabilities = probes[name].result()
+                    except (OSError, runner.ProcessTimeout):
+                        # Не запустилась - считаем, что её нет, и проверим в следующий раз
+                        continue
+                    self.tools[name] = Tool(name, path, version, capabilities)
+                    self.probed.append(name)
+                    conn.execute('''
+                        INSERT OR REPLACE INTO toolchain (name, path, signature, version, encoders, filters, checked_at)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ''', (name, path, signature, version,
+                          ' '.join(capabilities['encoders']) if 'encoders' in capabilities else None,
+                          ' '.join(capabilities['filters']) if 'filters' in capabilities else None,
+                          time.time()))
+                conn.commit()
+                conn.close()
+        return self
+
+    def missing(self):
+        """Обязательные программы, которых нет"""
+        return [name for name in REQUIRED_TOOLS if name not in self.tools]
+
+    def has_encoder(self, encoder):
+        ffmpeg = self.tools.get('ffmpeg')
+        return ffmpeg is not None and encoder in ffmpeg.capabilities.get('encoders', ())
+
+    def has_filter(self, name):
+        ffmpeg = self.tools.get('ffmpeg')
+        return ffmpeg is not None and name in ffmpeg.capabilities.get('filters', ())
+
+    def warnings(self, encoders=(), filters=()):
+        """
+        Что не так с найденными программами: список строк для лога
+        encoders, filters - что нужно от ffmpeg при текущих настройках
+        """
+        problems = []
+        for name in self.missing():
+            problems.append(f"Не найден {name} - установите его и добавьте в PATH")
+        if 'node' in self.tools and vot_command()[0] == 'npx' and shutil.which('npx') is None:
+            problems.append(f"Не найден npx - выполните npm install (пакет {VOT_PACKAGE})")
+
+        for name, minimum in MIN_VERSIONS.items():
+            tool = self.tools.get(name)
+            version = tool.version_tuple() if tool else None
+            if version and version < minimum:
+                problems.append(f"{name} {'.'.join(map(str, version))} устарел, нужен {'.'.join(map(str, minimum))} или новее")
+
+        ytdlp = self.tools.get('yt-dlp')
+        version = ytdlp.version_tuple() if ytdlp else None
+        if version:
+            try:
+                age = (date.today() - date(*version)).days
+            except ValueError:
+                age = 0
+            if age > YTDLP_MAX_AGE_DAYS:
+                problems.append(f"yt-dlp {ytdlp.version} старше {YTDLP_MAX_AGE_DAYS} дней - обновите: yt-dlp -U")
+
+        # Пустой список - вывод не разобрался (необычная сборка), тогда не придираемся
+        capabilities = self.tools['ffmpeg'].capabilities if 'ffmpeg' in self.tools else {}
+        if capabilities.get('encoders'):
+            problems += [f"ffmpeg собран без кодека {encoder}" for encoder in encoders if not self.has_encoder(encoder)]
+        if capabilities.get('filters'):
+            problems += [f"ffmpeg собран без фильтра {name}" for name in filters if not self.has_filter(name)]
+        return problems
+
+    def probe_failed_recently(self, name, hours):
+        """Медленная проверка при запуске (например, cookies из браузера) недавно не удалась"""
+        with toolchain_lock:
+            conn = self._connect()
+            row = conn.execute('SELECT failed_at FROM startup_probes WHERE name = ?', (name,)).fetchone()
+            conn.close()
+        return row is not None and row[0] > time.time() - hours * 3600
+
+    def record_probe(self, name, ok):
+        """Итог медленной проверки: неудача запоминается, успех её стирает"""
+        with toolchain_lock:
+            conn = self._connect()
+            if ok:
+                conn.execute('DELETE FROM startup_probes WHERE name = ?', (name,))
+            else:
+                conn.execute('INSERT OR REPLACE INTO startup_probes (name, failed_at) VALUES (?, ?)', (name, time.time()))
+            conn.commit()
+            conn.close()
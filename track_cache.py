@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Кэш звуковых дорожек: озвучки VOT и оригинального звука видео
+Файлы хранятся по sha256 содержимого, индекс (video_id, голос, тип) - в базе
+"""
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+
+# Типы дорожек в кэше
+KIND_DUB = "dub"  # Озвучка VOT (mp3)
+KIND_ORIGINAL = "original"  # Оригинальный звук видео
+
+cache_lock = threading.Lock()
+
+
+def file_sha256(path):
+    """Посчитать sha256 файла"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class TrackCache:
+    """
+    Кэш дорожек с адресацией по содержимому
+    Одинаковые файлы хранятся один раз, запись в кэш атомарна
+    """
+
+    def __init__(self, cache_dir, database):
+        self.cache_dir = cache_dir
+        self.database = database
+        os.makedirs(os.path.join(cache_dir, "objects"), exist_ok=True)
+        self._init_table()
+
+    def _init_table(self):
+        """Создать таблицу индекса кэша"""
+        with cache_lock:
+            conn = sqlite3.connect(self.database)
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS cached_tracks (
+                    video_id TEXT NOT NULL,
+                    voice_style TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    sha256 TEXT NOT NULL,
+                    ext TEXT NOT NULL,
+                    size_bytes INTEGER,
+                    created_at TEXT NOT NULL,
+                    PRIMARY KEY (video_id, voice_style, kind)
+                )
+            ''')
+            conn.commit()
+            conn.close()
+
+    def _object_path(self, sha256, ext):
+        """Путь к файлу в хранилище"""
+        return os.path.join(self.cache_dir, "objects", sha256[:2], f"{sha256}{ext}")
+
+    def put(self, video_id, voice_style, kind, source_path):
+        """
+        Положить дорожку в кэш (файл копируется)
+        Возвращает путь к файлу в кэше
+        """
+        sha256 = file_sha256(source_path)
+        ext = os.path.splitext(source_path)[1].lower()
+        object_path = self._object_path(sha256, ext)
+
+        if not os.path.exists(object_path):
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            # Копируем во временный файл рядом и атомарно переименовываем
+            temp_path = f"{object_path}.{uuid.uuid4().hex[:8]}.tmp"
+            shutil.copyfile(source_path, temp_path)
+            os.replace(temp_path, object_path)
+
+        with cache_lock:
+            conn = sqlite3.connect(self.database)
+            conn.execute('''
+                INSERT OR REPLACE INTO cached_tracks
+                    (video_id, voice_style, kind, sha256, ext, size_bytes, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (video_id, voice_style, kind, sha256, ext,
+                  os.path.getsize(object_path), datetime.now().isoformat()))
+            conn.commit()
+            conn.close()
+
+        return object_path
+
+    def get(self, video_id, voice_style, kind):
+        """Путь к дорожке в кэше или None"""
+        with cache_lock:
+            conn = sqlite3.connect(self.database)
+            row = conn.execute(
+                'SELECT sha256, ext FROM cached_tracks WHERE video_id = ? AND voice_style = ? AND kind = ?',
+                (video_id, voice_style, kind)
+            ).fetchone()
+            conn.close()
+
+        if not row:
+            return None
+
+        object_path = self._object_path(*row)
+        return object_path if os.path.exists(object_path) else None
+
+    def video_ids(self, voice_style):
+        """ID видео, для которых в кэше есть озвучка и оригинальный звук"""
+        with cache_lock:
+            conn = sqlite3.connect(self.database)
+            rows = conn.execute('''
+                SELECT video_id FROM cached_tracks
+                WHERE voice_style = ? AND kind IN (?, ?)
+                GROUP BY video_id HAVING COUNT(DISTINCT kind) = 2
+            ''', (voice_style, KIND_DUB, KIND_ORIGINAL)).fetchall()
+            conn.close()
+        return [row[0] for row in rows]
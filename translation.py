@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Перевод названий видео на русский через сменные бэкенды
+- таблица переводов (translations.json): мгновенно и без сети, пополняется сама
+- Google (deep-translator): нужен интернет
+- локальная модель (argostranslate): офлайн, если установлена
+Бэкенд выбирается по доступности и средней задержке, названия переводятся пачками
+"""
+import importlib.util
+import json
+import os
+import re
+import threading
+import time
+import uuid
+
+# Сами библиотеки импортируются при первом переводе: deep-translator тянет requests и bs4,
+# argostranslate - модели; при запуске достаточно знать, что они установлены
+GOOGLE_AVAILABLE = importlib.util.find_spec('deep_translator') is not None
+LOCAL_MODEL_AVAILABLE = importlib.util.find_spec('argostranslate') is not None
+
+# Таблица переводов {"оригинал": "перевод"} - можно править руками
+TRANSLATIONS_FILE = "translations.json"
+
+# Язык исходных названий для локальной модели (Google определяет сам)
+LOCAL_MODEL_SOURCE_LANGUAGE = "en"
+
+# Сколько не обращаться к бэкенду после ошибки (сек)
+BACKEND_RETRY_SECONDS = 300
+
+# Сколько названий отправлять за один запрос
+BATCH_SIZE = 50
+
+# Вес нового замера в средней задержке
+LATENCY_SMOOTHING = 0.3
+
+
+def is_russian(text):
+    """Название уже на русском (кириллицы больше, чем латиницы)"""
+    cyrillic = len(re.findall(r'[А-Яа-яЁё]', text))
+    latin = len(re.findall(r'[A-Za-z]', text))
+    return cyrillic > latin
+
+
+class DictionaryBackend:
+    """Таблица готовых переводов; сохраняет всё, что перевели другие бэкенды"""
+
+    name = "dictionary"
+
+    def __init__(self, path=TRANSLATIONS_FILE):
+        self.path = path
+        self.table = {}
+        self.lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.table = json.load(f)
+            except (OSError, ValueError):
+                self.table = {}
+
+    def available(self):
+        return bool(self.table)
+
+    def translate_batch(self, texts):
+        with self.lock:
+            return [self.table.get(text) for text in texts]
+
+    def learn(self, pairs):
+        """Запомнить переводы и сохранить таблицу"""
+        if not pairs:
+            return
+        with self.lock:
+            self.table.update(pairs)
+            if not self.path:
+                return
+            # Пишем во временный файл и атомарно подменяем
+            temp_path = f"{self.path}.{uuid.uuid4().hex[:8]}.tmp"
+            try:
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    json.dump(self.table, f, ensure_ascii=False, indent=1, sort_keys=True)
+                os.replace(temp_path, self.path)
+            except OSError:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+
+
+class GoogleBackend:
+    """Google Translate через deep-translator"""
+
+    name = "google"
+    expected_latency = 0.5
+
+    def available(self):
+        return GOOGLE_AVAILABLE
+
+    def translate_batch(self, texts):
+        from deep_translator import GoogleTranslator
+        return GoogleTranslator(source='auto', target='ru').translate_batch(list(texts))
+
+
+class LocalModelBackend:
+    """Офлайн-перевод локальной моделью argostranslate"""
+
+    name = "local"
+    expected_latency = 1.0
+
+    def __init__(self, source_language=LOCAL_MODEL_SOURCE_LANGUAGE):
+        self.source_language = source_language
+        self.installed = None  # Есть ли модель языковой пары (узнаём при первом переводе)
+
+    def available(self):
+        # Без импорта argostranslate: он грузит torch и модели, а вызывается и при запуске
+        return LOCAL_MODEL_AVAILABLE and self.installed is not False
+
+    def translate_batch(self, texts):
+        import argostranslate.translate as argos_translate
+        if self.installed is None:
+            # Модель нужной языковой пары должна быть скачана заранее
+            codes = {language.code for language in argos_translate.get_installed_languages()}
+            self.installed = self.source_language in codes and 'ru' in codes
+        if not self.installed:
+            raise RuntimeError(f"Нет модели argostranslate {self.source_language} -> ru")
+        return [argos_translate.translate(text, self.source_language, 'ru') for text in texts]
+
+
+class Translator:
+    """
+    Перевод названий пачками (потокобезопасно)
+    Сначала таблица переводов, остальное - самым быстрым из доступных бэкендов
+    Если перевести не удалось, название остаётся как есть
+    """
+
+    def __init__(self, backends, dictionary=None):
+        self.backends = list(backends)
+        self.dictionary = dictionary
+        self.latency = {backend.name: backend.expected_latency for backend in self.backends}
+        self.down_until = {}
+        self.lock = threading.Lock()
+
+    def available(self):
+        """Есть ли чем переводить"""
+        if self.dictionary is not None and self.dictionary.available():
+            return True
+        return any(backend.available() for backend in self.backends)
+
+    def _ranked_backends(self):
+        """Доступные бэкенды от быстрого к медленному"""
+        now = time.time()
+        with self.lock:
+            ranked = [
+                backend for backend in self.backends
+                if self.down_until.get(backend.name, 0) <= now and backend.available()
+            ]
+            return sorted(ranked, key=lambda backend: self.latency[backend.name])
+
+    def _record(self, backend, seconds_per_text=None):
+        """Учесть задержку бэкенда (None - ошибка, бэкенд временно отключается)"""
+        with self.lock:
+            if seconds_per_text is None:
+                self.down_until[backend.name] = time.time() + BACKEND_RETRY_SECONDS
+                return
+            previous = self.latency[backend.name]
+            self.latency[backend.name] = previous + LATENCY_SMOOTHING * (seconds_per_text - previous)
+
+    def translate_batch(self, texts):
+        """Перевести список названий; порядок сохраняется"""
+        results = list(texts)
+        pending = [i for i, text in enumerate(texts) if text and not is_russian(text)]
+
+        if pending and self.dictionary is not None:
+            known = self.dictionary.translate_batch([texts[i] for i in pending])
+            for i, translated in zip(pending, known):
+                if translated:
+                    results[i] = translated
+            pending = [i for i, translated in zip(pending, known) if not translated]
+
+        for backend in self._ranked_backends():
+            if not pending:
+                break
+            learned = {}
+            for start in range(0, len(pending), BATCH_SIZE):
+                chunk = pending[start:start + BATCH_SIZE]
+                started = time.time()
+                try:
+                    translations = backend.translate_batch([texts[i] for i in chunk])
+                except Exception:
+                    self._record(backend)
+                    break
+                self._record(backend, (time.time() - started) / len(chunk))
+                for i, translated in zip(chunk, translations):
+                    if translated:
+                        results[i] = translated
+                        learned[texts[i]] = translated
+            pending = [i for i in pending if texts[i] not in learned]
+            if self.dictionary is not None:
+                self.dictionary.learn(learned)
+
+        return results
+
+    def translate(self, text):
+        """Перевести одно название"""
+        return self.translate_batch([text])[0]
+
+
+def create_translator():
+    """Переводчик со всеми бэкендами, которые есть в этой установке"""
+    return Translator([GoogleBackend(), LocalModelBackend()], DictionaryBackend())
+
+
+translator = None
+translator_lock = threading.Lock()
+
+
+def get_translator():
+    """
+    Общий переводчик процесса (создаётся при первом обращении)
+    Модули, которые импортируют run2 ради констант (library, verify, service),
+    не читают таблицу переводов и не трогают бэкенды
+    """
+    global translator
+    with translator_lock:
+        if translator is None:
+            translator = create_translator()
+            if not GOOGLE_AVAILABLE and not LOCAL_MODEL_AVAILABLE:
+                print("⚠️ Для перевода названий установите: pip install deep-translator (или argostranslate для офлайн-перевода)")
+        return translator
@@ -0,0 +1,16 @@
+@echo off
+chcp 65001 >nul
+title Verify Video Library
+color 0A
+
+cls
+echo ========================================
+echo   Verify processed videos
+echo   Broken files are queued in urls.txt
+echo ========================================
+echo.
+
+python verify.py %*
+
+echo.
+pause
@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+"""
+Проверка библиотеки: база обработанных видео против файлов в output
+Файлы проверяются ffprobe (читается ли контейнер, есть ли нужные дорожки, длительность);
+результат хранится в базе, и повторно проверяются только файлы с изменившимся размером
+или временем изменения - ночная проверка большой библиотеки занимает секунды
+Битые видео снимаются с отметки "обработано" и ставятся в очередь (urls.txt),
+пропавшие - только по --requeue-missing (файл могли удалить намеренно)
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from catalog import Catalog
+from run2 import (
+    AUDIO_CODECS,
+    DATABASE,
+    MAX_WORKERS,
+    URLS_FILE,
+    extract_video_id,
+    init_database,
+    load_urls_from_file,
+    mark_video_processed,
+    safe_print,
+)
+from runner import ProcessTimeout, run_command
+from stream_packaging import HLS_DIR_SUFFIX, HLS_PLAYLIST
+
+# Расширения готовых файлов; hls - папка HLS (готовый результат, только если mp4 рядом нет)
+OUTPUT_EXTENSIONS = ('mp4',) + tuple(AUDIO_CODECS) + (HLS_DIR_SUFFIX.lstrip('.'),)
+OUTPUT_SUBDIRS = ('videos', 'shorts')
+
+# Временные папки задач внутри output (temp_<id>_<uuid>, temp_batch_<uuid>)
+TEMP_DIR_PREFIXES = ('temp_',)
+
+# Имя готового файла: "<название>_<video_id>.<расширение>"
+OUTPUT_NAME_PATTERN = re.compile(r'_([0-9A-Za-z_-]{11})\.(' + '|'.join(OUTPUT_EXTENSIONS) + r')$')
+
+# Таймаут ffprobe на один файл (сек)
+PROBE_TIMEOUT = 60
+
+# Видео короче ожидаемого больше чем на 10% считается обрезанным
+MIN_DURATION_RATIO = 0.9
+
+check_lock = threading.Lock()
+
+# Размер и время изменения готового результата - ключ кэша проверок
+OutputStat = namedtuple('OutputStat', 'st_size st_mtime_ns')
+
+
+class CheckCache:
+    """Результаты прошлых проверок: путь -> (размер, mtime, результат)"""
+
+    def __init__(self, database):
+        self.database = database
+        with check_lock:
+            conn = sqlite3.connect(self.database)
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS file_checks (
+                    path TEXT PRIMARY KEY,
+                    size_bytes INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    duration REAL,
+                    ok INTEGER NOT NULL,
+                    error TEXT,
+                    checked_at TEXT NOT NULL
+                )
+            ''')
+            conn.commit()
+            conn.close()
+
+    def load(self):
+        """Все результаты: {path: (size_bytes, mtime_ns, ok, error)}"""
+        with check_lock:
+            conn = sqlite3.connect(self.database)
+            rows = conn.execute('SELECT path, size_bytes, mtime_ns, ok, error FROM file_checks').fetchall()
+            conn.close()
+        return {path: (size, mtime_ns, bool(ok), error) for path, size, mtime_ns, ok, error in rows}
+
+    def save(self, results):
+        """Сохранить результаты: [(path, size_bytes, mtime_ns, duration, ok, error), ...]"""
+        now = datetime.now().isoformat()
+        with check_lock:
+            conn = sqlite3.connect(self.database)
+            conn.executemany('''
+                INSERT OR REPLACE INTO file_checks (path, size_bytes, mtime_ns, duration, ok, error, checked_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', [(path, size, mtime_ns, duration, int(ok), error, now)
+                  for path, size, mtime_ns, duration, ok, error in results])
+            conn.commit()
+            conn.close()
+
+    def rename(self, moves):
+        """Файлы перенесены без изменений - результаты переходят на новые пути: [(старый, новый), ...]"""
+        with check_lock:
+            conn = sqlite3.connect(self.database)
+            conn.executemany('UPDATE OR REPLACE file_checks SET path = ? WHERE path = ?',
+                             [(new, old) for old, new in moves])
+            conn.commit()
+            conn.close()
+
+    def forget(self, paths):
+        """Удалить результаты для файлов, которых больше нет"""
+        with check_lock:
+            conn = sqlite3.connect(self.database)
+            conn.executemany('DELETE FROM file_checks WHERE path = ?', [(path,) for path in paths])
+            conn.commit()
+            conn.close()
+
+
+def hls_stat(path):
+    """
+    Размер и время изменения папки HLS для кэша проверок: по плейлисту и сегментам
+    stat самой папки меняется только при добавлении и удалении файлов, а не когда
+    сегмент или плейлист переписаны на месте
+    Размер - сумма размеров файлов, время - самое позднее из них
+    """
+    size = 0
+    mtime_ns = 0
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_file():
+                stat = entry.stat()
+                size += stat.st_size
+                mtime_ns = max(mtime_ns, stat.st_mtime_ns)
+    return OutputStat(size, mtime_ns)
+
+
+def scan_output(output_dir):
+    """
+    Готовые файлы в output/videos и output/shorts со всеми подпапками раскладки
+    (без временных папок задач); папка HLS считается готовым файлом, если mp4 рядом нет
+    Возвращает {video_id: [(path, os.stat_result или OutputStat для папки HLS), ...]}
+    """
+    files = {}
+    packaged = {}
+    for subdir in OUTPUT_SUBDIRS:
+        directory = os.path.abspath(os.path.join(output_dir, subdir))
+        pending = [directory] if os.path.isdir(directory) else []
+        while pending:
+            with os.scandir(pending.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        match = OUTPUT_NAME_PATTERN.search(entry.name)
+                        if match and entry.name.endswith(HLS_DIR_SUFFIX):
+                            packaged.setdefault(match.group(1), []).append((entry.path, hls_stat(entry.path)))
+                        elif not entry.name.startswith(TEMP_DIR_PREFIXES):
+                            pending.append(entry.path)
+                        continue
+                    match = OUTPUT_NAME_PATTERN.search(entry.name)
+                    # .remix.mp4 - пересборка в процессе
+                    if not match or not entry.is_file() or '.remix.' in entry.name:
+                        continue
+                    files.setdefault(match.group(1), []).append((entry.path, entry.stat()))
+    for video_id, entries in packaged.items():
+        if video_id not in files:
+            files[video_id] = entries
+    return files
+
+
+def is_short_path(output_dir, path):
+    """Лежит ли файл в output/shorts (в любой подпапке раскладки)"""
+    relative = os.path.relpath(path, os.path.abspath(output_dir))
+    return relative.split(os.sep)[0] == 'shorts'
+
+
+def probe_file(path, expected_duration=None):
+    """
+    Проверить файл (или папку HLS - по её плейлисту) через ffprobe
+    Возвращает: (ok, ошибка или None, длительность или None)
+    """
+    is_video = path.endswith(('.mp4', HLS_DIR_SUFFIX))
+    if path.endswith(HLS_DIR_SUFFIX):
+        path = os.path.join(path, HLS_PLAYLIST)
+    cmd = ['ffprobe', '-v', 'error', '-show_entries', 'format=duration:stream=codec_type', '-of', 'json', path]
+    try:
+        result = run_command(cmd, timeout=PROBE_TIMEOUT)
+    except ProcessTimeout:
+        return False, "ffprobe: таймаут", None
+
+    if result.returncode != 0:
+        return False, f"не читается: {result.error_summary()}", None
+
+    try:
+        data = json.loads(result.stdout.text())
+    except ValueError:
+        return False, "ffprobe: непонятный ответ", None
+
+    try:
+        duration = float(data.get('format', {}).get('duration'))
+    except (TypeError, ValueError):
+        duration = None
+    streams = {stream.get('codec_type') for stream in data.get('streams', [])}
+
+    if 'audio' not in streams:
+        return False, "нет звуковой дорожки", duration
+    if is_video and 'video' not in streams:
+        return False, "нет видеодорожки", duration
+    if not duration:
+        return False, "нулевая длительность", duration
+    # Звук сводится по более короткой дорожке, поэтому длину сверяем только у видео
+    if is_video and expected_duration and duration < expected_duration * MIN_DURATION_RATIO:
+        return False, f"обрезан: {duration:.0f} из {expected_duration:.0f} сек", duration
+    return True, None, duration
+
+
+def load_library():
+    """Обработанные видео: {video_id: (url, title)} и ожидаемые длительности из каталога"""
+    conn = sqlite3.connect(DATABASE)
+    videos = {video_id: (url, title) for video_id, url, title in
+              conn.execute('SELECT video_id, url, title FROM processed_videos')}
+    durations = dict(conn.execute('SELECT video_id, duration FROM catalog WHERE duration IS NOT NULL'))
+    conn.close()
+    return videos, durations
+
+
+def requeue(video_ids, videos, files, catalog):
+    """Снять видео с отметки "обработано", удалить битые файлы и дописать URL в urls.txt"""
+    queued = {extract_video_id(url) for url in load_urls_from_file(URLS_FILE)}
+
+    conn = sqlite3.connect(DATABASE)
+    conn.executemany('DELETE FROM processed_videos WHERE video_id = ?', [(video_id,) for video_id in video_ids])
+    conn.commit()
+    conn.close()
+    catalog.remove(video_ids)
+
+    new_urls = []
+    for video_id in video_ids:
+        for path, _ in files.get(video_id, []):
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+        if video_id not in queued:
+            url = videos.get(video_id, (None,))[0] or f"https://www.youtube.com/watch?v={video_id}"
+            new_urls.append(url)
+
+    if new_urls:
+        # Файл может не заканчиваться переводом строки
+        needs_newline = False
+        if os.path.exists(URLS_FILE) and os.path.getsize(URLS_FILE):
+            with open(URLS_FILE, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b'\n'
+        with open(URLS_FILE, 'a', encoding='utf-8') as f:
+            if needs_newline:
+                f.write('\n')
+            f.write(f"# Поставлено в очередь проверкой {datetime.now().strftime('%Y-%m-%d %H:%M')}\n")
+            f.writelines(f"{url}\n" for url in new_urls)
+
+
+def verify_library(output_dir="output", workers=MAX_WORKERS, fix=True, full=False, requeue_missing=False):
+    """
+    Сверить базу и файлы
+    fix - поставить битые видео в очередь, а целые файлы без записи - внести в базу
+    full - проверить заново все файлы, а не только изменившиеся
+    requeue_missing - ставить в очередь и видео, файл которых пропал
+    Возвращает словарь счётчиков
+    """
+    init_database()
+    catalog = Catalog(DATABASE)
+    check_cache = CheckCache(DATABASE)
+    videos, durations = load_library()
+    files = scan_output(output_dir)
+    checks = check_cache.load()
+
+    # Проверяем только новые и изменившиеся файлы
+    verdicts = {}
+    to_probe = []
+    for video_id, entries in files.items():
+        for path, stat in entries:
+            cached = checks.get(path)
+            if not full and cached and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+                verdicts[path] = cached[2:]
+            else:
+                to_probe.append((video_id, path, stat))
+
+    if to_probe:
+        safe_print(f"🔍 Проверка {len(to_probe)} новых или изменившихся файлов...")
+
+    def probe(item):
+        video_id, path, stat = item
+        ok, error, duration = probe_file(path, durations.get(video_id))
+        return path, stat.st_size, stat.st_mtime_ns, duration, ok, error
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        probed = list(executor.map(probe, to_probe))
+    check_cache.save(probed)
+    for path, _, _, _, ok, error in probed:
+        verdicts[path] = (ok, error)
+
+    present = {path for entries in files.values() for path, _ in entries}
+    check_cache.forget([path for path in checks if path not in present])
+
+    stats = {'checked': len(present), 'probed': len(probed), 'broken': 0, 'missing': 0, 'adopted': 0, 'requeued': 0,
+             'reindexed': 0}
+    to_requeue = []
+    indexed = catalog.paths()
+
+    for video_id in videos:
+        entries = files.get(video_id, [])
+        if not entries:
+            stats['missing'] += 1
+            safe_print(f"  ❓ [{video_id}] Файл не найден")
+            if requeue_missing:
+                to_requeue.append(video_id)
+            continue
+        good = [path for path, _ in entries if verdicts[path][0]]
+        if not good:
+            stats['broken'] += 1
+            for path, _ in entries:
+                safe_print(f"  ❌ [{video_id}] {os.path.basename(path)}: {verdicts[path][1]}")
+            to_requeue.append(video_id)
+            continue
+        # Файл перенесли руками или запись старше каталога - поправляем путь в каталоге
+        if indexed.get(video_id) not in good:
+            stats['reindexed'] += 1
+            if fix:
+                catalog.record(video_id, output_path=good[0], is_short=is_short_path(output_dir, good[0]))
+
+    # Файлы без записи в базе (сбой между ffmpeg и записью в базу)
+    for video_id, entries in files.items():
+        if video_id in videos:
+            continue
+        good = [(path, stat) for path, stat in entries if verdicts[path][0]]
+        if not good:
+            stats['broken'] += 1
+            for path, _ in entries:
+                safe_print(f"  ❌ [{video_id}] {os.path.basename(path)} (нет в базе): {verdicts[path][1]}")
+            to_requeue.append(video_id)
+            continue
+        stats['adopted'] += 1
+        path, stat = good[0]
+        safe_print(f"  ➕ [{video_id}] {os.path.basename(path)} - целый файл без записи в базе")
+        if fix:
+            title = OUTPUT_NAME_PATTERN.split(os.path.basename(path))[0]
+            mark_video_processed(video_id, f"https://www.youtube.com/watch?v={video_id}", title, stat.st_size / 1024)
+            catalog.record(video_id, title=title, output_path=path, file_size_kb=stat.st_size / 1024,
+                           audio_only=not path.endswith(('.mp4', HLS_DIR_SUFFIX)), is_short=is_short_path(output_dir, path))
+
+    if fix and to_requeue:
+        requeue(to_requeue, videos, files, catalog)
+        stats['requeued'] = len(to_requeue)
+        check_cache.forget([path for video_id in to_requeue for path, _ in files.get(video_id, [])])
+
+    return stats
+
+
+def main():
+    """Главная функция"""
+    parser = argparse.ArgumentParser(description="Проверка библиотеки: база против файлов в output")
+    parser.add_argument('--output-dir', default="output")
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS)
+    parser.add_argument('--report-only', action='store_true', help="Только отчёт: ничего не менять")
+    parser.add_argument('--full', action='store_true', help="Проверить все файлы заново, а не только изменившиеся")
+    parser.add_argument('--requeue-missing', action='store_true', help="Ставить в очередь и видео, файл которых пропал")
+    args = parser.parse_args()
+
+    stats = verify_library(args.output_dir, args.workers, fix=not args.report_only, full=args.full,
+                           requeue_missing=args.requeue_missing)
+
+    safe_print(f"\n📊 Файлов: {stats['checked']}, проверено заново: {stats['probed']}")
+    safe_print(f"❌ Битых: {stats['broken']}, ❓ пропавших: {stats['missing']}, ➕ без записи в базе: {stats['adopted']}")
+    if stats['requeued']:
+        safe_print(f"🔁 Поставлено в очередь ({URLS_FILE}): {stats['requeued']}")
+    if stats['reindexed']:
+        safe_print(f"🗂️  Путь в каталоге {'исправлен' if not args.report_only else 'устарел'}: {stats['reindexed']}")
+    if args.report_only and stats['broken']:
+        safe_print("💡 Запустите без --report-only, чтобы поставить битые видео в очередь")
+    if stats['missing'] and not args.requeue_missing:
+        safe_print("💡 Пропавшие видео ставятся в очередь с --requeue-missing")
+    return 0 if not (stats['broken'] or stats['missing']) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())